@@ -1 +1,7 @@
-from .sd_api import sd_api_manager
\ No newline at end of file
+# `sd_api_manager` is created on first use, so the Qt-free `api.aio` client can be
+# imported without building the Qt clients
+def __getattr__(name):
+    if name == "sd_api_manager":
+        from .sd_api import sd_api_manager
+        return sd_api_manager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
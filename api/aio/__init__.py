@@ -0,0 +1,2 @@
+from .http import APIError, ConnectionPool, HTTPResponse
+from .client import AsyncSDClient
\ No newline at end of file
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+
+from loguru import logger
+
+from api.aio.http import APIError, ConnectionPool
+
+
+class AsyncSDClient:
+    """
+    asyncio client of the SD WebUI API, for scripts and batch tools that run without Qt.
+
+    Covers what `BaseFetcher` and `ImageGenerator` do for the GUI: resource lists,
+    options, progress and txt2img/img2img. Requests share a keep-alive `ConnectionPool`
+    of `max_connections`. Generations are further limited to `max_generations` in
+    flight: the server runs one at a time anyway, a second one queued there hides the
+    round trip between jobs, more only hold connections the progress polls need.
+
+    Failed GET requests are retried on connection errors and 5xx answers with jittered
+    exponential backoff, generations are never retried, they may have run.
+
+    Use it as an async context manager, or call `close()`::
+
+        async with AsyncSDClient("http://127.0.0.1:7860") as client:
+            result = await client.txt2img({"prompt": "a cat", "steps": 20})
+    """
+    ENDPOINT_VERSION = "/sdapi/v1/version"
+    ENDPOINT_MODELS = "/sdapi/v1/sd-models"
+    ENDPOINT_VAES = "/sdapi/v1/sd-vae"
+    ENDPOINT_EMBEDDINGS = "/sdapi/v1/embeddings"
+    ENDPOINT_LORAS = "/sdapi/v1/lora"
+    ENDPOINT_STYLES = "/sdapi/v1/prompt-styles"
+    ENDPOINT_UPSCALERS = "/sdapi/v1/upscalers"
+    ENDPOINT_SAMPLERS = "/sdapi/v1/samplers"
+    ENDPOINT_REFRESH_CHECKPOINTS = "/sdapi/v1/refresh-checkpoints"
+    ENDPOINT_REFRESH_LORAS = "/sdapi/v1/refresh-loras"
+    ENDPOINT_OPTIONS = "/sdapi/v1/options"
+    ENDPOINT_PROGRESS = "/sdapi/v1/progress"
+    ENDPOINT_STATUS = "/sdapi/v1/status"
+    ENDPOINT_INTERRUPT = "/sdapi/v1/interrupt"
+    ENDPOINT_SKIP = "/sdapi/v1/skip"
+
+    RETRY_BASE_S = 0.25
+    RETRY_MAX_S = 4.0
+
+    def __init__(self, base_url: str = "http://127.0.0.1:7860", auth_token: Optional[str] = None,
+                 max_connections: int = 6, max_generations: int = 1, timeout: float = 30.0,
+                 generation_timeout: Optional[float] = None, retries: int = 2):
+        """
+        Args:
+            max_connections: Requests in flight at once, generations included.
+            max_generations: Generations in flight at once, the rest wait here.
+            timeout: Seconds for one request other than a generation.
+            generation_timeout: Seconds for one generation, None waits as long as it takes.
+            retries: Default retries of GET requests.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.auth_token = auth_token
+        self.timeout = timeout
+        self.generation_timeout = generation_timeout
+        self.retries = retries
+        self.pool = ConnectionPool(self.base_url, max_connections)
+        self._generations = asyncio.Semaphore(max_generations)
+
+    async def __aenter__(self) -> "AsyncSDClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.pool.close()
+
+    # Plain requests
+    async def request(self, method: str, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                      body: Any = None, timeout: Optional[float] = None, retries: int = 0) -> Any:
+        """
+        Send a request and return the decoded JSON answer.
+
+        Raises:
+            APIError: On connection errors, timeouts and HTTP errors, after the retries.
+        """
+        target = endpoint
+        if params:
+            target += "?" + urlencode({key: str(value).lower() if isinstance(value, bool) else value
+                                       for key, value in params.items()})
+        headers = {"Accept": "application/json"}
+        if self.auth_token:
+            headers["Authorization"] = f"Bearer {self.auth_token}"
+        data = None
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            data = json.dumps(body).encode("utf-8")
+
+        attempt = 0
+        while True:
+            try:
+                response = await self.pool.request(method, target, headers, data, timeout)
+                if response.status >= 400:
+                    raise APIError(self._error_message(response.body, f"HTTP {response.status} {response.reason}"),
+                                   response.status)
+                return response.json()
+            except APIError as e:
+                if attempt >= retries or 0 < e.status_code < 500:
+                    raise
+                delay = min(self.RETRY_BASE_S * 2 ** attempt, self.RETRY_MAX_S) * (1 - 0.5 * random.random())
+                attempt += 1
+                logger.warning(f"{method} {endpoint} failed ({e}), retry {attempt}/{retries} in {delay:.2f} s")
+                await asyncio.sleep(delay)
+
+    async def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                  timeout: Optional[float] = None, retries: Optional[int] = None) -> Any:
+        return await self.request("GET", endpoint, params, timeout=timeout or self.timeout,
+                                  retries=self.retries if retries is None else retries)
+
+    async def post(self, endpoint: str, body: Any = None, timeout: Optional[float] = None) -> Any:
+        return await self.request("POST", endpoint, body=body, timeout=timeout or self.timeout)
+
+    # Server
+    async def version(self) -> Dict[str, Any]:
+        return await self.get(self.ENDPOINT_VERSION, timeout=5.0, retries=0)
+
+    async def check_server(self) -> bool:
+        """Whether the server answers at all."""
+        try:
+            await self.version()
+            return True
+        except APIError as e:
+            return e.status_code != 0
+
+    # Resource lists
+    async def models(self) -> List[Dict[str, Any]]:
+        return await self.get(self.ENDPOINT_MODELS)
+
+    async def vaes(self) -> List[Dict[str, Any]]:
+        return await self.get(self.ENDPOINT_VAES)
+
+    async def embeddings(self) -> Dict[str, Any]:
+        return await self.get(self.ENDPOINT_EMBEDDINGS)
+
+    async def loras(self) -> List[Dict[str, Any]]:
+        return await self.get(self.ENDPOINT_LORAS)
+
+    async def styles(self) -> List[Dict[str, Any]]:
+        return await self.get(self.ENDPOINT_STYLES)
+
+    async def upscalers(self) -> List[Dict[str, Any]]:
+        return await self.get(self.ENDPOINT_UPSCALERS)
+
+    async def samplers(self) -> List[Dict[str, Any]]:
+        return await self.get(self.ENDPOINT_SAMPLERS)
+
+    async def refresh_models(self):
+        await self.post(self.ENDPOINT_REFRESH_CHECKPOINTS)
+
+    async def refresh_loras(self):
+        await self.post(self.ENDPOINT_REFRESH_LORAS)
+
+    # Options
+    async def options(self) -> Dict[str, Any]:
+        return await self.get(self.ENDPOINT_OPTIONS)
+
+    async def set_options(self, options: Dict[str, Any]):
+        """Change server options. Switching `sd_model_checkpoint` loads the model, so there is no timeout."""
+        await self.request("POST", self.ENDPOINT_OPTIONS, body=options, timeout=self.generation_timeout)
+
+    # Progress
+    async def progress(self, skip_current_image: bool = True) -> Dict[str, Any]:
+        return await self.get(self.ENDPOINT_PROGRESS, {"skip_current_image": skip_current_image},
+                              timeout=5.0, retries=1)
+
+    async def status(self) -> Dict[str, Any]:
+        return await self.get(self.ENDPOINT_STATUS, timeout=5.0, retries=1)
+
+    async def interrupt(self):
+        await self.post(self.ENDPOINT_INTERRUPT)
+
+    async def skip(self):
+        await self.post(self.ENDPOINT_SKIP)
+
+    # Generation
+    async def txt2img(self, payload: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        return await self.generate("txt2img", payload, **kwargs)
+
+    async def img2img(self, payload: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        return await self.generate("img2img", payload, **kwargs)
+
+    async def generate(self, endpoint: str, payload: Dict[str, Any],
+                       on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       progress_interval: float = 0.5) -> Dict[str, Any]:
+        """
+        Run a generation and return the server's answer (images as base64, parameters, info).
+
+        Args:
+            endpoint: "txt2img" or "img2img".
+            on_progress: Called with every `/progress` answer while the generation runs.
+                Polls go over their own pooled connection, the generation is unaffected.
+            progress_interval: Seconds between progress polls.
+        """
+        async with self._generations:
+            start = time.perf_counter()
+            poller = None
+            if on_progress is not None:
+                poller = asyncio.create_task(self._poll_progress(on_progress, progress_interval))
+            try:
+                result = await self.request("POST", f"/sdapi/v1/{endpoint}", body=payload,
+                                            timeout=self.generation_timeout)
+            finally:
+                if poller is not None:
+                    poller.cancel()
+            logger.debug(f"{endpoint} finished in {time.perf_counter() - start:.2f} s")
+            return result
+
+    async def _poll_progress(self, on_progress: Callable[[Dict[str, Any]], None], interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                on_progress(await self.progress())
+            except APIError as e:
+                logger.debug(f"Progress poll failed: {e}")
+
+    @staticmethod
+    def _error_message(body: bytes, default: str) -> str:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return default
+        if isinstance(data, dict):
+            return str(data.get("detail") or data.get("error") or default)
+        return default
+
+
+if __name__ == "__main__":
+    # Throughput against stub servers: many generations and progress polls at once
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Drive a (stub) server with the asyncio client")
+    parser.add_argument("--url", help="Server to use instead of an in-process stub")
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--in-flight", type=int, default=2, help="Generations in flight")
+    parser.add_argument("--port", type=int, default=7871)
+    args = parser.parse_args()
+
+    if args.url is None:
+        from api.backend.stub_server import start_stub_servers
+        start_stub_servers(1, base_port=args.port, delay=0.25)
+    url = args.url or f"http://127.0.0.1:{args.port}"
+
+    async def main():
+        async with AsyncSDClient(url, max_generations=args.in_flight) as client:
+            models, samplers = await asyncio.gather(client.models(), client.samplers())
+            print(f"{len(models)} models, {len(samplers)} samplers")
+            polls = []
+            start = time.perf_counter()
+            results = await asyncio.gather(*(
+                client.txt2img({"prompt": f"job {i}", "steps": 5}, on_progress=polls.append, progress_interval=0.1)
+                for i in range(args.jobs)))
+            elapsed = time.perf_counter() - start
+            print(f"{len(results)} generations in {elapsed:.2f} s ({len(results) / elapsed:.2f}/s), "
+                  f"{len(polls)} progress polls, {client.pool.opened} connections opened")
+
+    asyncio.run(main())
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import ssl
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+
+class APIError(Exception):
+    """
+    Failure of an `AsyncSDClient` request. `status_code` is 0 for connection errors and timeouts.
+
+    `sent` is set when such an error came after the request was written out: the server
+    may have run it, e.g. a generation whose answer was lost, and sending it again may
+    run it twice.
+    """
+
+    def __init__(self, message: str, status_code: int = 0, sent: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.sent = sent
+
+
+@dataclass
+class HTTPResponse:
+    status: int
+    reason: str
+    headers: Dict[str, str] = field(default_factory=dict)  # Lower case names
+    body: bytes = b""
+
+    def json(self) -> Any:
+        return json.loads(self.body) if self.body else None
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.idle_since = time.monotonic()
+        self.reused = False
+        self.sent = False  # The current request is written out completely
+
+    def close(self):
+        self.writer.close()
+
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connections to one server, on the stdlib alone.
+
+    At most `max_connections` requests are in flight, each on its own connection, the
+    rest wait for a slot. Finished connections are kept for `keepalive_s` and reused. A
+    reused connection the server has closed meanwhile is replaced transparently, unless
+    the request wasn't idempotent and had been sent: a POST the server may have run
+    fails with an `APIError` with `sent` set instead of running twice.
+    Responses with a Content-Length, chunked or read-to-close bodies are supported,
+    compressed ones are not asked for.
+    """
+
+    def __init__(self, base_url: str, max_connections: int = 6, keepalive_s: float = 30.0,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {base_url}")
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = (ssl_context or ssl.create_default_context()) if parts.scheme == "https" else None
+        self.host_header = self.host if parts.port is None else f"{self.host}:{self.port}"
+        self.max_connections = max_connections
+        self.keepalive_s = keepalive_s
+        self.opened = 0  # Connections opened so far, for measuring reuse
+        self._idle: Deque[_Connection] = deque()
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def request(self, method: str, target: str, headers: Optional[Dict[str, str]] = None,
+                      body: Optional[bytes] = None, timeout: Optional[float] = None) -> HTTPResponse:
+        """
+        Send one request and read the whole response.
+
+        Args:
+            target: Path and query, e.g. "/sdapi/v1/progress?skip_current_image=true".
+            timeout: Seconds for the whole exchange, waiting for a slot excluded. None waits forever.
+
+        Raises:
+            APIError: On connection errors and timeouts, with `sent` if the request was written out.
+        """
+        async with self._slots:
+            used: List[_Connection] = []  # Connections the request was tried on
+            try:
+                async with asyncio.timeout(timeout):
+                    return await self._request(method, target, headers or {}, body, used)
+            except TimeoutError:
+                raise APIError(f"{method} {target} timed out after {timeout} s",
+                               sent=any(connection.sent for connection in used)) from None
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+                raise APIError(f"{method} {target} failed: {e!r}",
+                               sent=any(connection.sent for connection in used)) from e
+
+    async def close(self):
+        while self._idle:
+            connection = self._idle.popleft()
+            connection.close()
+            try:
+                await connection.writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _request(self, method: str, target: str, headers: Dict[str, str],
+                       body: Optional[bytes], used: List[_Connection]) -> HTTPResponse:
+        while True:
+            connection = await self._acquire()
+            used.append(connection)
+            try:
+                response, keep_alive = await self._exchange(connection, method, target, headers, body)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                connection.close()
+                # Closed by the server while idle. Sending again is safe if the request didn't
+                # get out or can't do anything twice, a sent POST may have run already
+                if connection.reused and (method in IDEMPOTENT_METHODS or not connection.sent):
+                    logger.debug(f"Idle connection to {self.host_header} was closed ({e!r}), reconnecting")
+                    continue
+                raise
+            except BaseException:
+                connection.close()  # Cancelled or timed out halfway, the stream is unusable
+                raise
+            if keep_alive:
+                connection.idle_since = time.monotonic()
+                self._idle.append(connection)
+            else:
+                connection.close()
+            return response
+
+    async def _acquire(self) -> _Connection:
+        while self._idle:
+            connection = self._idle.pop()
+            if time.monotonic() - connection.idle_since < self.keepalive_s and not connection.reader.at_eof():
+                connection.reused = True
+                return connection
+            connection.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        self.opened += 1
+        return _Connection(reader, writer)
+
+    async def _exchange(self, connection: _Connection, method: str, target: str, headers: Dict[str, str],
+                        body: Optional[bytes]) -> Tuple[HTTPResponse, bool]:
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self.host_header}", "Accept-Encoding: identity"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        if body is not None or method in ("POST", "PUT", "PATCH"):
+            lines.append(f"Content-Length: {len(body or b'')}")
+        connection.sent = False
+        connection.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+        await connection.writer.drain()
+        connection.sent = True
+
+        reader = connection.reader
+        status_line = (await reader.readuntil(b"\r\n")).decode("latin-1").rstrip("\r\n")
+        version, status, *reason = status_line.split(" ", 2)
+        response_headers: Dict[str, str] = {}
+        while True:
+            line = (await reader.readuntil(b"\r\n")).decode("latin-1").rstrip("\r\n")
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        response = HTTPResponse(int(status), reason[0] if reason else "", response_headers)
+
+        keep_alive = version == "HTTP/1.1" and response_headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or response.status in (204, 304) or 100 <= response.status < 200:
+            pass
+        elif response_headers.get("transfer-encoding", "").lower() == "chunked":
+            response.body = await self._read_chunked(reader)
+        elif "content-length" in response_headers:
+            response.body = await reader.readexactly(int(response_headers["content-length"]))
+        else:
+            response.body = await reader.read()
+            keep_alive = False
+        return response, keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+            if size == 0:
+                while await reader.readuntil(b"\r\n") != b"\r\n":  # Trailers
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
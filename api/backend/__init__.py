@@ -0,0 +1 @@
+from .pool import Backend, BackendPool
\ No newline at end of file
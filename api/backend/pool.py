@@ -0,0 +1,252 @@
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Set
+
+from PySide6.QtCore import QObject, Signal, Slot, QTimer
+from loguru import logger
+
+from api.generator import ImageGenerator
+from api.fetcher import BaseFetcher
+
+
+class Backend(QObject):
+    """
+    One SD WebUI server: its generator, health and capabilities.
+
+    Health comes from `BaseFetcher.check_server`, from connection errors of the
+    generator and from the circuit breaker both share. Whenever the server becomes
+    available the loaded checkpoint and samplers are fetched, the checkpoint again after
+    every finished job since a job may switch it.
+    """
+    healthChanged = Signal(bool)
+    capabilitiesChanged = Signal()
+
+    def __init__(self, url: str, parent=None):
+        super().__init__(parent)
+        self.url = url.rstrip('/')
+        self.generator = ImageGenerator(self.url, self)
+        self.fetcher = BaseFetcher(self.url, parent=self)
+        self.healthy: Optional[bool] = None  # None until the first check answered
+        self.checkpoint: Optional[str] = None
+        self.samplers: List[str] = []
+        self.failures = 0
+        self.completed = 0
+
+        self.fetcher.serverAvailable.connect(self.set_healthy)
+        self.generator.serverAvailable.connect(self.set_healthy)
+        self.fetcher.breaker.availabilityChanged.connect(self.set_healthy)
+        self.generator.job_completed.connect(self._on_job_completed)
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs this client has in flight on the server."""
+        return self.generator.in_flight
+
+    def check(self):
+        self.fetcher.check_server()
+
+    def refresh_capabilities(self):
+        self.fetcher.fetch_options(on_success=self._on_options)
+        self.fetcher.fetch_samplers(use_cache=False, on_success=self._on_samplers)
+
+    def has_checkpoint(self, checkpoint: str) -> bool:
+        """Whether `checkpoint` is loaded, titles may or may not carry the ' [hash]' suffix."""
+        if not self.checkpoint or not checkpoint:
+            return False
+        return self.checkpoint.split(" [")[0] == checkpoint.split(" [")[0]
+
+    @Slot(bool)
+    def set_healthy(self, available: bool):
+        if available == self.healthy:
+            return
+        self.healthy = available
+        logger.info(f"Backend {self.url} is {'up' if available else 'down'}")
+        if available:
+            self.refresh_capabilities()
+        self.healthChanged.emit(available)
+
+    def _on_options(self, data: Any):
+        if isinstance(data, dict):
+            self.checkpoint = data.get("sd_model_checkpoint")
+            self.capabilitiesChanged.emit()
+
+    def _on_samplers(self, data: Any):
+        if isinstance(data, list):
+            self.samplers = [sampler.get("name") for sampler in data if isinstance(sampler, dict)]
+            self.capabilitiesChanged.emit()
+
+    @Slot(str, dict)
+    def _on_job_completed(self, *_):
+        self.completed += 1
+        self.failures = 0
+        if self.healthy is not True:
+            self.set_healthy(True)
+        else:
+            self.fetcher.fetch_options(on_success=self._on_options)
+
+
+@dataclass
+class _Dispatch:
+    payload: Dict[str, Any]
+    endpoint: str
+    backend: Backend
+    tried: Set[str] = field(default_factory=set)  # backend urls
+    cancelled: bool = False
+
+
+class BackendPool(QObject):
+    """
+    Spreads generations over several SD WebUI servers.
+
+    Exposes the same `submit`/`cancel`/`job_completed`/`job_failed`/`image_received` interface as
+    `ImageGenerator`, so a `JobQueue` can sit in front of a pool unchanged. Each job goes
+    to the least loaded healthy backend, or with "affinity" scheduling preferably to one
+    that already has the requested checkpoint loaded. A job whose request never reached
+    its backend (refused, host not found, breaker open) is transparently posted to one it
+    hasn't tried yet. Other failures are reported, the server may have run the job.
+    """
+    generation_started = Signal(str)  # endpoint name
+    job_completed = Signal(str, dict)  # job id, response
+    job_failed = Signal(str, str, int)  # job id, error message, status code
+    image_received = Signal(str, int, object)  # job id, index, encoded image bytes
+    jobDispatched = Signal(str, str)  # job id, backend url
+    backendsChanged = Signal()
+
+    LEAST_LOADED = "least_loaded"
+    AFFINITY = "affinity"
+
+    def __init__(self, urls: List[str], scheduling: str = LEAST_LOADED, health_interval_ms: int = 15000,
+                 affinity_slack: int = 1, parent=None):
+        """
+        Args:
+            urls: Server base URLs, the first one is the primary.
+            scheduling: `LEAST_LOADED` or `AFFINITY`.
+            health_interval_ms: How often backends are checked when there is more than one.
+            affinity_slack: Extra queued jobs accepted on a backend with the right checkpoint
+                before a less loaded one is picked anyway.
+        """
+        super().__init__(parent)
+        if not urls:
+            raise ValueError("BackendPool needs at least one server URL")
+        self.scheduling = scheduling
+        self.affinity_slack = affinity_slack
+        self.backends: List[Backend] = []
+        self._jobs: Dict[str, _Dispatch] = {}
+        self._next = 0  # round-robin tie breaker
+
+        for url in dict.fromkeys(url.rstrip('/') for url in urls):
+            backend = Backend(url, self)
+            backend.generator.job_completed.connect(self._on_job_completed)
+            backend.generator.job_failed.connect(lambda job_id, msg, code, b=backend: self._on_job_failed(b, job_id, msg, code))
+            backend.generator.generation_started.connect(self.generation_started.emit)
+            backend.generator.image_received.connect(self.image_received.emit)
+            backend.healthChanged.connect(lambda *_: self.backendsChanged.emit())
+            backend.capabilitiesChanged.connect(self.backendsChanged.emit)
+            self.backends.append(backend)
+
+        self._health_timer = QTimer(self)
+        self._health_timer.setInterval(health_interval_ms)
+        self._health_timer.timeout.connect(self.check_health)
+
+    @property
+    def primary(self) -> Backend:
+        return self.backends[0]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._jobs)
+
+    def check_health(self):
+        """Check every backend now, and keep checking periodically when there are several."""
+        for backend in self.backends:
+            backend.check()
+        if len(self.backends) > 1 and not self._health_timer.isActive():
+            self._health_timer.start()
+
+    def select(self, payload: Dict[str, Any], exclude: Set[str] = frozenset()) -> Optional[Backend]:
+        """Pick the backend for `payload`, never one in `exclude`. None when all are down or excluded."""
+        candidates = [(i, backend) for i, backend in enumerate(self.backends)
+                      if backend.url not in exclude and backend.healthy is not False]
+        if not candidates:
+            return None
+        count = len(self.backends)
+
+        def load(item):
+            i, backend = item
+            # Confirmed healthy before unknown, then fewest queued, then round-robin
+            return backend.healthy is not True, backend.queue_depth, (i - self._next) % count
+
+        chosen = min(candidates, key=load)
+        if self.scheduling == self.AFFINITY:
+            checkpoint = (payload.get("override_settings") or {}).get("sd_model_checkpoint")
+            matching = [item for item in candidates if item[1].has_checkpoint(checkpoint)]
+            if matching:
+                best = min(matching, key=load)
+                # Switching checkpoints costs seconds, but not more than a few queued jobs
+                if best[1].queue_depth <= chosen[1].queue_depth + self.affinity_slack:
+                    chosen = best
+        self._next = (chosen[0] + 1) % count
+        return chosen[1]
+
+    def submit(self, payload: Dict[str, Any], endpoint: str, job_id: Optional[str] = None) -> Optional[str]:
+        backend = self.select(payload)
+        if backend is None:
+            # Nothing known to be up, let the primary answer with a real error
+            backend = self.primary
+        job_id = job_id or uuid.uuid4().hex
+        self._dispatch(job_id, _Dispatch(payload, endpoint, backend))
+        # A request that couldn't even be posted has already been failed over or reported
+        return job_id if job_id in self._jobs else None
+
+    def cancel(self, job_id: str) -> bool:
+        dispatch = self._jobs.get(job_id)
+        if dispatch is None:
+            return False
+        dispatch.cancelled = True
+        return dispatch.backend.generator.cancel(job_id)
+
+    def _dispatch(self, job_id: str, dispatch: _Dispatch):
+        dispatch.tried.add(dispatch.backend.url)
+        self._jobs[job_id] = dispatch
+        if dispatch.backend.generator.submit(dispatch.payload, dispatch.endpoint, job_id) is not None:
+            logger.debug(f"Job {job_id} -> {dispatch.backend.url} ({dispatch.backend.queue_depth} in flight there)")
+            self.jobDispatched.emit(job_id, dispatch.backend.url)
+
+    @Slot(str, dict)
+    def _on_job_completed(self, job_id: str, response: dict):
+        if self._jobs.pop(job_id, None) is not None:
+            self.job_completed.emit(job_id, response)
+
+    def _on_job_failed(self, backend: Backend, job_id: str, message: str, status_code: int):
+        dispatch = self._jobs.get(job_id)
+        if dispatch is None or dispatch.backend is not backend:
+            return
+        backend.failures += 1
+        if not dispatch.cancelled and backend.generator.never_sent(job_id):
+            backend.set_healthy(False)
+            fallback = self.select(dispatch.payload, dispatch.tried)
+            if fallback is not None:
+                logger.warning(f"Job {job_id} failed on {backend.url} ({message}), failing over to {fallback.url}")
+                dispatch.backend = fallback
+                self._dispatch(job_id, dispatch)
+                return
+        self._jobs.pop(job_id, None)
+        self.job_failed.emit(job_id, message, status_code)
+
+
+if __name__ == "__main__":
+    from PySide6.QtWidgets import QApplication
+    from api.backend.stub_server import start_stub_servers
+    from api.queue import JobQueue
+
+    app = QApplication([])
+    servers = start_stub_servers(3, base_port=7861, delay=0.5)
+    pool = BackendPool([f"http://127.0.0.1:{7861 + i}" for i in range(3)] + ["http://127.0.0.1:7899"])
+    pool.jobDispatched.connect(lambda job_id, url: print("Dispatched", job_id[:8], "to", url))
+    queue = JobQueue(pool, max_in_flight=6, path=None)
+    queue.jobFinished.connect(lambda job, response: print("Finished", job.payload["prompt"]))
+    queue.idle.connect(app.quit)
+    pool.check_health()
+    for i in range(12):
+        queue.enqueue("txt2img", {"prompt": f"job {i}", "steps": 5})
+    app.exec()
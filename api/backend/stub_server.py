@@ -0,0 +1,249 @@
+"""
+Stand-in for an SD WebUI server, for exercising the client without a GPU.
+
+Implements the subset of the `/sdapi/v1` API the client uses. Generations are serialized
+behind one lock like on a real server, take `delay` seconds per batch (`n_iter`) plus
+`switch_delay` when the payload asks for another checkpoint, and again for switching back
+unless `override_settings_restore_afterwards` is false. They return solid color PNGs,
+one per seed. Failures can be injected to test fail-over.
+
+Run one from the command line::
+
+    python -m api.backend.stub_server --port 7861 --delay 1.5 --checkpoint model_a.safetensors
+
+or start several in-process with `start_stub_servers`.
+"""
+import argparse
+import base64
+import io
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+from PIL import Image
+
+SAMPLERS = ["Euler a", "Euler", "DPM++ 2M", "DPM++ SDE", "DDIM"]
+
+
+class StubState:
+    def __init__(self, delay: float = 1.0, checkpoint: str = "stub_model.safetensors",
+                 checkpoints: Optional[List[str]] = None, switch_delay: float = 0.5,
+                 fail_rate: float = 0.0, samplers: Optional[List[str]] = None):
+        self.delay = delay
+        self.checkpoint = checkpoint
+        self.checkpoints = checkpoints or [checkpoint]
+        if checkpoint not in self.checkpoints:
+            self.checkpoints.append(checkpoint)
+        self.switch_delay = switch_delay
+        self.fail_rate = fail_rate
+        self.samplers = samplers or SAMPLERS
+        self.gpu = threading.Lock()
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.progress = 0.0
+        self.step = 0
+        self.steps = 0
+        self.started = 0.0
+        self.preview_id = 0  # Bumped with every step, like `id_live_preview`
+        self.progress_bytes = 0  # Body bytes sent by /progress
+        self.generated = 0
+        self.switches = 0
+        self.log: List[Dict[str, Any]] = []  # one entry per generation, start/end timestamps
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    state: StubState = None  # set per server class
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the uvicorn server of the WebUI
+    disable_nagle_algorithm = True  # Headers and body are separate writes, don't let them wait for ACKs
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data: Any, status: int = 200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        state = self.state
+        path = self.path.split("?")[0]
+        if path == "/sdapi/v1/version":
+            self._send_json({"version": "stub"})
+        elif path == "/sdapi/v1/options":
+            self._send_json({"sd_model_checkpoint": state.checkpoint})
+        elif path == "/sdapi/v1/samplers":
+            self._send_json([{"name": name, "aliases": [], "options": {}} for name in state.samplers])
+        elif path == "/sdapi/v1/sd-models":
+            self._send_json([{"title": name, "model_name": name.rsplit(".", 1)[0]} for name in state.checkpoints])
+        elif path in ("/sdapi/v1/progress", "/sdapi/v1/status"):
+            query = parse_qs(urlparse(self.path).query)
+            skip = query.get("skip_current_image", ["false"])[0].lower() == "true"
+            known_id = query.get("id_live_preview", [None])[0]
+            with state.lock:
+                elapsed = time.time() - state.started
+                eta = elapsed / state.progress - elapsed if state.progress > 0 else 0.0
+                image = None
+                if not skip and state.step and known_id != str(state.preview_id):
+                    image = self._preview(state.preview_id)
+                body = {"progress": state.progress, "eta_relative": eta,
+                        "state": {"job_count": state.queued, "sampling_step": state.step,
+                                  "sampling_steps": state.steps},
+                        "current_image": image, "id_live_preview": state.preview_id}
+                state.progress_bytes += len(json.dumps(body))
+                self._send_json(body)
+        elif path == "/stub/log":
+            with state.lock:
+                self._send_json({"log": state.log, "switches": state.switches})
+        else:
+            self._send_json({"detail": "Not Found"}, 404)
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path in ("/sdapi/v1/txt2img", "/sdapi/v1/img2img"):
+            self._generate(self._read_json())
+        elif path == "/sdapi/v1/options":
+            options = self._read_json()
+            if "sd_model_checkpoint" in options:
+                with self.state.gpu:
+                    self._switch(options["sd_model_checkpoint"])
+            self._send_json(None)
+        elif path in ("/sdapi/v1/refresh-checkpoints", "/sdapi/v1/refresh-loras", "/sdapi/v1/interrupt",
+                      "/sdapi/v1/skip"):
+            self._send_json(None)
+        else:
+            self._send_json({"detail": "Not Found"}, 404)
+
+    def _switch(self, checkpoint: str):
+        state = self.state
+        if checkpoint and checkpoint != state.checkpoint:
+            time.sleep(state.switch_delay)
+            state.checkpoint = checkpoint
+            state.switches += 1
+
+    def _generate(self, payload: Dict[str, Any]):
+        state = self.state
+        with state.lock:
+            state.queued += 1
+        try:
+            with state.gpu:
+                start = time.time()
+                previous = state.checkpoint
+                checkpoint = (payload.get("override_settings") or {}).get("sd_model_checkpoint")
+                self._switch(checkpoint)
+                try:
+                    # One batch after the other, the images of a batch are made together
+                    n_iter = max(1, int(payload.get("n_iter", 1)))
+                    steps = max(1, int(payload.get("steps", 20)))
+                    with state.lock:
+                        state.started, state.steps = time.time(), steps * n_iter
+                    for step in range(steps * n_iter):
+                        time.sleep(state.delay / steps)
+                        with state.lock:
+                            state.progress = (step + 1) / (steps * n_iter)
+                            state.step = step + 1
+                            state.preview_id += 1
+                    if random.random() < state.fail_rate:
+                        self._send_json({"error": "stub failure", "detail": "Injected failure"}, 500)
+                        return
+                    seed = int(payload.get("seed", -1))
+                    if seed == -1:
+                        seed = random.randrange(2 ** 32)
+                    seeds = [seed + i for i in range(max(1, int(payload.get("batch_size", 1))) * n_iter)]
+                    images = [self._image(payload, seed) for seed in seeds]
+                    model = state.checkpoint
+                    with state.lock:
+                        state.generated += 1
+                        state.progress = 0.0
+                        state.step = state.steps = 0
+                        state.log.append({"prompt": payload.get("prompt", ""), "start": start, "end": time.time(),
+                                          "checkpoint": model, "images": len(images)})
+                finally:
+                    # Like the WebUI, overridden options go back afterwards unless asked not to
+                    if checkpoint and payload.get("override_settings_restore_afterwards", True):
+                        self._switch(previous)
+            self._send_json({"images": images, "parameters": payload,
+                             "info": json.dumps({"prompt": payload.get("prompt", ""),
+                                                 "seed": seeds[0],
+                                                 "all_seeds": seeds,
+                                                 "sd_model_name": model,
+                                                 "job_timestamp": time.strftime("%Y%m%d%H%M%S"),
+                                                 "infotexts": [self._infotext(payload, model, seed)
+                                                               for seed in seeds]})})
+        finally:
+            with state.lock:
+                state.queued -= 1
+
+    @staticmethod
+    def _infotext(payload: Dict[str, Any], checkpoint: str, seed: int) -> str:
+        return (f"{payload.get('prompt', '')}\nNegative prompt: {payload.get('negative_prompt', '')}\n"
+                f"Steps: {payload.get('steps', 20)}, Sampler: {payload.get('sampler_name', 'Euler')}, "
+                f"CFG scale: {payload.get('cfg_scale', 7)}, Seed: {seed}, "
+                f"Size: {payload.get('width', 512)}x{payload.get('height', 512)}, Model: {checkpoint}")
+
+    @staticmethod
+    def _preview(preview_id: int) -> str:
+        image = Image.effect_noise((256, 256), 32 + preview_id % 64).convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG")
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    @staticmethod
+    def _image(payload: Dict[str, Any], seed: int) -> str:
+        width = min(int(payload.get("width", 512)), 2048)
+        height = min(int(payload.get("height", 512)), 2048)
+        color = hash((payload.get("prompt", ""), seed, payload.get("cfg_scale"), payload.get("steps"),
+                      payload.get("sampler_name"), json.dumps(payload.get("override_settings"), sort_keys=True))) & 0xFFFFFF
+        image = Image.new("RGB", (width, height), ((color >> 16) & 255, (color >> 8) & 255, color & 255))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def make_stub_server(port: int = 7861, host: str = "127.0.0.1", **state_kwargs) -> ThreadingHTTPServer:
+    """Create (but don't start) a stub server, `state_kwargs` go to `StubState`."""
+    handler = type("BoundStubHandler", (StubHandler,), {"state": StubState(**state_kwargs)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_stub_servers(count: int, base_port: int = 7861, **state_kwargs) -> List[ThreadingHTTPServer]:
+    """Start `count` stub servers on consecutive ports in daemon threads."""
+    servers = []
+    for i in range(count):
+        server = make_stub_server(base_port + i, **state_kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in SD WebUI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7861)
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds per generation")
+    parser.add_argument("--checkpoint", default="stub_model.safetensors", help="Initially loaded checkpoint")
+    parser.add_argument("--checkpoints", nargs="*", help="Checkpoints listed by /sd-models")
+    parser.add_argument("--switch-delay", type=float, default=0.5, help="Seconds to load another checkpoint")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of generations answered with 500")
+    args = parser.parse_args()
+
+    server = make_stub_server(args.port, args.host, delay=args.delay, checkpoint=args.checkpoint,
+                              checkpoints=args.checkpoints, switch_delay=args.switch_delay,
+                              fail_rate=args.fail_rate)
+    print(f"Stub SD WebUI listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
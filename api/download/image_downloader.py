@@ -1,10 +1,12 @@
 import os
 from PySide6.QtCore import QObject, Signal, QTimer, QUrl
-from PySide6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
+from PySide6.QtNetwork import QNetworkReply
 from PySide6.QtGui import QImage
 import uuid
 from loguru import logger
 
+from api.session import network_session
+
 
 class ImageDownloader(QObject):
     imageDownloaded = Signal(str, QImage, str)  # (uid, QImage, save_path)
@@ -12,7 +14,9 @@ class ImageDownloader(QObject):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.manager = QNetworkAccessManager(self)
+        self.session = network_session("previews")
+        self.manager = self.session.manager
+        self.cache = self.session.cache
         self.active_requests = {}  # Tracks {uid: (reply, timer, url, save_path, retries_left)}
 
     def _get_unique_save_path(self, save_path: str) -> str:
@@ -45,11 +49,11 @@ class ImageDownloader(QObject):
             self.downloadFailed.emit(uid, "Invalid URL", image_url)
             return uid
 
-        request = QNetworkRequest(url)
+        request = self.session.request(url)
         if force_fetch:
             request.setRawHeader(b"Cache-Control", b"no-cache")  # Bypass cache if force_fetch
 
-        reply = self.manager.get(request)
+        reply = self.session.get(request, owner=self)
         timer = QTimer(self)
         timer.setSingleShot(True)
         timer.timeout.connect(lambda: self._on_timeout(uid))
@@ -1 +1,2 @@
-from .fetch_api import BaseFetcher, ProgressTracker, StatusTracker
\ No newline at end of file
+from .fetch_api import BaseFetcher, ProgressTracker, StatusTracker, FetchReply, FetchError
+from .resource_cache import ResourceCache, resource_cache
\ No newline at end of file
@@ -1,10 +1,56 @@
+import asyncio
+import hashlib
+import time
 import uuid
 import json
-from typing import Optional, Dict, Any, List, Tuple
+from collections import deque
+from typing import Optional, Dict, Any, List, Tuple, Callable
 
-from PySide6.QtCore import QObject, Signal, QUrl, QTimer, QUrlQuery, QByteArray, QDateTime, Slot
-from PySide6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply, QNetworkDiskCache
+from PySide6.QtCore import QObject, Signal, QUrl, QTimer, QUrlQuery, QByteArray, Slot
+from PySide6.QtNetwork import QNetworkRequest, QNetworkReply
 from loguru import logger
+from shiboken6 import isValid
+
+from api.fetcher.resource_cache import resource_cache
+from api.resilience import Backoff, breaker_for
+from api.session import NetworkSession, network_session
+
+RequestKey = Tuple[str, str, str]  # method, URL with query, body digest
+
+
+class FetchError(Exception):
+    """Failure of a `BaseFetcher` request, raised by the futures of `fetch_async`."""
+
+    def __init__(self, message: str, status_code: int = 0):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FetchReply(QObject):
+    """
+    The result of one `BaseFetcher` request, delivered to the one consumer holding it.
+
+    Emits exactly one of `finished` or `failed`. The outcome is also kept on the object,
+    so it can be read after the fact.
+    """
+    finished = Signal(object)  # data
+    failed = Signal(str, int)  # error message, status code
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.request_uuid: Optional[str] = None
+        self.done = False
+        self.data: Any = None
+        self.error: Optional[str] = None
+        self.status_code = 0
+
+    def _resolve(self, data: Any):
+        self.done, self.data = True, data
+        self.finished.emit(data)
+
+    def _reject(self, error: str, status_code: int):
+        self.done, self.error, self.status_code = True, error, status_code
+        self.failed.emit(error, status_code)
 
 
 class BaseFetcher(QObject):
@@ -31,66 +77,221 @@ class BaseFetcher(QObject):
     cacheUsed = Signal(bool)  # was_cache_hit
     authenticationRequired = Signal()  # Emitted on 401/403 errors
 
+    RETRY_BASE_MS = 250
+    RETRY_MAX_MS = 4000
+
     def __init__(self, base_url: str = "http://127.0.0.1:7860",
-                 auth_token: Optional[str] = None, cache_ttl_seconds: int = 3600, cache_size: int = 104857600, parent=None):
+                 auth_token: Optional[str] = None, cache_ttl_seconds: int = 3600,
+                 session: Optional[NetworkSession] = None, max_per_host: int = 6, parent=None):
+        """
+        Args:
+            auth_token: Set on the session, so every client of it sends it.
+            session: Defaults to the shared "api" session of the WebUI clients.
+        """
         super().__init__(parent)
         self.base_url = base_url.rstrip('/')
-        self.auth_token = auth_token
         self.cache_ttl_seconds = cache_ttl_seconds
-        self.cache_size = cache_size
+        self.max_per_host = max_per_host
 
-        self.manager = QNetworkAccessManager(self)
-        self._setup_cache()
+        self.session = session or network_session("api")
+        if auth_token:
+            self.session.auth_token = auth_token
+        self.manager = self.session.manager
+        self.cache = self.session.cache
+        self.resources = resource_cache()
 
         # Per-request timers instead of single timer
         self._request_timers: Dict[str, QTimer] = {}  # request_uuid -> timer
 
-        self._active_requests: Dict[str, str] = {}  # endpoint -> request_uuid
+        self._active_requests: Dict[RequestKey, str] = {}  # coalescing key -> request_uuid
         self._request_metadata: Dict[str, dict] = {}  # request_uuid -> metadata (includes retries_left)
         self._pending_replies: Dict[QNetworkReply, Tuple[str, str]] = {}  # reply -> (endpoint, request_uuid)
+        self._callbacks: Dict[str, List[Tuple[Optional[Callable], Optional[Callable]]]] = {}  # request_uuid -> callers
+        self._host_active: Dict[str, int] = {}  # host -> requests on the wire
+        self._host_waiting: Dict[str, deque] = {}  # host -> request uuids waiting for a free slot
 
-        self.manager.finished.connect(self._on_finished)
-
-    def _setup_cache(self):
-        """Initialize and configure the disk cache"""
-        self.cache = QNetworkDiskCache(self)
-        self.cache.setCacheDirectory(".cache")
-        self.cache.setMaximumCacheSize(self.cache_size)
-        self.manager.setCache(self.cache)
+        # Shared with every client of the same server, nothing is sent while it is open
+        self.breaker = breaker_for(self.base_url)
+        self.breaker.probeDue.connect(self.check_server)
 
     def clear_cache(self):
         """Clear all cached responses"""
-        logger.info(f"Clearing cache. Current size: {self.cache.cacheSize() / 1024 / 1024:.2f} MB")
-        self.cache.clear()
+        if self.cache is not None:
+            logger.info(f"Clearing cache. Current size: {self.cache.cacheSize() / 1024 / 1024:.2f} MB")
+            self.cache.clear()
+        self.resources.clear()
 
     def fetch(self, endpoint: str, method: str = "GET", headers: Optional[Dict[str, str]] = None,
               body: Optional[Dict[str, Any]] = None, params: Optional[Dict[str, Any]] = None,
-              timeout_ms: int = 10000, retries: int = 3, use_cache: bool = True) -> str:
-        """Main method to initiate a request. Returns a request UUID for tracking."""
-        request_uuid = str(uuid.uuid4())
-        logger.debug(f"Starting request {request_uuid} for endpoint {endpoint}")
+              timeout_ms: int = 10000, retries: int = 3, use_cache: bool = True,
+              on_success: Optional[Callable[[Any], None]] = None,
+              on_failure: Optional[Callable[[str, int], None]] = None) -> str:
+        """
+        Main method to initiate a request. Returns a request UUID for tracking.
 
-        if endpoint in self._active_requests:
-            existing_uuid = self._active_requests[endpoint]
-            logger.warning(f"Request {request_uuid} ignored: active request {existing_uuid} for {endpoint}")
+        Requests are coalesced on (method, URL with query, body digest): while one is in
+        flight an identical fetch joins it and gets its UUID instead of going to the
+        network again. `dataFetched`/`fetchFailed` are still broadcast once per request,
+        `on_success(data)` and `on_failure(error_msg, status_code)` are called for every
+        caller that joined it.
+        """
+        url = self._build_url(endpoint, params)
+        key = self.request_key(method, url, body)
+        existing_uuid = self._active_requests.get(key)
+        if existing_uuid is not None:
+            logger.debug(f"Coalesced {method} {endpoint} into in-flight request {existing_uuid}")
+            self._add_callbacks(existing_uuid, on_success, on_failure)
             return existing_uuid
 
+        request_uuid = str(uuid.uuid4())
+        logger.debug(f"Starting request {request_uuid} for endpoint {endpoint}")
+
         # Store metadata including retry count
         self._request_metadata[request_uuid] = {
             "endpoint": endpoint,
             "method": method,
             "headers": headers,
             "body": body,
-            "params": params,
+            "url": url,
+            "key": key,
+            "host": f"{url.host()}:{url.port()}",
             "timeout_ms": timeout_ms,
             "use_cache": use_cache,
-            "retries_left": retries
+            "retries_left": retries,
+            "has_slot": False
         }
-        self._active_requests[endpoint] = request_uuid
+        self._active_requests[key] = request_uuid
+        self._add_callbacks(request_uuid, on_success, on_failure)
 
-        self._do_fetch(request_uuid)
+        self._schedule(request_uuid)
         return request_uuid
 
+    def request(self, endpoint: str, **kwargs) -> FetchReply:
+        """
+        Like `fetch`, but the result comes through a `FetchReply` of this call alone rather
+        than through the shared `dataFetched`/`fetchFailed` signals.
+        """
+        reply = FetchReply()
+        reply.request_uuid = self.fetch(endpoint, on_success=reply._resolve, on_failure=reply._reject, **kwargs)
+        return reply
+
+    def fetch_async(self, endpoint: str, **kwargs) -> asyncio.Future:
+        """
+        Like `fetch`, returning an asyncio future for the running (qasync) event loop.
+
+        The future resolves to the response data or fails with `FetchError`.
+        """
+        future = asyncio.get_event_loop().create_future()
+
+        def resolve(data):
+            if not future.done():
+                future.set_result(data)
+
+        def reject(error: str, status_code: int):
+            if not future.done():
+                future.set_exception(FetchError(error, status_code))
+
+        self.fetch(endpoint, on_success=resolve, on_failure=reject, **kwargs)
+        return future
+
+    def fetch_resource(self, endpoint: str, timeout_ms: int = 10000, use_cache: bool = True,
+                       on_success: Optional[Callable[[Any], None]] = None,
+                       on_failure: Optional[Callable[[str, int], None]] = None) -> str:
+        """
+        Fetch a resource list through the `ResourceCache`, stale-while-revalidate.
+
+        A cached list, fresh or stale, is handed to `on_success` right away. A stale or
+        missing one is fetched in the background, and `on_success` is only called again
+        when the content changed. With `use_cache=False` the list is always fetched and
+        delivered. Returns the UUID of the network request, empty if the cached list was fresh.
+        """
+        key = self._build_url(endpoint).toString()
+        entry = self.resources.get(key) if use_cache else None
+        if entry is not None:
+            if on_success is not None:
+                QTimer.singleShot(0, self, lambda data=entry.data: on_success(data))
+            if self.resources.is_fresh(key, endpoint):
+                return ""
+        delivered = entry is not None
+
+        def fetched(data):
+            changed = self.resources.put(key, data)
+            if on_success is not None and (changed or not delivered):
+                on_success(data)
+
+        def failed(error: str, status_code: int):
+            if delivered:
+                logger.warning(f"Revalidating {endpoint} failed, keeping the cached list: {error}")
+            elif on_failure is not None:
+                on_failure(error, status_code)
+
+        return self.fetch(endpoint, timeout_ms=timeout_ms, use_cache=False, on_success=fetched, on_failure=failed)
+
+    @staticmethod
+    def request_key(method: str, url: QUrl, body: Optional[Dict[str, Any]] = None) -> RequestKey:
+        """Identity of a request for coalescing: method, full URL and a digest of the body."""
+        digest = hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest() if body else ""
+        return method.upper(), url.toString(), digest
+
+    def _build_url(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> QUrl:
+        url = QUrl(f"{self.base_url}{endpoint}")
+        if params:
+            query = QUrlQuery()
+            for key, value in sorted(params.items()):
+                query.addQueryItem(key, str(value))
+            url.setQuery(query)
+        return url
+
+    def _add_callbacks(self, request_uuid: str, on_success: Optional[Callable], on_failure: Optional[Callable]):
+        if on_success is not None or on_failure is not None:
+            self._callbacks.setdefault(request_uuid, []).append((on_success, on_failure))
+
+    def _schedule(self, request_uuid: str):
+        """Send the request now, or queue it while its host is at `max_per_host`."""
+        metadata = self._request_metadata[request_uuid]
+        if not self.breaker.allow_request(probe=metadata["endpoint"] == self._ENDPOINT_VERSION):
+            # Fail fast while the server is down, asynchronously like a real reply
+            QTimer.singleShot(0, self, lambda: self._reject_unavailable(request_uuid))
+            return
+        host = metadata["host"]
+        if self._host_active.get(host, 0) >= self.max_per_host:
+            self._host_waiting.setdefault(host, deque()).append(request_uuid)
+            logger.debug(f"Request {request_uuid} waiting for a free slot on {host}")
+            return
+        self._host_active[host] = self._host_active.get(host, 0) + 1
+        metadata["has_slot"] = True
+        self._do_fetch(request_uuid)
+
+    def _reject_unavailable(self, request_uuid: str):
+        metadata = self._request_metadata.get(request_uuid)
+        if metadata is not None:
+            self._finish(request_uuid, error=f"Server {self.base_url} is unavailable, waiting for it to come back",
+                         broadcast=metadata["endpoint"] != self._ENDPOINT_VERSION)
+
+    def _retry(self, request_uuid: str):
+        timer = self._request_timers.pop(request_uuid, None)
+        if timer:
+            timer.deleteLater()
+        if request_uuid not in self._request_metadata:
+            return  # Cancelled meanwhile
+        if not self.breaker.allow_request():
+            self._reject_unavailable(request_uuid)
+            return
+        self._do_fetch(request_uuid)
+
+    def _release_slot(self, metadata: dict):
+        if not metadata.get("has_slot"):
+            return
+        metadata["has_slot"] = False
+        host = metadata["host"]
+        self._host_active[host] = max(0, self._host_active.get(host, 0) - 1)
+        waiting = self._host_waiting.get(host)
+        while waiting:
+            request_uuid = waiting.popleft()
+            if request_uuid in self._request_metadata:  # Skip cancelled ones
+                self._schedule(request_uuid)
+                break
+
     def _do_fetch(self, request_uuid: str):
         """Internal method to execute the actual network request"""
         metadata = self._request_metadata.get(request_uuid)
@@ -102,28 +303,13 @@ class BaseFetcher(QObject):
         method = metadata["method"].upper()
         headers = metadata["headers"] or {}
         body = metadata["body"]
-        params = metadata["params"]
+        url = metadata["url"]
         timeout_ms = metadata["timeout_ms"]
         use_cache = metadata["use_cache"]
 
-        # Build URL with query parameters
-        url = QUrl(f"{self.base_url}{endpoint}")
-        if params:
-            query = QUrlQuery()
-            for key, value in params.items():
-                query.addQueryItem(key, str(value))
-            url.setQuery(query)
-
-        # Prepare request
-        request = QNetworkRequest(url)
-
-        # Add auth header if available
-        if self.auth_token:
-            headers["Authorization"] = f"Bearer {self.auth_token}"
-
-        # Set headers
-        for key, value in headers.items():
-            request.setRawHeader(key.encode(), value.encode())
+        # Auth, connection limits and plain HTTP caching come from the session,
+        # resource lists are cached by `fetch_resource` instead
+        request = self.session.request(url, headers, use_cache=use_cache)
 
         # Prepare body data
         if body:
@@ -132,29 +318,11 @@ class BaseFetcher(QObject):
         else:
             data = QByteArray()
 
-        # Configure caching
-        cache_control = QNetworkRequest.CacheLoadControl.AlwaysNetwork
-        if use_cache:
-            cache_control = QNetworkRequest.CacheLoadControl.AlwaysCache
-            # Force revalidation if cached entry is expired
-            if self._is_cached_entry_expired(url):
-                logger.debug("Cache is Expired so renewing it..")
-                cache_control = QNetworkRequest.CacheLoadControl.AlwaysNetwork
-
-        request.setAttribute(QNetworkRequest.Attribute.CacheLoadControlAttribute, cache_control)
-
         # Execute request
         try:
-            if method == "GET":
-                reply = self.manager.get(request)
-            elif method == "POST":
-                reply = self.manager.post(request, data)
-            elif method == "PUT":
-                reply = self.manager.put(request, data)
-            elif method == "DELETE":
-                reply = self.manager.deleteResource(request)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
+            reply = self.session.send(method, request, data, owner=self)
+            # The session's manager is shared, only this reply's own signal is ours
+            reply.finished.connect(self._on_reply_finished)
 
             # Store reply reference
             self._pending_replies[reply] = (endpoint, request_uuid)
@@ -167,21 +335,7 @@ class BaseFetcher(QObject):
             self._setup_request_timeout(request_uuid, timeout_ms)
 
         except Exception as e:
-            self.fetchFailed.emit(f"Failed to initiate request: {str(e)}", 0, request_uuid)
-            self._cleanup_request(request_uuid)
-
-    def _is_cached_entry_expired(self, url: QUrl) -> bool:
-        """Check if a cached entry exists and is expired"""
-        logger.debug("Checking if cache entry is expired")
-        meta_data = self.cache.metaData(url)
-        if not meta_data.isValid():
-            return False
-
-        expiration_date = meta_data.expirationDate()
-        if not expiration_date.isValid():
-            return False
-
-        return expiration_date.secsTo(QDateTime.currentDateTime()) >= 0
+            self._finish(request_uuid, error=f"Failed to initiate request: {str(e)}")
 
     def _setup_request_timeout(self, request_uuid: str, timeout_ms: int):
         """Create and start a timeout timer for the request"""
@@ -197,19 +351,22 @@ class BaseFetcher(QObject):
         if timer:
             timer.deleteLater()
 
-        # Find and abort the associated reply
+        # Find and abort the associated reply, it is forgotten first so its finished signal is ignored
         for reply, (endpoint, uuid) in list(self._pending_replies.items()):
             if uuid == request_uuid:
-                reply.abort()
-                self.fetchFailed.emit("Request timed out", 0, request_uuid)
-                self._cleanup_request(request_uuid)
                 del self._pending_replies[reply]
+                reply.abort()
+                self._finish(request_uuid, error="Request timed out")
                 break
 
     def _on_progress(self, bytes_received: int, bytes_total: int, request_uuid: str):
         """Handle download progress updates"""
         self.progressUpdated.emit(bytes_received, bytes_total, request_uuid)
 
+    @Slot()
+    def _on_reply_finished(self):
+        self._on_finished(self.sender())
+
     def _on_finished(self, reply: QNetworkReply):
         """Handle completed network requests"""
         if reply not in self._pending_replies:
@@ -224,8 +381,8 @@ class BaseFetcher(QObject):
             timer.stop()
             timer.deleteLater()
 
-        # Verify this is still the active request for the endpoint
-        if self._active_requests.get(endpoint) != request_uuid:
+        # Verify this request is still wanted
+        if request_uuid not in self._request_metadata:
             logger.warning(f"Ignoring stale response for {endpoint}: {request_uuid}")
             reply.deleteLater()
             return
@@ -234,19 +391,25 @@ class BaseFetcher(QObject):
         cache_hit = reply.attribute(QNetworkRequest.SourceIsFromCacheAttribute) or False
         self.cacheUsed.emit(cache_hit)
         logger.info(f"Response for {endpoint} (UUID: {request_uuid}): {'Cache hit' if cache_hit else 'Network fetch'}")
+        if not cache_hit:
+            self.breaker.record_reply(reply, probe=endpoint == self._ENDPOINT_VERSION)
 
         # Handle server availability checks
         if endpoint == self._ENDPOINT_VERSION:
-            self.serverAvailable.emit(reply.error() == QNetworkReply.NoError)
-            self._cleanup_request(request_uuid)
+            available = reply.error() == QNetworkReply.NoError
+            self.serverAvailable.emit(available)
+            if available:
+                self._finish(request_uuid, data=True, broadcast=False)
+            else:
+                self._finish(request_uuid, error=self._get_error_message(reply, status_code),
+                             status_code=status_code, broadcast=False)
             reply.deleteLater()
             return
 
         # Handle authentication errors
         if status_code in (401, 403):
             self.authenticationRequired.emit()
-            self.fetchFailed.emit("Authentication required", status_code, request_uuid)
-            self._cleanup_request(request_uuid)
+            self._finish(request_uuid, error="Authentication required", status_code=status_code)
             reply.deleteLater()
             return
 
@@ -257,16 +420,20 @@ class BaseFetcher(QObject):
 
             self._handle_error(reply, request_uuid)
 
-            # Attempt retry if configured
-            if metadata.get("retries_left", 0) > 0:
+            # Retry after a backoff unless the server is known to be down, the request keeps its host slot
+            if metadata.get("retries_left", 0) > 0 and self.breaker.allow_request():
                 metadata["retries_left"] -= 1
-                logger.warning(f"Retrying request {request_uuid} ({metadata['retries_left']} retries left)")
-                self._do_fetch(request_uuid)
+                delay = metadata.setdefault("backoff", Backoff(self.RETRY_BASE_MS, self.RETRY_MAX_MS)).next_delay()
+                logger.warning(f"Retrying request {request_uuid} in {delay} ms ({metadata['retries_left']} retries left)")
+                timer = QTimer(self)
+                timer.setSingleShot(True)
+                timer.timeout.connect(lambda: self._retry(request_uuid))
+                timer.start(delay)
+                self._request_timers[request_uuid] = timer
                 reply.deleteLater()
                 return
 
-            self.fetchFailed.emit(error_msg, status_code, request_uuid)
-            self._cleanup_request(request_uuid)
+            self._finish(request_uuid, error=error_msg, status_code=status_code)
             reply.deleteLater()
             return
 
@@ -276,16 +443,36 @@ class BaseFetcher(QObject):
             data = reply.readAll().data().decode()
             if content_type and "application/json" in content_type.lower():
                 parsed_data = json.loads(data)
-                self.dataFetched.emit(parsed_data, request_uuid)
             else:
-                self.dataFetched.emit({"raw": data}, request_uuid)
+                parsed_data = {"raw": data}
         except Exception as e:
-            self.fetchFailed.emit(f"Failed to process response: {str(e)}", status_code, request_uuid)
+            self._finish(request_uuid, error=f"Failed to process response: {str(e)}", status_code=status_code)
+        else:
+            self._finish(request_uuid, data=parsed_data)
         finally:
-            self._cleanup_request(request_uuid)
             reply.deleteLater()
 
-    def _handle_error(self, reply: QNetworkReply):
+    def _finish(self, request_uuid: str, data: Any = None, error: Optional[str] = None, status_code: int = 0,
+                broadcast: bool = True):
+        """Release the request, then deliver the result to the signals and every joined caller."""
+        callbacks = self._callbacks.pop(request_uuid, [])
+        # Cleaned up first, so a caller may fetch the same resource again from its callback
+        self._cleanup_request(request_uuid)
+        if broadcast:
+            if error is None:
+                self.dataFetched.emit(data, request_uuid)
+            else:
+                self.fetchFailed.emit(error, status_code, request_uuid)
+        for on_success, on_failure in callbacks:
+            callback, args = (on_success, (data,)) if error is None else (on_failure, (error, status_code))
+            if callback is None:
+                continue
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.exception(f"Callback of request {request_uuid} failed: {e}")
+
+    def _handle_error(self, reply: QNetworkReply, request_uuid: str):
         """Classify and handle network-related errors from QNetworkReply."""
         status_code = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) or 0
         error_string = reply.errorString()
@@ -326,8 +513,7 @@ class BaseFetcher(QObject):
                 message = f"Unknown network error occurred (HTTP {status_code})."
 
         full_message = f"{message} | Details: {error_string}"
-        logger.exception(full_message)
-        self.fetchFailed.emit(full_message, status_code)
+        logger.warning(f"Request {request_uuid} failed: {full_message}")
 
         if server_down:
             self.serverAvailable.emit(False)
@@ -347,50 +533,46 @@ class BaseFetcher(QObject):
 
     def _cleanup_request(self, request_uuid: str):
         """Clean up all resources associated with a request"""
-        # Remove from active requests
-        for endpoint, uuid in list(self._active_requests.items()):
-            if uuid == request_uuid:
-                del self._active_requests[endpoint]
-                break
-
-        # Remove metadata
-        self._request_metadata.pop(request_uuid, None)
+        # Remove metadata and the coalescing entry, hand the host slot to a waiting request
+        metadata = self._request_metadata.pop(request_uuid, None)
+        if metadata is not None:
+            if self._active_requests.get(metadata["key"]) == request_uuid:
+                del self._active_requests[metadata["key"]]
+            self._release_slot(metadata)
 
         # Clean up timer if it exists
         timer = self._request_timers.pop(request_uuid, None)
-        if timer:
+        if timer and isValid(timer):
             timer.stop()
             timer.deleteLater()
 
     def cancel(self):
-        """Cancel all pending requests"""
-        for reply in list(self._pending_replies.keys()):
-            reply.abort()
-            endpoint, request_uuid = self._pending_replies.pop(reply)
-            if self._active_requests.get(endpoint) == request_uuid:
-                del self._active_requests[endpoint]
-            self._request_metadata.pop(request_uuid, None)
+        """Cancel all pending and waiting requests"""
+        for reply, (endpoint, request_uuid) in list(self._pending_replies.items()):
+            del self._pending_replies[reply]
+            if isValid(reply):
+                reply.abort()
 
         for timer in self._request_timers.values():
-            timer.stop()
-            timer.deleteLater()
+            if isValid(timer):
+                timer.stop()
+                timer.deleteLater()
         self._request_timers.clear()
+        self._request_metadata.clear()
+        self._active_requests.clear()
+        self._callbacks.clear()
+        self._host_active.clear()
+        self._host_waiting.clear()
 
     def cancel_request(self, request_uuid: str):
-        """Cancel a specific request by UUID"""
+        """Cancel a specific request by UUID, callers that joined it are not notified"""
         for reply, (endpoint, uuid) in list(self._pending_replies.items()):
             if uuid == request_uuid:
-                reply.abort()
                 del self._pending_replies[reply]
-                if self._active_requests.get(endpoint) == uuid:
-                    del self._active_requests[endpoint]
-                self._request_metadata.pop(uuid, None)
+                reply.abort()
                 break
-
-        timer = self._request_timers.pop(request_uuid, None)
-        if timer:
-            timer.stop()
-            timer.deleteLater()
+        self._callbacks.pop(request_uuid, None)
+        self._cleanup_request(request_uuid)
 
     def warm_up_cache(self):
         """Pre-fetch common API endpoints to populate cache"""
@@ -403,42 +585,68 @@ class BaseFetcher(QObject):
         ]
 
         for endpoint in endpoints:
-            request_uuid = self.fetch(endpoint=endpoint)
-            logger.info(f"Warming up cache for {endpoint} (UUID: {request_uuid})")
+            request_uuid = self.fetch_resource(endpoint)
+            logger.info(f"Warming up cache for {endpoint} (UUID: {request_uuid or 'fresh'})")
 
     # Simplified endpoint methods using constants
-    def fetch_models(self, timeout_ms: int = 10000, use_cache: bool = True) -> str:
-        return self.fetch(endpoint=self._ENDPOINT_MODELS, timeout_ms=timeout_ms, use_cache=use_cache)
-
-    def fetch_vaes(self, timeout_ms: int = 10000, use_cache: bool = True) -> str:
-        return self.fetch(endpoint=self._ENDPOINT_VAES, timeout_ms=timeout_ms, use_cache=use_cache)
-
-    def fetch_embeddings(self, timeout_ms: int = 10000, use_cache: bool = True) -> str:
-        return self.fetch(endpoint=self._ENDPOINT_EMBEDDINGS, timeout_ms=timeout_ms, use_cache=use_cache)
-
-    def fetch_loras(self, timeout_ms: int = 10000, use_cache: bool = True) -> str:
-        return self.fetch(endpoint=self._ENDPOINT_LORAS, timeout_ms=timeout_ms, use_cache=use_cache)
-
-    def fetch_styles(self, timeout_ms: int = 10000, use_cache: bool = True) -> str:
-        return self.fetch(endpoint=self._ENDPOINT_STYLES, timeout_ms=timeout_ms, use_cache=use_cache)
-
-    def fetch_upscalers(self, timeout_ms: int = 10000, use_cache: bool = True) -> str:
-        return self.fetch(endpoint=self._ENDPOINT_UPSCALERS, timeout_ms=timeout_ms, use_cache=use_cache)
-
-    def fetch_samplers(self, timeout_ms: int = 10000, use_cache: bool = True) -> str:
-        return self.fetch(endpoint=self._ENDPOINT_SAMPLERS, timeout_ms=timeout_ms, use_cache=use_cache)
-
-    def refresh_models(self, timeout_ms: int = 10000):
-        self.fetch(endpoint=self._ENDPOINT_REFRESH_CHECKPOINTS, method="POST", timeout_ms=timeout_ms, use_cache=False)
-        self.clear_cache()
-
-    def refresh_loras(self, timeout_ms: int = 10000):
-        self.fetch(endpoint=self._ENDPOINT_REFRESH_LORAS, method="POST", timeout_ms=timeout_ms, use_cache=False)
-        self.clear_cache()
+    def fetch_models(self, timeout_ms: int = 10000, use_cache: bool = True, on_success: Optional[Callable] = None,
+                     on_failure: Optional[Callable] = None) -> str:
+        return self.fetch_resource(self._ENDPOINT_MODELS, timeout_ms=timeout_ms, use_cache=use_cache,
+                                   on_success=on_success, on_failure=on_failure)
+
+    def fetch_vaes(self, timeout_ms: int = 10000, use_cache: bool = True, on_success: Optional[Callable] = None,
+                   on_failure: Optional[Callable] = None) -> str:
+        return self.fetch_resource(self._ENDPOINT_VAES, timeout_ms=timeout_ms, use_cache=use_cache,
+                                   on_success=on_success, on_failure=on_failure)
+
+    def fetch_embeddings(self, timeout_ms: int = 10000, use_cache: bool = True, on_success: Optional[Callable] = None,
+                         on_failure: Optional[Callable] = None) -> str:
+        return self.fetch_resource(self._ENDPOINT_EMBEDDINGS, timeout_ms=timeout_ms, use_cache=use_cache,
+                                   on_success=on_success, on_failure=on_failure)
+
+    def fetch_loras(self, timeout_ms: int = 10000, use_cache: bool = True, on_success: Optional[Callable] = None,
+                    on_failure: Optional[Callable] = None) -> str:
+        return self.fetch_resource(self._ENDPOINT_LORAS, timeout_ms=timeout_ms, use_cache=use_cache,
+                                   on_success=on_success, on_failure=on_failure)
+
+    def fetch_styles(self, timeout_ms: int = 10000, use_cache: bool = True, on_success: Optional[Callable] = None,
+                     on_failure: Optional[Callable] = None) -> str:
+        return self.fetch_resource(self._ENDPOINT_STYLES, timeout_ms=timeout_ms, use_cache=use_cache,
+                                   on_success=on_success, on_failure=on_failure)
+
+    def fetch_upscalers(self, timeout_ms: int = 10000, use_cache: bool = True, on_success: Optional[Callable] = None,
+                        on_failure: Optional[Callable] = None) -> str:
+        return self.fetch_resource(self._ENDPOINT_UPSCALERS, timeout_ms=timeout_ms, use_cache=use_cache,
+                                   on_success=on_success, on_failure=on_failure)
+
+    def fetch_samplers(self, timeout_ms: int = 10000, use_cache: bool = True, on_success: Optional[Callable] = None,
+                       on_failure: Optional[Callable] = None) -> str:
+        return self.fetch_resource(self._ENDPOINT_SAMPLERS, timeout_ms=timeout_ms, use_cache=use_cache,
+                                   on_success=on_success, on_failure=on_failure)
+
+    def refresh_models(self, timeout_ms: int = 10000, on_success: Optional[Callable[[Any], None]] = None) -> str:
+        return self._refresh(self._ENDPOINT_REFRESH_CHECKPOINTS, self._ENDPOINT_MODELS, timeout_ms, on_success)
+
+    def refresh_loras(self, timeout_ms: int = 10000, on_success: Optional[Callable[[Any], None]] = None) -> str:
+        return self._refresh(self._ENDPOINT_REFRESH_LORAS, self._ENDPOINT_LORAS, timeout_ms, on_success)
+
+    def _refresh(self, endpoint: str, resource: str, timeout_ms: int,
+                 on_success: Optional[Callable[[Any], None]]) -> str:
+        def refreshed(data):
+            # Only the rescanned list is stale, and only once the server rescanned
+            self.resources.invalidate(self._build_url(resource).toString())
+            if on_success is not None:
+                on_success(data)
+        return self.fetch(endpoint=endpoint, method="POST", timeout_ms=timeout_ms, use_cache=False, on_success=refreshed)
 
     def check_server(self, timeout_ms: int = 5000) -> str:
         return self.fetch(endpoint=self._ENDPOINT_VERSION, timeout_ms=timeout_ms, use_cache=False)
 
+    def fetch_options(self, timeout_ms: int = 10000, on_success: Optional[Callable] = None,
+                      on_failure: Optional[Callable] = None) -> str:
+        return self.fetch(endpoint=self._ENDPOINT_OPTIONS, timeout_ms=timeout_ms, use_cache=False,
+                          on_success=on_success, on_failure=on_failure)
+
     def fetch_progress(self, timeout_ms=1000, retries: int = 1) -> str:
         """Specialized progress fetcher with shorter default timeout"""
         return self.fetch(
@@ -448,11 +656,16 @@ class BaseFetcher(QObject):
             retries=retries  # Fewer retries for progress updates
         )
 
-    def fetch_status(self, timeout_ms = 1000, retries: int = 1)->str:
-        return self.fetch(endpoint=self._ENDPOINT_STATUS, timeout_ms=timeout_ms, use_cache=False, retries=retries)
+    def fetch_status(self, timeout_ms = 1000, retries: int = 1, on_success: Optional[Callable] = None,
+                     on_failure: Optional[Callable] = None)->str:
+        return self.fetch(endpoint=self._ENDPOINT_STATUS, timeout_ms=timeout_ms, use_cache=False, retries=retries,
+                          on_success=on_success, on_failure=on_failure)
 
     def __del__(self):
-        self.cancel()
+        try:
+            self.cancel()
+        except RuntimeError:
+            pass  # The Qt side is already gone at interpreter exit
 
 
 # from PySide6.QtCore import QObject, Signal, QTimer, Slot
@@ -460,112 +673,225 @@ class BaseFetcher(QObject):
 
 class ProgressTracker(QObject):
     """
-    Handles real-time progress updates from the Stable Diffusion API.
-    Uses BaseFetcher internally but manages its own polling and state.
+    Adaptive poller of `/sdapi/v1/progress`.
+
+    Polls are chained, the next one is scheduled once the previous one answered. The
+    interval follows the expected duration of the next sampling step, derived from the
+    ETA, within `min_interval_ms` and `max_interval_ms`. While progress stalls (model
+    loading, VAE decode, a job waiting in the server queue) the interval backs off, and
+    failed polls back off exponentially with jitter instead of being retried at once.
+
+    The preview image is most of a progress response, so it is polled separately from the
+    step/ETA data: only while `preview_enabled` (a preview is visible), at most every
+    `preview_interval_ms`, and only when it can have changed. Servers that report
+    `id_live_preview` get it sent back and leave out an unchanged image, for the others a
+    preview is only asked for once a sampling step completed since the last one.
 
     Signals:
         progressUpdated (float): Emits progress value between 0.0 and 1.0.
         progressData (dict): Emits full progress response dictionary.
-        stalled (): Emits if no progress is detected within stall timeout.
+        stalled (): Emits once when no progress is detected within the stall timeout.
         completed (): Emits when progress reaches 1.0 and monitoring stops.
+        statsUpdated (float, float): Polls per second and bytes per second, over the last few seconds.
     """
 
     progressUpdated = Signal(float)
     progressData = Signal(dict)
     stalled = Signal()
     completed = Signal()
+    statsUpdated = Signal(float, float)
+
+    REQUEST_TIMEOUT_MS = 1000
+    STATS_WINDOW_S = 5.0
+    STALL_BACKOFF = 1.5
 
-    def __init__(self, base_fetcher, parent=None):
+    def __init__(self, base_fetcher, parent=None, min_interval_ms: int = 250, max_interval_ms: int = 4000,
+                 stall_timeout_ms: int = 3000):
         super().__init__(parent)
         self.fetcher = base_fetcher
-        self._poll_timer = QTimer(self)
-        self._stall_timer = QTimer(self)
-        self._last_progress = 0.0
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.stall_timeout_ms = stall_timeout_ms
+        self.preview_interval_ms = 500
+        self.preview_enabled = True
         self._active = False
-
-        # Configure timers
-        self._poll_timer.setInterval(500)       # How often to poll the API
-        self._stall_timer.setInterval(3000)     # Stall detection timeout
+        self._request_uuid: Optional[str] = None
+        self._reply_bytes = 0
+        self._interval = min_interval_ms
+        self._backoff = Backoff(min_interval_ms, max_interval_ms)
+        self._history = deque()  # (monotonic time, response bytes) of recent polls
+        self._reset()
+
+        # One single shot timer: the next poll, or the watchdog of the running one
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setSingleShot(True)
         self._poll_timer.timeout.connect(self._poll)
-        self._stall_timer.timeout.connect(self._handle_stall)
 
-        # Connect fetcher responses to local handlers
-        self.fetcher.dataFetched.connect(self._handle_progress_response)
-        self.fetcher.fetchFailed.connect(self._handle_progress_failure)
+        # Responses come through per-request callbacks, only the byte count is broadcast
+        self.fetcher.progressUpdated.connect(self._handle_download_progress)
+
+    def _reset(self):
+        now = time.monotonic()
+        self._last_progress = 0.0
+        self._last_step = -1
+        self._last_change = now
+        self._stall_reported = False
+        self._preview_id: Optional[int] = None  # id_live_preview of the last preview, if the server reports it
+        self._preview_step = -1
+        self._preview_time = 0.0
+        self._last_preview: Optional[str] = None
 
     def start_monitoring(self, interval_ms=500):
         """
         Begin polling for progress updates.
         Args:
-            interval_ms (int): Interval between progress checks in milliseconds.
+            interval_ms (int): Minimum interval between two preview images in milliseconds.
         """
+        self.preview_interval_ms = interval_ms
         if not self._active:
             self._active = True
-            self._poll_timer.setInterval(interval_ms)
-            self._poll_timer.start()
-            self._stall_timer.start()
+            self._interval = self.min_interval_ms
+            self._backoff.reset()
+            self._reset()
             self._poll()  # Initial fetch
 
     def stop_monitoring(self):
         """
         Stop all polling and internal timers.
         """
+        if self._active and self._history:
+            polls, rate = self.stats()
+            logger.debug(f"Progress polling stopped at {polls:.1f} polls/s, {rate / 1024:.1f} KB/s")
         self._active = False
+        self._request_uuid = None
         self._poll_timer.stop()
-        self._stall_timer.stop()
+
+    def set_preview_enabled(self, enabled: bool):
+        """Whether preview images are wanted, i.e. a live preview is visible."""
+        self.preview_enabled = enabled
+
+    def stats(self) -> Tuple[float, float]:
+        """Polls per second and response bytes per second over the last `STATS_WINDOW_S` seconds."""
+        if not self._history:
+            return 0.0, 0.0
+        span = max(time.monotonic() - self._history[0][0], self._interval / 1000, 1e-3)
+        return len(self._history) / span, sum(size for _, size in self._history) / span
 
     @Slot()
     def _poll(self):
         """
         Internal: Triggers a fetch from the /progress endpoint.
         """
-        if self._active:
-            self.fetcher.fetch(
-                endpoint="/sdapi/v1/progress",
-                use_cache=False,
-                timeout_ms=1000,
-                retries=1
-            )
+        if not self._active:
+            return
+        params = {"skip_current_image": "false" if self._want_preview() else "true"}
+        if self._preview_id is not None:
+            params["id_live_preview"] = self._preview_id
+        if self._request_uuid is not None:
+            self.fetcher.cancel_request(self._request_uuid)  # The watchdog fired, give up on the lost poll
+        self._reply_bytes = 0
+        self._request_uuid = self.fetcher.fetch(
+            endpoint="/sdapi/v1/progress",
+            params=params,
+            use_cache=False,
+            timeout_ms=self.REQUEST_TIMEOUT_MS,
+            retries=0,
+            on_success=self._handle_progress_response,
+            on_failure=self._handle_progress_failure
+        )
+        # Watchdog, rescheduled as soon as the reply or the failure arrives
+        self._poll_timer.start(self.REQUEST_TIMEOUT_MS + self.max_interval_ms)
+
+    def _want_preview(self) -> bool:
+        if not self.preview_enabled:
+            return False
+        if (time.monotonic() - self._preview_time) * 1000 < self.preview_interval_ms:
+            return False
+        # With id_live_preview the server filters unchanged previews itself
+        return self._preview_id is not None or self._last_step != self._preview_step
 
-    @Slot(object, str)
-    def _handle_progress_response(self, data, _):
+    @Slot(int, int, str)
+    def _handle_download_progress(self, received: int, _, request_uuid: str):
+        if request_uuid == self._request_uuid:
+            self._reply_bytes = received
+
+    def _handle_progress_response(self, data):
         """
         Processes successful progress response from BaseFetcher.
-        Emits progress signals and handles stall detection.
+        Emits progress signals and schedules the next poll.
         """
-        if not self._active:
+        if not self._active or not isinstance(data, dict):
             return
+        self._request_uuid = None
+        self._backoff.reset()
+        now = time.monotonic()
+        self._record(now, self._reply_bytes)
+
+        progress = float(data.get("progress") or 0.0)
+        state = data.get("state") or {}
+        step = int(state.get("sampling_step") or 0)
+        if data.get("id_live_preview") is not None:
+            self._preview_id = data["id_live_preview"]
+        image = data.get("current_image")
+        if image:
+            if image == self._last_preview:
+                data["current_image"] = None  # Unchanged, don't decode it again
+            self._last_preview = image
+            self._preview_time = now
+            self._preview_step = step
+
+        changed = progress != self._last_progress or step != self._last_step
+        if changed:
+            self._last_change = now
+            self._stall_reported = False
+        self._last_progress = progress
+        self._last_step = step
 
-        progress = float(data.get("progress", 0.0))
         self.progressUpdated.emit(progress)
         self.progressData.emit(data)
-
-        # if progress >= 1.0:
-        #     self.completed.emit()
-        #     self.stop_monitoring()
-        # else:
-        #     self._stall_timer.start()
-
-        self._last_progress = progress
-
-    @Slot(str, int, str)
-    def _handle_progress_failure(self, error, code, _):
+        if self._active:
+            self._poll_timer.start(self._next_interval(data, now, changed))
+
+    def _next_interval(self, data: dict, now: float, changed: bool) -> int:
+        state = data.get("state") or {}
+        eta = float(data.get("eta_relative") or 0.0)
+        remaining_steps = int(state.get("sampling_steps") or 0) - int(state.get("sampling_step") or 0)
+        stalled = not changed and (now - self._last_change) * 1000 >= self.stall_timeout_ms
+        if stalled:
+            if not self._stall_reported:
+                self._stall_reported = True
+                self.stalled.emit()
+            interval = self._interval * self.STALL_BACKOFF
+        elif eta > 0 and remaining_steps > 0:
+            interval = eta / remaining_steps * 1000  # Expected time until the next step
+        else:
+            interval = self._interval
+        if self.preview_enabled and not stalled:
+            interval = min(interval, self.preview_interval_ms)
+        self._interval = int(min(max(interval, self.min_interval_ms), self.max_interval_ms))
+        return self._interval
+
+    def _record(self, now: float, size: int):
+        self._history.append((now, size))
+        while self._history and now - self._history[0][0] > self.STATS_WINDOW_S:
+            self._history.popleft()
+        self.statsUpdated.emit(*self.stats())
+
+    def _handle_progress_failure(self, error, code):
         """
         Handles fetch failure for /progress.
-        Retries if error is not an auth issue.
+        Backs off exponentially, stops on auth errors.
         """
-        if self._active and code not in (401, 403):
-            self._poll()  # Retry immediately
-
-    @Slot()
-    def _handle_stall(self):
-        """
-        Emits stalled signal if no progress change is detected.
-        Still attempts to re-poll to avoid getting stuck.
-        """
-        self.stalled.emit()
-        if self._active:
-            self._poll()
+        if not self._active:
+            return
+        self._request_uuid = None
+        if code in (401, 403):
+            logger.warning("Progress polling stopped, authentication required")
+            self.stop_monitoring()
+            return
+        self._interval = self._backoff.next_delay()
+        logger.debug(f"Progress poll failed ({error}), retrying in {self._interval} ms")
+        self._poll_timer.start(self._interval)
 
 
 class StatusTracker(QObject):
@@ -590,6 +916,8 @@ class StatusTracker(QObject):
         self._poll_timer = QTimer(self)
         self._stall_timer = QTimer(self)
         self._active = False
+        self._interval_ms = 1500
+        self._backoff = Backoff(500, 15000)
 
         # Configure timers
         self._poll_timer.setInterval(1500)       # How often to poll the API
@@ -597,10 +925,6 @@ class StatusTracker(QObject):
         self._poll_timer.timeout.connect(self._poll)
         self._stall_timer.timeout.connect(self._handle_stall)
 
-        # Connect fetcher responses to local handlers
-        self.fetcher.dataFetched.connect(self._handle_status_response)
-        self.fetcher.fetchFailed.connect(self._handle_status_failure)
-
     def start_monitoring(self, interval_ms=500):
         """
         Begin polling for progress updates.
@@ -609,8 +933,9 @@ class StatusTracker(QObject):
         """
         if not self._active:
             self._active = True
-            self._poll_timer.setInterval(interval_ms)
-            self._poll_timer.start()
+            self._interval_ms = interval_ms
+            self._backoff.reset()
+            self._poll_timer.start(interval_ms)
             self._stall_timer.start()
             self._poll()  # Initial fetch
 
@@ -628,27 +953,36 @@ class StatusTracker(QObject):
         Internal: Triggers a fetch from the /progress endpoint.
         """
         if self._active:
-            self.fetcher.fetch_status()
+            self.fetcher.fetch_status(on_success=self._handle_status_response,
+                                      on_failure=self._handle_status_failure)
 
-    @Slot(object, str)
-    def _handle_status_response(self, data, _):
+    def _handle_status_response(self, data):
         """
         Processes successful progress response from BaseFetcher.
         Emits progress signals and handles stall detection.
         """
         if not self._active:
             return
+        if self._backoff.attempts:
+            # Recovered, back to the regular interval
+            self._backoff.reset()
+            self._poll_timer.start(self._interval_ms)
+            self._stall_timer.start()
 
         self.statusData.emit(data)
 
-    @Slot(str, int, str)
-    def _handle_status_failure(self, error, code, _):
+    def _handle_status_failure(self, error, code):
         """
-        Handles fetch failure for /progress.
-        Retries if error is not an auth issue.
+        Handles fetch failure for /status.
+        Backs off exponentially, stops on auth errors.
         """
-        if self._active and code not in (401, 403):
-            self._poll()  # Retry immediately
+        if not self._active:
+            return
+        if code in (401, 403):
+            self.stop_monitoring()
+            return
+        self._stall_timer.stop()
+        self._poll_timer.start(self._backoff.next_delay())
 
     @Slot()
     def _handle_stall(self):
@@ -2,33 +2,27 @@ import json
 import uuid
 from typing import Optional
 
-from PySide6.QtCore import QObject, Signal, QTimer, QUrl
-from PySide6.QtNetwork import (
-    QNetworkDiskCache, QNetworkAccessManager,
-    QNetworkRequest, QNetworkReply
-)
+from PySide6.QtCore import QObject, Signal, Slot, QTimer
+from PySide6.QtNetwork import QNetworkRequest, QNetworkReply
 from loguru import logger
 
+from api.session import network_session
+
 
 class BaseFetcher(QObject):
     dataFetched = Signal(str, object)        # uid, data
     fetchFailed = Signal(str, int, str)      # uid, status, error
     requestStarted = Signal(str)             # uid
 
-    def __init__(self, auth_token: Optional[str] = None,
-                 cache_limit: int = 100 * 1024 * 1024, parent: Optional[QObject] = None):
+    def __init__(self, auth_token: Optional[str] = None, parent: Optional[QObject] = None):
         super().__init__(parent)
         self.base_url = "https://civitai.com/api/v1/models"
-        self.auth_token = auth_token
-        self.cache_limit = cache_limit
-
-        self.cache = QNetworkDiskCache(self)
-        self.cache.setCacheDirectory("./.cache")
-        self.cache.setMaximumCacheSize(self.cache_limit)
 
-        self.manager = QNetworkAccessManager(self)
-        self.manager.setCache(self.cache)
-        self.manager.finished.connect(self._on_finished)
+        self.session = network_session("civitai")
+        if auth_token:
+            self.session.auth_token = auth_token
+        self.manager = self.session.manager
+        self.cache = self.session.cache
 
         self.timeout_timer = QTimer(self)
         self.timeout_timer.setSingleShot(True)
@@ -69,19 +63,14 @@ class BaseFetcher(QObject):
         return uid
 
     def _fetch(self, uid: str, url: str, force_fetch: bool = False):
-        request = QNetworkRequest(QUrl(url))
-        headers = {"Accept": "application/json"}
-        if self.auth_token:
-            headers["Authorization"] = f"Bearer {self.auth_token}"
-        for key, value in headers.items():
-            request.setRawHeader(key.encode(), value.encode())
-
+        request = self.session.request(url, {"Accept": "application/json"})
         if force_fetch:
             request.setAttribute(QNetworkRequest.CacheLoadControlAttribute,
                                  QNetworkRequest.AlwaysNetwork)
 
         try:
-            reply = self.manager.get(request)
+            reply = self.session.get(request, owner=self)
+            reply.finished.connect(self._on_reply_finished)
             self.active_requests[uid] = reply
             self.current_uid = uid
 
@@ -111,6 +100,10 @@ class BaseFetcher(QObject):
     def _on_progress(self, uid: str, received: int, total: int):
         logger.debug(f"[{uid}] Download progress: {received}/{total} bytes")
 
+    @Slot()
+    def _on_reply_finished(self):
+        self._on_finished(self.sender())
+
     def _on_finished(self, reply: QNetworkReply):
         uid = reply.property("uid")
         self.timeout_timer.stop()
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from PySide6.QtCore import QObject, QTimer
+from loguru import logger
+
+from utils.cache_manager import cache_manager
+
+
+@dataclass
+class ResourceEntry:
+    data: Any
+    digest: str
+    fetched_at: float  # time.time() of the last successful fetch or revalidation
+
+
+class ResourceCache(QObject):
+    """
+    Parsed server resource lists (models, LoRAs, styles...) kept across runs.
+
+    Entries are keyed by full URL and expire after the TTL of their endpoint, `TTLS` in
+    seconds. Stale entries are still served, `BaseFetcher` hands them out at once and
+    revalidates them in the background. A digest of the content tells whether the
+    revalidated list actually changed.
+    """
+    TTLS = {
+        "/sdapi/v1/sd-models": 600,
+        "/sdapi/v1/sd-vae": 600,
+        "/sdapi/v1/lora": 600,
+        "/sdapi/v1/embeddings": 600,
+        "/sdapi/v1/prompt-styles": 300,
+        "/sdapi/v1/samplers": 86400,
+        "/sdapi/v1/upscalers": 86400,
+    }
+    DEFAULT_TTL = 600
+
+    def __init__(self, path: Optional[str] = None, parent=None):
+        super().__init__(parent)
+        self.path = Path(path) if path else None
+        self._entries: Dict[str, ResourceEntry] = {}
+
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(500)
+        self._save_timer.timeout.connect(self.save)
+        self.load()
+
+    @staticmethod
+    def digest(data: Any) -> str:
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+    def ttl(self, endpoint: str) -> float:
+        return self.TTLS.get(endpoint, self.DEFAULT_TTL)
+
+    def get(self, key: str) -> Optional[ResourceEntry]:
+        return self._entries.get(key)
+
+    def is_fresh(self, key: str, endpoint: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and time.time() - entry.fetched_at < self.ttl(endpoint)
+
+    def put(self, key: str, data: Any) -> bool:
+        """Store a fetched list. Returns whether its content differs from the cached one."""
+        digest = self.digest(data)
+        entry = self._entries.get(key)
+        changed = entry is None or entry.digest != digest
+        self._entries[key] = ResourceEntry(data, digest, time.time())
+        self._changed()
+        return changed
+
+    def invalidate(self, key: str):
+        """Make an entry stale, it is still served until the revalidation answers."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.fetched_at = 0.0
+            self._changed()
+
+    def clear(self):
+        self._entries.clear()
+        self._save_timer.stop()
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+    def size(self) -> int:
+        return self.path.stat().st_size if self.path is not None and self.path.exists() else 0
+
+    def _changed(self):
+        if self.path is not None:
+            self._save_timer.start()
+
+    def save(self):
+        if self.path is None:
+            return
+        entries = {key: {"data": entry.data, "digest": entry.digest, "fetched_at": entry.fetched_at}
+                   for key, entry in self._entries.items()}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": entries}, f)
+            os.replace(temp_path, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Failed to save resource cache to {self.path}: {e}")
+
+    def load(self) -> int:
+        """Restore the entries saved by a previous run. Returns how many were restored."""
+        if self.path is None or not self.path.exists():
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", {})
+            self._entries = {key: ResourceEntry(entry["data"], entry["digest"], float(entry["fetched_at"]))
+                             for key, entry in entries.items()}
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.error(f"Failed to restore resource cache from {self.path}: {e}")
+            return 0
+        return len(self._entries)
+
+
+_resource_cache: Optional[ResourceCache] = None
+
+
+def resource_cache() -> ResourceCache:
+    """The shared `ResourceCache`, created on first use."""
+    global _resource_cache
+    if _resource_cache is None:
+        _resource_cache = ResourceCache(str(cache_manager().path("api", "resources.json")))
+        cache_manager().register("resources", _resource_cache.clear, lambda: {"bytes": _resource_cache.size()})
+    return _resource_cache
@@ -1,8 +1,13 @@
 import json
-from typing import Dict, Any, Optional
+import uuid
+from typing import Dict, Any, Optional, Set
 from loguru import logger
-from PySide6.QtCore import QObject, QEventLoop, Slot, QByteArray, QUrl, Signal
-from PySide6.QtNetwork import QNetworkReply, QNetworkRequest, QNetworkAccessManager
+from PySide6.QtCore import Qt, QObject, QEventLoop, Slot, QByteArray, Signal
+from PySide6.QtNetwork import QNetworkReply, QNetworkRequest
+
+from api.generator.response_parser import ResponseStream
+from api.resilience import breaker_for
+from api.session import network_session
 
 
 class ImageGenerator(QObject):
@@ -16,6 +21,11 @@ class ImageGenerator(QObject):
     generation_completed = Signal(dict)  # full response
     generation_failed = Signal(str, int)  # error message, status code
 
+    # Per-job signals, several generations can be in flight at once
+    job_completed = Signal(str, dict)  # job id, full response
+    job_failed = Signal(str, str, int)  # job id, error message, status code
+    image_received = Signal(str, int, object)  # job id, index, encoded image bytes, as soon as each is decoded
+
     #server
     serverAvailable = Signal(bool)
 
@@ -26,26 +36,60 @@ class ImageGenerator(QObject):
     def __init__(self, base_url: str = "http://127.0.0.1:7860", parent=None):
         super().__init__(parent)
         self.base_url = base_url.rstrip('/')
+        self.breaker = breaker_for(self.base_url)
         self._setup_network()
 
     def _setup_network(self):
         """Initialize network components"""
-        self.network_manager = QNetworkAccessManager(self)
-        self.network_manager.finished.connect(self._handle_response)
+        self.session = network_session("api")
+        self.network_manager = self.session.manager
+        self._replies: Dict[QNetworkReply, str] = {}  # reply -> job id
+        self._streams: Dict[QNetworkReply, ResponseStream] = {}
+        self._unsent: Set[str] = set()  # Jobs whose `job_failed` is being emitted without having reached the server
 
     # Public API
     def txt2img(self, payload: Dict[str, Any]) -> bool:
         """Start text-to-image generation asynchronously."""
-        return self._generate(payload, "txt2img")
+        return self._generate(payload, "txt2img") is not None
 
     def img2img(self, payload: Dict[str, Any]) -> bool:
         """Start image-to-image generation asynchronously."""
-        return self._generate(payload, "img2img")
+        return self._generate(payload, "img2img") is not None
+
+    def submit(self, payload: Dict[str, Any], endpoint: str, job_id: Optional[str] = None) -> Optional[str]:
+        """
+        Post a generation and track its reply under `job_id`.
+
+        Returns:
+            The job id, or None if the request could not be started.
+        """
+        return self._generate(payload, endpoint, job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Abort the in-flight request of a job, it then fails with OperationCanceledError."""
+        for reply, reply_job in self._replies.items():
+            if reply_job == job_id:
+                reply.abort()
+                return True
+        return False
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._replies)
+
+    def never_sent(self, job_id: str) -> bool:
+        """
+        While `job_failed` of `job_id` is emitted: whether the request never reached the
+        server (refused, host not found, breaker open), so posting it again can't run it twice.
+        """
+        return job_id in self._unsent
 
     def generate_sync(self, payload: Dict[str, Any], endpoint: str = "txt2img") -> Dict[str, Any]:
         """
         Synchronous generation that blocks until completion.
 
+        Spins a nested Qt event loop, scripts without one use `api.aio.AsyncSDClient`.
+
         Args:
             payload: Generation parameters
             endpoint: Either 'txt2img' or 'img2img'
@@ -84,48 +128,86 @@ class ImageGenerator(QObject):
         return result[0]
 
     # Core generation
-    def _generate(self, payload: Dict[str, Any], endpoint: str) -> bool:
+    def _generate(self, payload: Dict[str, Any], endpoint: str, job_id: Optional[str] = None) -> Optional[str]:
         """Internal method to initiate generation request."""
-        url = QUrl(f"{self.base_url}/sdapi/v1/{endpoint}")
-        request = QNetworkRequest(url)
+        job_id = job_id or uuid.uuid4().hex
+        if not self.breaker.allow_request():
+            self._fail(job_id, f"Server {self.base_url} is unavailable, waiting for it to come back", 0, sent=False)
+            return None
+        # No transfer timeout, the server sends nothing until the images are done
+        request = self.session.request(f"{self.base_url}/sdapi/v1/{endpoint}", timeout_ms=0, use_cache=False)
         request.setHeader(QNetworkRequest.ContentTypeHeader, "application/json")
 
         try:
             json_data = json.dumps(payload).encode('utf-8')
-            self.network_manager.post(request, QByteArray(json_data))
+            reply = self.session.post(request, QByteArray(json_data), owner=self)
+            reply.finished.connect(self._on_reply_finished)
+            self._replies[reply] = job_id
+            stream = ResponseStream(reply, self)
+            stream.imageDecoded.connect(lambda index, image, job=job_id: self.image_received.emit(job, index, image))
+            self._streams[reply] = stream
             self.generation_started.emit(endpoint)
-            return True
+            return job_id
         except Exception as e:
-            self.generation_failed.emit(f"Request failed: {str(e)}", 0)
-            return False
+            self._fail(job_id, f"Request failed: {str(e)}", 0, sent=False)
+            return None
 
     # Response handling
-    @Slot(QNetworkReply)
+    @Slot()
+    def _on_reply_finished(self):
+        self._handle_response(self.sender())
+
     def _handle_response(self, reply: QNetworkReply):
-        """Handle API responses."""
+        """
+        Handle API responses.
+
+        The body has already been streamed into a `ResponseStream` that parses it on a
+        worker thread, the result arrives in `_on_parsed`.
+        """
+        job_id = self._replies.pop(reply, "")
+        stream = self._streams.pop(reply, None)
+        self.breaker.record_reply(reply)
         try:
-            if reply.error() != QNetworkReply.NoError:
-                self._handle_error(reply)
+            if reply.error() != QNetworkReply.NoError or stream is None:
+                self._handle_error(reply, job_id)
+                if stream is not None:
+                    stream.deleteLater()
                 return
-
-            response = json.loads(bytes(reply.readAll().data()).decode('utf-8'))
             endpoint = reply.url().path().split('/')[-1]
+            stream.parsed.connect(lambda response, error: self._on_parsed(stream, job_id, endpoint, response, error))
+            stream.finish()
+        finally:
+            reply.deleteLater()
 
+    def _on_parsed(self, stream: ResponseStream, job_id: str, endpoint: str, response: Optional[dict], error: str):
+        stream.deleteLater()
+        if response is None:
+            # The server did generate, only its answer couldn't be read
+            self._fail(job_id, error, 500)
+            return
+        try:
+            # Decoded image bytes instead of base64 strings, see save_sdwebui_image_with_info
+            response["images"] = stream.images
+            self.job_completed.emit(job_id, response)
             self.generation_completed.emit(response)
 
             if endpoint == "txt2img":
                 self.txt2img_completed.emit(response)
             elif endpoint == "img2img":
                 self.img2img_completed.emit(response)
-
-        except json.JSONDecodeError:
-            self.generation_failed.emit("Invalid JSON response", 500)
         except Exception as e:
-            self.generation_failed.emit(f"Processing error: {str(e)}", 0)
+            self._fail(job_id, f"Processing error: {str(e)}", 0)
+
+    def _fail(self, job_id: str, message: str, status_code: int, sent: bool = True):
+        if not sent:
+            self._unsent.add(job_id)
+        try:
+            self.job_failed.emit(job_id, message, status_code)
         finally:
-            reply.deleteLater()
+            self._unsent.discard(job_id)
+        self.generation_failed.emit(message, status_code)
 
-    def _handle_error(self, reply: QNetworkReply):
+    def _handle_error(self, reply: QNetworkReply, job_id: str = ""):
         """Classify and handle network-related errors from QNetworkReply."""
         status_code = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) or 0
         error_string = reply.errorString()
@@ -166,8 +248,9 @@ class ImageGenerator(QObject):
                 message = f"Unknown network error occurred (HTTP {status_code})."
 
         full_message = f"{message} | Details: {error_string}"
-        logger.exception(full_message)
-        self.generation_failed.emit(full_message, status_code)
+        logger.error(full_message)
+        # Only a refused connection or an unknown host is certain to have never reached the server
+        self._fail(job_id, full_message, status_code, sent=not server_down)
 
         if server_down:
             self.serverAvailable.emit(False)
@@ -0,0 +1,274 @@
+import binascii
+import json
+import re
+import threading
+from collections import deque
+from typing import Callable, Optional, Dict, Any
+
+from PySide6.QtCore import QObject, Signal, Slot, QRunnable, QThreadPool
+from PySide6.QtNetwork import QNetworkReply
+from loguru import logger
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # Optional speedup
+    _loads = json.loads
+
+_STRUCTURAL = re.compile(rb'["{}\[\]:,]')
+_WHITESPACE = b" \t\r\n,"
+
+
+class StreamingResponseParser:
+    """
+    Incremental parser for SD WebUI generation responses.
+
+    Feed it the body in chunks as they arrive. Strings of the top level `images` array are
+    base64-decoded as they stream in and handed to `on_image` the moment each element
+    closes, so the base64 text is never held in full. Everything else (`parameters`,
+    `info`) is small and parsed once at `finish()`, with orjson when it is installed.
+    """
+
+    def __init__(self, on_image: Callable[[int, bytes], None], images_key: bytes = b"images"):
+        self.on_image = on_image
+        self.images_key = images_key
+        self.image_count = 0
+        self.bytes_fed = 0
+
+        self._rest = bytearray()  # The response without the image strings
+        self._pos = 0
+        self._depth = 0
+        self._last_string: Optional[bytes] = None
+        self._key: Optional[bytes] = None
+        self._in_images = False
+        self._in_string = False
+        self._carry = b""  # base64 characters short of a full 4 character group
+        self._image = bytearray()
+        self._first_segment = True
+        self._head = b""  # Start of an image string while it may still be a data URI prefix
+
+    def feed(self, data: bytes):
+        self.bytes_fed += len(data)
+        if self._in_images:
+            self._feed_images(data)
+        else:
+            self._rest += data
+            self._scan()
+
+    def finish(self) -> Dict[str, Any]:
+        """Parse the remainder. Raises ValueError when the body was truncated or isn't JSON."""
+        if self._in_images or self._depth != 0:
+            raise ValueError("Truncated response")
+        return _loads(bytes(self._rest))
+
+    def _scan(self):
+        buffer = self._rest
+        while True:
+            match = _STRUCTURAL.search(buffer, self._pos)
+            if match is None:
+                self._pos = len(buffer)
+                return
+            i = match.start()
+            char = buffer[i]
+            if char == 0x22:  # "
+                end = self._string_end(buffer, i + 1)
+                if end < 0:
+                    self._pos = i  # Wait for the rest of the string
+                    return
+                if self._depth == 1:
+                    self._last_string = bytes(buffer[i + 1:end])
+                self._pos = end + 1
+                continue
+            self._pos = i + 1
+            if char == 0x3A:  # :
+                if self._depth == 1:
+                    self._key = self._last_string
+            elif char == 0x2C:  # ,
+                if self._depth == 1:
+                    self._key = None
+            elif char == 0x5B and self._depth == 1 and self._key == self.images_key:  # [
+                # The image strings bypass the buffer, `"images": []` is left for finish()
+                tail = bytes(buffer[i + 1:])
+                del buffer[i + 1:]
+                self._in_images = True
+                self._feed_images(tail)
+                return
+            elif char in (0x7B, 0x5B):  # { [
+                self._depth += 1
+            else:  # } ]
+                self._depth -= 1
+
+    @staticmethod
+    def _string_end(buffer, start: int) -> int:
+        end = buffer.find(b'"', start)
+        while end >= 0:
+            backslashes = 0
+            while end - 1 - backslashes >= start and buffer[end - 1 - backslashes] == 0x5C:
+                backslashes += 1
+            if backslashes % 2 == 0:
+                return end
+            end = buffer.find(b'"', end + 1)
+        return -1
+
+    def _feed_images(self, data: bytes):
+        pos, size = 0, len(data)
+        while pos < size:
+            if not self._in_string:
+                while pos < size and data[pos] in _WHITESPACE:
+                    pos += 1
+                if pos >= size:
+                    return
+                if data[pos] == 0x5D:  # ] closes the array, back to plain scanning
+                    self._in_images = False
+                    self._rest += b"]"
+                    self._pos = len(self._rest)
+                    remainder = data[pos + 1:]
+                    if remainder:
+                        self._rest += remainder
+                        self._scan()
+                    return
+                if data[pos] != 0x22:
+                    raise ValueError(f"Unexpected byte {data[pos:pos + 1]!r} in images array")
+                self._in_string = True
+                self._first_segment = True
+                pos += 1
+                continue
+            end = data.find(b'"', pos)
+            segment = data[pos:end if end >= 0 else size]
+            self._decode(segment)
+            if end < 0:
+                return
+            self._close_image()
+            pos = end + 1
+
+    def _decode(self, segment: bytes):
+        if b"\\" in segment:
+            # Backslash is not in the base64 alphabet, it can only be the escape of "\/"
+            segment = segment.replace(b"\\", b"")
+        if self._first_segment:
+            # Strip a data URI prefix, e.g. "data:image/png;base64,", which may span chunks
+            head = self._head + segment
+            if b"data:".startswith(head[:5]) and (len(head) < 5 or b"," not in head):
+                self._head = head
+                return
+            if head.startswith(b"data:"):
+                head = head[head.find(b",") + 1:]
+            segment, self._head, self._first_segment = head, b"", False
+        segment = self._carry + segment if self._carry else segment
+        usable = len(segment) & ~3
+        if usable:
+            self._image += binascii.a2b_base64(segment[:usable])
+        self._carry = segment[usable:]
+
+    def _close_image(self):
+        if self._head:
+            head, self._head = self._head, b""
+            self._first_segment = False
+            self._decode(head)
+        if self._carry:
+            self._image += binascii.a2b_base64(self._carry + b"=" * (-len(self._carry) % 4))
+            self._carry = b""
+        image, self._image = bytes(self._image), bytearray()
+        self._in_string = False
+        index = self.image_count
+        self.image_count += 1
+        self.on_image(index, image)
+
+
+_parse_pool: Optional[QThreadPool] = None
+
+
+def _pool() -> QThreadPool:
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = QThreadPool()
+        _parse_pool.setMaxThreadCount(2)
+    return _parse_pool
+
+
+class _DrainTask(QRunnable):
+    def __init__(self, stream: "ResponseStream"):
+        super().__init__()
+        self.stream = stream
+
+    def run(self):
+        self.stream._drain()
+
+
+class ResponseStream(QObject):
+    """
+    Reads a generation reply as it downloads and parses it on a worker thread.
+
+    The GUI thread only moves bytes out of the reply, all scanning, base64 and JSON work
+    happens in the pool. Chunks are parsed in order by at most one task at a time.
+    """
+    imageDecoded = Signal(int, object)  # index, encoded image bytes (PNG/JPEG/...)
+    parsed = Signal(object, str)  # response dict (images replaced by bytes) or None, error
+
+    def __init__(self, reply: QNetworkReply, parent=None):
+        super().__init__(parent)
+        self.reply = reply
+        self.images = []
+        self._parser = StreamingResponseParser(self._on_image)
+        self._chunks = deque()
+        self._lock = threading.Lock()
+        self._running = False
+        self._error: Optional[str] = None
+        self.imageDecoded.connect(self._collect)
+        reply.readyRead.connect(self._read)
+
+    @Slot()
+    def _read(self):
+        data = self.reply.readAll().data()
+        if data:
+            self._push(data)
+
+    def finish(self):
+        """Call once the reply finished without error, the result arrives through `parsed`."""
+        self._read()
+        self.reply.readyRead.disconnect(self._read)
+        self._push(None)
+
+    def _push(self, data: Optional[bytes]):
+        with self._lock:
+            self._chunks.append(data)
+            if self._running:
+                return
+            self._running = True
+        _pool().start(_DrainTask(self))
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                if not self._chunks:
+                    self._running = False
+                    return
+                data = self._chunks.popleft()
+            if data is None:
+                self._complete()
+                continue
+            if self._error is not None:
+                continue
+            try:
+                self._parser.feed(data)
+            except Exception as e:
+                self._error = f"Invalid JSON response: {e}"
+
+    def _complete(self):
+        if self._error is not None:
+            self.parsed.emit(None, self._error)
+            return
+        try:
+            response = self._parser.finish()
+        except Exception as e:
+            self.parsed.emit(None, f"Invalid JSON response: {e}")
+            return
+        logger.debug(f"Parsed {self._parser.bytes_fed / 1048576:.1f} MB response, {self._parser.image_count} images")
+        self.parsed.emit(response, "")
+
+    def _on_image(self, index: int, image: bytes):
+        self.imageDecoded.emit(index, image)
+
+    @Slot(int, object)
+    def _collect(self, index: int, image: bytes):
+        self.images.append(image)
@@ -0,0 +1,2 @@
+from .spec import GridAxis, GridCell, GridRequest, GridSpec, parse_values
+from .runner import GridRunner
\ No newline at end of file
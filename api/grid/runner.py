@@ -0,0 +1,221 @@
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from PySide6.QtCore import QObject, Signal, Slot
+from loguru import logger
+
+from api.grid.spec import GridRequest, GridSpec
+from api.queue import GenerationJob, JobQueue, JobStatus
+from config import sd_config
+from utils.image.decoded import DecodedImage, image_decoder, image_saver
+from utils.image.grid import GridCanvas
+from utils.image.tools import get_next_index
+
+
+class GridRunner(QObject):
+    """
+    Generates a `GridSpec` through a `JobQueue` and composites the results.
+
+    Requests are taken from the spec's lazy iterator only when the queue has room for
+    them: at most `window` grid jobs wait or run at once, so a large grid is never
+    written into the queue up front and jobs queued meanwhile still get their turn.
+    Every page (Z value) is a `GridCanvas`, tiles are pasted on the `image_decoder()`
+    pool as jobs finish and announced with `pageUpdated`, the pages are saved to
+    `output_dir` on the `image_saver()` at the end.
+
+    The individual images take the queue's normal path, in the app `MainWindow` saves
+    and indexes every finished job, these included, into the directory of `gen_type`.
+    """
+    pageUpdated = Signal(int, object)  # page, PIL image snapshot
+    progress = Signal(int, int)  # cells done, cell count
+    finished = Signal(list)  # paths of the saved pages
+    failed = Signal(str)
+
+    def __init__(self, spec: GridSpec, queue: JobQueue, gen_type: Optional[str] = None, window: Optional[int] = None,
+                 tile_max: int = 512, output_dir: Optional[str] = None, loaded: Optional[Dict[str, str]] = None,
+                 parent=None):
+        """
+        Args:
+            window: Grid jobs in the queue at once, by default one more than it runs in parallel.
+            tile_max: Longest side of a tile, images are scaled down to it.
+            output_dir: Where the pages go, `gridsDir` of the settings by default.
+            loaded: Checkpoint and VAE the server has loaded, see `GridSpec.requests`.
+        """
+        super().__init__(parent)
+        self.spec = spec
+        self.queue = queue
+        self.gen_type = gen_type
+        self.window = window or queue.max_in_flight + 1
+        self.output_dir = output_dir or sd_config.gridsDir.value
+        self.done = 0
+        self.failures = 0
+        self.started: Optional[float] = None
+
+        columns, rows, pages = spec.shape
+        width, height = int(spec.payload.get("width", 512)), int(spec.payload.get("height", 512))
+        scale = min(1.0, tile_max / max(width, height))
+        tile_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        self.canvases = [GridCanvas(spec.labels(spec.x) if spec.x else [], spec.labels(spec.y) if spec.y else [],
+                                    tile_size, spec.z.value_label(page) if spec.z else "")
+                         for page in range(pages)]
+        self.tile_max = tile_max
+
+        self._requests: Optional[Iterator[GridRequest]] = None
+        self._loaded = loaded
+        self._jobs: Dict[str, GridRequest] = {}
+        self._submitting: Optional[GridRequest] = None
+        self._answered = False
+        self._painting = 0
+        self._exhausted = False
+        self._cancelled = False
+        self._stopped = False
+
+    @property
+    def running(self) -> bool:
+        return self._requests is not None and not self._stopped
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._requests = self.spec.requests(self._loaded)
+        self.queue.jobFinished.connect(self._on_job_finished)
+        self.queue.jobFailed.connect(self._on_job_failed)
+        logger.info(f"Grid of {self.spec.cell_count} cells started")
+        self._feed()
+
+    def cancel(self):
+        """Drop the rest of the grid, the pages are saved as far as they got."""
+        self._exhausted = self._cancelled = True
+        for job_id in list(self._jobs):
+            job = self.queue.get(job_id)
+            if job is None or job.status == JobStatus.QUEUED:
+                self._jobs.pop(job_id)  # Removed outright, a running one fails as cancelled
+            self.queue.cancel(job_id)
+        self._finish_if_done()
+
+    # === Internals ===
+    def _feed(self):
+        while not self._exhausted and len(self._jobs) < self.window:
+            request = next(self._requests, None)
+            if request is None:
+                self._exhausted = True
+                break
+            self._submitting, self._answered = request, False
+            job_id = self.queue.enqueue(request.endpoint, request.payload, gen_type=self.gen_type)
+            if not self._answered:  # Failing right away already went through _on_job_failed
+                self._jobs[job_id] = request
+            self._submitting = None
+        self._finish_if_done()
+
+    def _take(self, job: GenerationJob) -> Optional[GridRequest]:
+        request = self._jobs.pop(job.id, None)
+        if request is None and self._submitting is not None and job.payload is self._submitting.payload:
+            request, self._answered = self._submitting, True
+        return request
+
+    @Slot(object, dict)
+    def _on_job_finished(self, job: GenerationJob, response: dict):
+        request = self._take(job)
+        if request is None:
+            return
+        # With more than one image the WebUI may put a grid of them first
+        images = (response.get("images") or [])[-len(request.cells):]
+        if len(images) < len(request.cells):
+            logger.warning(f"Grid job {job.id} returned {len(images)} images for {len(request.cells)} cells")
+        self.done += len(request.cells)
+        self._painting += 1
+        image_decoder().run(lambda: self._paint(request, images), self._on_painted, owner=self)
+        self._feed()
+
+    @Slot(object, str, int)
+    def _on_job_failed(self, job: GenerationJob, message: str, status_code: int):
+        request = self._take(job)
+        if request is None:
+            return
+        self.done += len(request.cells)
+        self.failures += len(request.cells)
+        if status_code == 0 and not self._cancelled:
+            # No server to fail over to, the remaining cells would fail the same way
+            logger.error(f"Grid stopped, the server is unreachable: {message}")
+            self.failed.emit(message)
+            self.cancel()
+            return
+        logger.warning(f"Grid cells {request.cells} failed: {message}")
+        self.progress.emit(self.done, self.spec.cell_count)
+        self._feed()
+
+    def _paint(self, request: GridRequest, images: List[Any]) -> List[int]:
+        pages = []
+        for cell, image in zip(request.cells, images):
+            self.canvases[cell.z].paste(cell.x, cell.y, DecodedImage.from_any(image).to_pil(self.tile_max))
+            if cell.z not in pages:
+                pages.append(cell.z)
+        return pages
+
+    def _on_painted(self, pages: Optional[List[int]]):
+        self._painting -= 1
+        for page in pages or []:
+            self.pageUpdated.emit(page, self.canvases[page].snapshot())
+        self.progress.emit(self.done, self.spec.cell_count)
+        self._finish_if_done()
+
+    def _finish_if_done(self):
+        if self._stopped or not self._exhausted or self._jobs or self._painting or self._submitting is not None:
+            return
+        self._stopped = True
+        self.queue.jobFinished.disconnect(self._on_job_finished)
+        self.queue.jobFailed.disconnect(self._on_job_failed)
+        image_saver().run(self._save, self._on_saved, owner=self)
+
+    def _save(self) -> List[str]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        image_format = "png" if sd_config.defaultImageFormat.value == "png" else "jpeg"
+        index = int(get_next_index(self.output_dir))
+        date = time.strftime("%Y-%m-%d")
+        paths = []
+        for page, canvas in enumerate(self.canvases):
+            path = os.path.join(self.output_dir, f"{index + page:05d}-{date}-grid.{'png' if image_format == 'png' else 'jpg'}")
+            canvas.save(path, image_format.upper(), **({"quality": 92} if image_format == "jpeg" else {}))
+            paths.append(path)
+        return paths
+
+    def _on_saved(self, paths: Optional[List[str]]):
+        elapsed = time.perf_counter() - self.started
+        logger.info(f"Grid of {self.spec.cell_count} cells done in {elapsed:.1f} s, {self.failures} failed, "
+                    f"saved to {paths}")
+        self.finished.emit(paths or [])
+
+
+if __name__ == "__main__":
+    # A checkpoint x CFG x seed grid against a stub server: 24 cells in 6 requests and two
+    # checkpoint switches, written to the directory given
+    import sys
+    import json
+    import urllib.request
+    from PySide6.QtWidgets import QApplication
+    from api.backend.stub_server import start_stub_servers
+    from api.generator import ImageGenerator
+    from api.grid.spec import GridAxis
+
+    app = QApplication([])
+    checkpoints = ["model_a.safetensors", "model_b.safetensors", "model_c.safetensors"]
+    start_stub_servers(1, base_port=7891, delay=0.2, switch_delay=0.5, checkpoint=checkpoints[1],
+                       checkpoints=checkpoints)
+    queue = JobQueue(ImageGenerator("http://127.0.0.1:7891"), max_in_flight=2, path=None)
+    spec = GridSpec({"prompt": "a cat", "steps": 10, "width": 512, "height": 512},
+                    x=GridAxis.parse("seed", "100-103"), y=GridAxis.parse("cfg_scale", "5, 7"),
+                    z=GridAxis.parse("checkpoint", ", ".join(checkpoints)))
+    runner = GridRunner(spec, queue, output_dir=sys.argv[1] if len(sys.argv) > 1 else "grids",
+                        loaded={"checkpoint": checkpoints[1]})
+    runner.progress.connect(lambda done, total: print(f"{done}/{total} cells"))
+
+    def finished(paths):
+        with urllib.request.urlopen("http://127.0.0.1:7891/stub/log") as response:
+            log = json.load(response)
+        print(f"Saved {paths}, {len(log['log'])} requests, {log['switches']} checkpoint switches, "
+              f"{time.perf_counter() - runner.started:.1f} s")
+        app.quit()
+
+    runner.finished.connect(finished)
+    runner.start()
+    app.exec()
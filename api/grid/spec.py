@@ -0,0 +1,346 @@
+import csv
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+SEED = "seed"
+CHECKPOINT = "checkpoint"
+VAE = "vae"
+PROMPT_SR = "prompt_sr"
+LORA_PREFIX = "lora:"
+OVERRIDE_PREFIX = "override:"
+
+# Server options behind the model axes, in the order they are looped over: a checkpoint
+# switch costs more than a VAE switch
+MODEL_OPTIONS = {CHECKPOINT: "sd_model_checkpoint", VAE: "sd_vae"}
+
+AXIS_LABELS = {
+    "cfg_scale": "CFG",
+    "steps": "Steps",
+    "sampler_name": "Sampler",
+    "scheduler": "Schedule type",
+    "denoising_strength": "Denoising",
+    "width": "Width",
+    "height": "Height",
+    SEED: "Seed",
+    CHECKPOINT: "Checkpoint",
+    VAE: "VAE",
+    PROMPT_SR: "Prompt S/R",
+}
+
+_NUMBER = r"[+-]?\d+(?:\.\d+)?"
+_RANGE = re.compile(rf"^({_NUMBER})\s*-\s*({_NUMBER})(?:\s*\(\s*({_NUMBER})\s*\)|\s*\[\s*(\d+)\s*\])?$")
+
+
+def parse_values(text: str) -> List[Any]:
+    """
+    Values of an axis as typed in by the user, in the WebUI's X/Y/Z syntax.
+
+    Comma separated, quotes allow commas inside a value. Numbers become ints or floats,
+    "4-8" is a range with step 1, "4-8 (+2)" one with step 2, "1-2 [5]" five values
+    spread over the range. Anything else stays a string.
+    """
+    items = [item.strip() for item in next(csv.reader([text], skipinitialspace=True), [])]
+    values: List[Any] = []
+    for item in filter(None, items):
+        match = _RANGE.match(item)
+        if match:
+            start, end, step, count = match.groups()
+            values.extend(_expand_range(start, end, step, count))
+        elif re.fullmatch(_NUMBER, item):
+            values.append(float(item) if "." in item else int(item))
+        else:
+            values.append(item)
+    return values
+
+
+def _expand_range(start: str, end: str, step: Optional[str], count: Optional[str]) -> List[Any]:
+    is_float = any("." in part for part in (start, end, step or "") if part)
+    low, high = float(start), float(end)
+    if count is not None:
+        count = int(count)
+        if count <= 1:
+            values = [low]
+        else:
+            values = [low + (high - low) * i / (count - 1) for i in range(count)]
+        is_float = is_float or any(value != int(value) for value in values)
+    else:
+        step_value = abs(float(step)) if step else 1.0
+        if step_value == 0:
+            raise ValueError(f"Range {start}-{end} has a step of 0")
+        direction = 1 if high >= low else -1
+        values = []
+        value = low
+        while (value - high) * direction <= 1e-9:
+            values.append(value)
+            value += step_value * direction
+    return [round(value, 6) if is_float else int(round(value)) for value in values]
+
+
+def _base_title(title: str) -> str:
+    """A checkpoint or VAE title without its ' [hash]' suffix."""
+    return str(title).split(" [")[0]
+
+
+@dataclass
+class GridAxis:
+    """
+    One axis of a grid: what it changes in the payload and the values it takes.
+
+    `field` is one of
+
+    - a payload key, e.g. "cfg_scale", "steps", "sampler_name";
+    - "seed": cells along it only differ in seed, runs of consecutive seeds (or of -1)
+      are generated by one request with `batch_size`/`n_iter`;
+    - "checkpoint" or "vae": set through `override_settings` and kept loaded afterwards,
+      the grid is ordered to switch them as rarely as possible;
+    - "override:<option>": any other server option, e.g. "override:CLIP_stop_at_last_layers";
+    - "lora:<name>": weight of a LoRA in the prompt, appended if the prompt lacks it;
+    - "prompt_sr": search and replace in both prompts, the first value is searched for.
+    """
+    field: str
+    values: List[Any]
+    label: Optional[str] = None
+
+    @classmethod
+    def parse(cls, field: str, text: str, label: Optional[str] = None) -> "GridAxis":
+        values = parse_values(text)
+        if not values:
+            raise ValueError(f"No values for grid axis '{field}'")
+        return cls(field, values, label)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def is_seed(self) -> bool:
+        return self.field == SEED
+
+    @property
+    def is_model(self) -> bool:
+        return self.field in MODEL_OPTIONS
+
+    @property
+    def name(self) -> str:
+        if self.label:
+            return self.label
+        if self.field.startswith(LORA_PREFIX):
+            return f"LoRA {self.field[len(LORA_PREFIX):]}"
+        if self.field.startswith(OVERRIDE_PREFIX):
+            return self.field[len(OVERRIDE_PREFIX):]
+        return AXIS_LABELS.get(self.field, self.field)
+
+    def value_label(self, index: int) -> str:
+        value = self.values[index]
+        if self.is_model:
+            value = _base_title(value)
+        return f"{self.name}: {value}"
+
+    def apply(self, payload: Dict[str, Any], index: int):
+        """Set the value at `index` in `payload`, which must be a copy the caller owns."""
+        value = self.values[index]
+        if self.is_model or self.field.startswith(OVERRIDE_PREFIX):
+            option = MODEL_OPTIONS.get(self.field) or self.field[len(OVERRIDE_PREFIX):]
+            payload["override_settings"] = {**(payload.get("override_settings") or {}), option: value}
+            # The WebUI restores overridden options after each request by default, which
+            # would load every checkpoint twice per request
+            payload["override_settings_restore_afterwards"] = False
+        elif self.field.startswith(LORA_PREFIX):
+            name = self.field[len(LORA_PREFIX):]
+            tag = f"<lora:{name}:{value}>"
+            prompt = payload.get("prompt", "")
+            pattern = re.compile(rf"<lora:{re.escape(name)}(?::[^>]*)?>")
+            if pattern.search(prompt):
+                payload["prompt"] = pattern.sub(lambda _: tag, prompt)
+            else:
+                payload["prompt"] = f"{prompt}, {tag}" if prompt else tag
+        elif self.field == PROMPT_SR:
+            search = str(self.values[0])
+            for key in ("prompt", "negative_prompt"):
+                if key in payload:
+                    payload[key] = payload[key].replace(search, str(value))
+        else:
+            payload[self.field] = value
+
+
+class GridCell(NamedTuple):
+    x: int
+    y: int
+    z: int
+
+
+@dataclass
+class GridRequest:
+    """One request of a grid and the cells its images go to, in order."""
+    endpoint: str
+    payload: Dict[str, Any]
+    cells: List[GridCell]
+
+    @property
+    def model(self) -> Tuple[Optional[str], Optional[str]]:
+        overrides = self.payload.get("override_settings") or {}
+        return overrides.get(MODEL_OPTIONS[CHECKPOINT]), overrides.get(MODEL_OPTIONS[VAE])
+
+
+@dataclass
+class GridSpec:
+    """
+    An X/Y/Z grid over a txt2img or img2img payload.
+
+    Axes are only expanded while `requests()` is iterated, a large grid never exists as
+    a list of payloads. A base seed of -1 is fixed to one random seed unless there is a
+    seed axis, so the cells differ in nothing but the axis values.
+
+    Args:
+        max_batch_size: Images per batch of one request, runs of seeds beyond it use `n_iter`.
+        max_n_iter: Batches per request, so tiles keep coming in during long seed runs.
+    """
+    payload: Dict[str, Any]
+    x: Optional[GridAxis] = None
+    y: Optional[GridAxis] = None
+    z: Optional[GridAxis] = None
+    endpoint: str = "txt2img"
+    max_batch_size: int = 4
+    max_n_iter: int = 4
+    axes: List[GridAxis] = field(init=False)
+
+    def __post_init__(self):
+        self.axes = [axis for axis in (self.x, self.y, self.z) if axis is not None]
+        if sum(axis.is_seed for axis in self.axes) > 1:
+            raise ValueError("A grid can have only one seed axis")
+        for axis in self.axes:
+            if not axis.values:
+                raise ValueError(f"Grid axis '{axis.field}' has no values")
+        self.payload = dict(self.payload)
+        self.payload.pop("n_iter", None)
+        self.payload.pop("batch_size", None)
+        if not any(axis.is_seed for axis in self.axes) and int(self.payload.get("seed", -1) or -1) == -1:
+            self.payload["seed"] = random.randrange(2 ** 32)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """Columns, rows and pages."""
+        return tuple(len(axis) if axis is not None else 1 for axis in (self.x, self.y, self.z))
+
+    @property
+    def cell_count(self) -> int:
+        columns, rows, pages = self.shape
+        return columns * rows * pages
+
+    def labels(self, axis: Optional[GridAxis]) -> List[str]:
+        return [axis.value_label(i) for i in range(len(axis))] if axis is not None else [""]
+
+    def payload_for(self, cell: GridCell) -> Dict[str, Any]:
+        payload = dict(self.payload)
+        for axis, index in zip((self.x, self.y, self.z), cell):
+            if axis is not None:
+                axis.apply(payload, index)
+        return payload
+
+    def requests(self, loaded: Optional[Dict[str, str]] = None) -> Iterator[GridRequest]:
+        """
+        The requests of the grid, in the order they should run.
+
+        Model axes are the outermost loops, starting from what the server has loaded
+        (`loaded` maps "checkpoint"/"vae" to titles), so each checkpoint and VAE is loaded
+        once per run of the loops around it. The loops go back and forth (boustrophedon),
+        consecutive requests differ in one axis value, a VAE is kept across a checkpoint
+        switch. The seed axis is the innermost loop, always forwards, cells along it are
+        grouped into batched requests.
+        """
+        slots = [(slot, axis) for slot, axis in enumerate((self.x, self.y, self.z)) if axis is not None]
+        seed_slot = next((slot for slot, axis in slots if axis.is_seed), None)
+        loops = sorted(((slot, axis) for slot, axis in slots if not axis.is_seed),
+                       key=lambda item: (not item[1].is_model, list(MODEL_OPTIONS).index(item[1].field)
+                                         if item[1].is_model else -item[0]))
+        orders = [self._visit_order(axis, loaded) for _, axis in loops]
+
+        for indices in _boustrophedon([len(order) for order in orders]):
+            cell = [0, 0, 0]
+            for (slot, _), order, index in zip(loops, orders, indices):
+                cell[slot] = order[index]
+            if seed_slot is None:
+                grid_cell = GridCell(*cell)
+                yield GridRequest(self.endpoint, self.payload_for(grid_cell), [grid_cell])
+                continue
+            seed_axis = (self.x, self.y, self.z)[seed_slot]
+            for run in self._seed_runs(seed_axis.values):
+                cells = []
+                for index in run:
+                    cell[seed_slot] = index
+                    cells.append(GridCell(*cell))
+                yield from self._batched(cells)
+
+    def _visit_order(self, axis: GridAxis, loaded: Optional[Dict[str, str]]) -> List[int]:
+        order = list(range(len(axis)))
+        current = (loaded or {}).get(axis.field) if axis.is_model else None
+        if current:
+            start = next((i for i, value in enumerate(axis.values) if _base_title(value) == _base_title(current)), 0)
+            order = order[start:] + order[:start]
+        return order
+
+    @staticmethod
+    def _seed_runs(seeds: Sequence[Any]) -> Iterator[List[int]]:
+        """Index runs of consecutive seeds, or of random (-1) ones, which a batch generates alike."""
+        run: List[int] = []
+        for index, seed in enumerate(seeds):
+            seed = int(seed)
+            if run:
+                previous = int(seeds[run[-1]])
+                if not ((seed == -1 and previous == -1) or (previous != -1 and seed == previous + 1)):
+                    yield run
+                    run = []
+            run.append(index)
+        if run:
+            yield run
+
+    def _batched(self, cells: List[GridCell]) -> Iterator[GridRequest]:
+        """Requests for cells of one seed run, the server gives a batch seeds seed, seed+1..."""
+        limit = self.max_batch_size * self.max_n_iter
+        while cells:
+            chunk, cells = cells[:limit], cells[limit:]
+            batch_size, n_iter = _batch_shape(len(chunk), self.max_batch_size, self.max_n_iter)
+            if batch_size * n_iter < len(chunk):
+                # No good shape for all of them, the remainder goes into its own request
+                cells = chunk[batch_size * n_iter:] + cells
+                chunk = chunk[:batch_size * n_iter]
+            payload = self.payload_for(chunk[0])
+            payload["batch_size"] = batch_size
+            payload["n_iter"] = n_iter
+            yield GridRequest(self.endpoint, payload, chunk)
+
+
+def _batch_shape(count: int, max_batch_size: int, max_n_iter: int) -> Tuple[int, int]:
+    """
+    batch_size and n_iter for up to `count` images: all of them if a batch size of at
+    least half the maximum divides them, else as many full maximum batches as fit.
+    """
+    if count <= max_batch_size:
+        return count, 1
+    for batch_size in range(max_batch_size, (max_batch_size + 1) // 2 - 1, -1):
+        if count % batch_size == 0 and count // batch_size <= max_n_iter:
+            return batch_size, count // batch_size
+    return max_batch_size, min(count // max_batch_size, max_n_iter)
+
+
+def _boustrophedon(sizes: List[int]) -> Iterator[Tuple[int, ...]]:
+    """
+    Every index tuple of `sizes`, each inner loop running backwards on every other pass
+    of the loops around it, so consecutive tuples differ in one position by one.
+    """
+    total = 1
+    for size in sizes:
+        total *= size
+    for number in range(total):
+        digits = []
+        for size in reversed(sizes):
+            number, digit = divmod(number, size)
+            digits.append(digit)
+        digits.reverse()
+        indices = []
+        prefix = 0  # Pass number of the loops around the current one
+        for size, digit in zip(sizes, digits):
+            indices.append(size - 1 - digit if prefix % 2 else digit)
+            prefix = prefix * size + digit
+        yield tuple(indices)
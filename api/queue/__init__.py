@@ -0,0 +1,2 @@
+from .job_queue import JobQueue, GenerationJob, JobStatus
+from .scheduler import ModelScheduler, job_model
\ No newline at end of file
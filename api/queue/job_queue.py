@@ -0,0 +1,394 @@
+import itertools
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from enum import Enum
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Union, TYPE_CHECKING
+
+from PySide6.QtCore import QObject, Signal, Slot, QTimer
+from loguru import logger
+
+from api.generator import ImageGenerator
+
+if TYPE_CHECKING:
+    from api.queue.scheduler import ModelScheduler
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class GenerationJob:
+    endpoint: str  # 'txt2img' or 'img2img'
+    payload: Dict[str, Any]
+    priority: int = 0
+    gen_type: Optional[str] = None  # GenerationTypeFlags value, decides the output directory
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = JobStatus.QUEUED
+    created: float = field(default_factory=time.time)
+    attempts: int = 0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["status"] = self.status.value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GenerationJob":
+        data = dict(data)
+        data["status"] = JobStatus(data.get("status", JobStatus.QUEUED.value))
+        return cls(**data)
+
+
+class JobQueue(QObject):
+    """
+    Client side queue of generation jobs in front of an `ImageGenerator`, or anything
+    with the same `submit`/`cancel`/`job_completed`/`job_failed` interface such as a
+    `BackendPool`.
+
+    Jobs run by descending priority, first in first out within a priority, with up to
+    `max_in_flight` of them posted to the server at once. The next job is posted from the
+    slot that receives the previous reply, before any GUI handler runs, so the server is
+    never left waiting on the interface. With `max_in_flight` of 2 the next payload is
+    already waiting on the server when the current one finishes.
+
+    Queued jobs are written to `path` and restored on the next start, paused until
+    `resume()` so nothing is posted before the server is known to be up. The queue pauses
+    the same way when a job can't even be posted, e.g. while the server's circuit breaker
+    is open: the job goes back to the front and waits with the others instead of failing.
+    The file is written on a worker thread, img2img payloads carry their input images.
+
+    With a `ModelScheduler` the next job among those of the highest priority is the
+    scheduler's pick rather than the oldest, to keep model switches on the server down.
+    """
+    jobAdded = Signal(object)  # GenerationJob
+    jobStarted = Signal(object)  # GenerationJob
+    jobFinished = Signal(object, dict)  # GenerationJob, response
+    jobFailed = Signal(object, str, int)  # GenerationJob, error message, status code
+    jobPostponed = Signal(object, str)  # GenerationJob back in the queue as it couldn't be posted, error message
+    imageReceived = Signal(object, int, object)  # GenerationJob, index, encoded image bytes
+    jobRemoved = Signal(str)  # job id
+    queueChanged = Signal()
+    idle = Signal()
+
+    def __init__(self, generator: Union[ImageGenerator, QObject], max_in_flight: int = 1,
+                 path: Optional[str] = "config/job_queue.json", scheduler: Optional["ModelScheduler"] = None,
+                 parent=None):
+        super().__init__(parent)
+        self.generator = generator
+        self.scheduler = scheduler
+        self._max_in_flight = max(1, max_in_flight)
+        self.path = Path(path) if path else None
+        self.paused = False
+
+        self._queued: List[GenerationJob] = []
+        self._running: Dict[str, GenerationJob] = {}
+        self._order: Dict[str, int] = {}  # job id -> insertion sequence, FIFO tie breaker
+        self._sequence = itertools.count()
+        self._repeat: Optional[GenerationJob] = None
+        self._submitting: Optional[GenerationJob] = None
+        self._unposted: Optional[str] = None  # Why the job being submitted couldn't reach the server
+
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(200)
+        self._save_timer.timeout.connect(self._save_in_background)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-queue-save")
+
+        self.generator.job_completed.connect(self._on_job_completed)
+        self.generator.job_failed.connect(self._on_job_failed)
+        self.generator.image_received.connect(self._on_image_received)
+
+        if self.load():
+            self.paused = True
+
+    # === Queue operations ===
+    def enqueue(self, endpoint: str, payload: Dict[str, Any], priority: int = 0,
+                gen_type: Optional[str] = None) -> str:
+        """Add a job and start it right away if there is a free slot. Returns the job id."""
+        job = GenerationJob(endpoint, payload, priority, gen_type)
+        self._insert(job)
+        logger.info(f"Queued {endpoint} job {job.id} (priority {priority}, {len(self._queued)} waiting)")
+        self.jobAdded.emit(job)
+        self._changed()
+        self._pump()
+        return job.id
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a waiting job or abort a running one."""
+        for job in self._queued:
+            if job.id == job_id:
+                self._queued.remove(job)
+                self._order.pop(job_id, None)
+                job.status = JobStatus.CANCELLED
+                self.jobRemoved.emit(job_id)
+                self._changed()
+                return True
+        if job_id in self._running:
+            # The reply fails with OperationCanceledError and is cleaned up there
+            self._running[job_id].status = JobStatus.CANCELLED
+            return self.generator.cancel(job_id)
+        return False
+
+    def clear(self, include_running: bool = False):
+        """Drop every waiting job, optionally aborting the running ones as well."""
+        for job in list(self._queued):
+            self.cancel(job.id)
+        if include_running:
+            for job_id in list(self._running):
+                self.cancel(job_id)
+
+    def move(self, job_id: str, index: int) -> bool:
+        """
+        Move a waiting job to `index` of the waiting order.
+
+        The job takes over the priority of its new neighbour so the move sticks when the
+        queue is sorted again.
+        """
+        job = self.get(job_id)
+        if job is None or job.status != JobStatus.QUEUED:
+            return False
+        self._queued.remove(job)
+        index = max(0, min(index, len(self._queued)))
+        self._queued.insert(index, job)
+        neighbour = self._queued[index + 1] if index + 1 < len(self._queued) else \
+            self._queued[index - 1] if index > 0 else None
+        if neighbour is not None:
+            job.priority = neighbour.priority
+        for sequence, queued in enumerate(self._queued):
+            self._order[queued.id] = sequence
+        self._sequence = itertools.count(len(self._queued))
+        self._changed()
+        return True
+
+    def set_priority(self, job_id: str, priority: int) -> bool:
+        job = self.get(job_id)
+        if job is None or job.status != JobStatus.QUEUED:
+            return False
+        job.priority = priority
+        self._sort()
+        self._changed()
+        return True
+
+    def repeat(self, endpoint: str, payload: Dict[str, Any], gen_type: Optional[str] = None):
+        """
+        Keep generating `payload` until `stop_repeat()`, this backs "Generate Forever".
+
+        A new copy is queued whenever a slot frees up and nothing else is waiting, so
+        explicitly queued jobs still take precedence.
+        """
+        self._repeat = GenerationJob(endpoint, payload, gen_type=gen_type)
+        self._pump()
+
+    def stop_repeat(self):
+        self._repeat = None
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        if self.paused:
+            self.paused = False
+            self._pump()
+
+    # === State ===
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        if job_id in self._running:
+            return self._running[job_id]
+        return next((job for job in self._queued if job.id == job_id), None)
+
+    def jobs(self) -> List[GenerationJob]:
+        """Running jobs followed by the waiting ones in the order they will run."""
+        return list(self._running.values()) + list(self._queued)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._queued)
+
+    @property
+    def running_count(self) -> int:
+        return len(self._running)
+
+    @property
+    def repeating(self) -> bool:
+        return self._repeat is not None
+
+    @property
+    def max_in_flight(self) -> int:
+        return self._max_in_flight
+
+    @max_in_flight.setter
+    def max_in_flight(self, value: int):
+        self._max_in_flight = max(1, value)
+        self._pump()
+
+    # === Internals ===
+    def _insert(self, job: GenerationJob):
+        self._order[job.id] = next(self._sequence)
+        self._queued.append(job)
+        self._sort()
+
+    def _sort(self):
+        self._queued.sort(key=lambda job: (-job.priority, self._order.get(job.id, 0)))
+
+    def _pump(self):
+        while not self.paused and len(self._running) < self._max_in_flight:
+            if not self._queued:
+                if self._repeat is None:
+                    break
+                template = self._repeat
+                self._insert(GenerationJob(template.endpoint, template.payload, gen_type=template.gen_type))
+            job = self._queued.pop(self.scheduler.pick(self._queued) if self.scheduler is not None else 0)
+            sequence = self._order.pop(job.id, 0)
+            job.status = JobStatus.RUNNING
+            job.attempts += 1
+            self._running[job.id] = job
+            if self.scheduler is not None:
+                self.scheduler.on_posted(job, sequence)
+            self._submitting, self._unposted = job, None
+            posted = self.generator.submit(job.payload, job.endpoint, job.id)
+            self._submitting = None
+            if self._unposted is not None:
+                # The server is unreachable, every other job would fail the same way
+                job.status = JobStatus.QUEUED
+                job.attempts -= 1
+                self._order[job.id] = sequence
+                self._queued.append(job)
+                self._sort()
+                self.paused = True
+                logger.warning(f"Server unreachable, {len(self._queued)} job(s) wait until it is back")
+                self._changed()
+                self.jobPostponed.emit(job, self._unposted)
+                break
+            if posted is None:
+                continue  # job_failed already took it out of the running set
+            logger.debug(f"Posted {job.endpoint} job {job.id}, {len(self._running)} in flight")
+            self.jobStarted.emit(job)
+            self._changed()
+
+    @Slot(str, dict)
+    def _on_job_completed(self, job_id: str, response: dict):
+        job = self._running.pop(job_id, None)
+        if job is None:
+            return
+        job.status = JobStatus.DONE
+        if self.scheduler is not None:
+            self.scheduler.on_finished(job, True)
+        # Keep the server busy first, the GUI handlers below may take a while
+        self._pump()
+        self._changed()
+        self.jobFinished.emit(job, response)
+        self._emit_idle()
+
+    @Slot(str, int, object)
+    def _on_image_received(self, job_id: str, index: int, image: bytes):
+        job = self._running.get(job_id)
+        if job is not None:
+            self.imageReceived.emit(job, index, image)
+
+    @Slot(str, str, int)
+    def _on_job_failed(self, job_id: str, message: str, status_code: int):
+        job = self._running.pop(job_id, None)
+        if job is None:
+            return
+        if self.scheduler is not None:
+            self.scheduler.on_finished(job, False)
+        if job is self._submitting and status_code == 0 and job.status != JobStatus.CANCELLED:
+            self._unposted = message  # _pump puts it back
+            if self._repeat is not None:
+                logger.warning("Generate forever stopped, the server is unreachable")
+                self._repeat = None
+            return
+        if job.status != JobStatus.CANCELLED:
+            job.status = JobStatus.FAILED
+            job.error = message
+            if status_code == 0 and self._repeat is not None:
+                # Server unreachable, don't spin through the repeat template
+                logger.warning("Generate forever stopped, the server is unreachable")
+                self._repeat = None
+        self._pump()
+        self._changed()
+        self.jobFailed.emit(job, message, status_code)
+        self._emit_idle()
+
+    def _emit_idle(self):
+        if not self._running and not self._queued:
+            if self.scheduler is not None and self.scheduler.swaps:
+                logger.info(self.scheduler.summary())
+            self.idle.emit()
+
+    def _changed(self):
+        self.queueChanged.emit()
+        if self.path is not None:
+            self._save_timer.start()
+
+    def save(self):
+        """Write the unfinished jobs to disk, running ones are stored as waiting again."""
+        if self.path is not None:
+            self._save_timer.stop()
+            # Through the writer and waited for, so no earlier background write lands after it
+            self._writer.submit(self._write, self._snapshot()).result()
+
+    def _save_in_background(self):
+        # The snapshot is taken here, serializing the payloads happens on the writer thread
+        self._writer.submit(self._write, self._snapshot())
+
+    def _snapshot(self) -> List[Dict[str, Any]]:
+        jobs = []
+        for job in self.jobs():
+            data = job.to_dict()
+            data["status"] = JobStatus.QUEUED.value
+            jobs.append(data)
+        return jobs
+
+    def _write(self, jobs: List[Dict[str, Any]]):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "jobs": jobs}, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to save job queue to {self.path}: {e}")
+
+    def load(self) -> int:
+        """Restore jobs saved by a previous run. Returns how many were restored."""
+        if self.path is None or not self.path.exists():
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            jobs = [GenerationJob.from_dict(job) for job in data.get("jobs", [])]
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Failed to restore job queue from {self.path}: {e}")
+            return 0
+        for job in jobs:
+            job.status = JobStatus.QUEUED
+            self._insert(job)
+        if jobs:
+            logger.info(f"Restored {len(jobs)} queued generation jobs")
+        return len(jobs)
+
+
+if __name__ == "__main__":
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication([])
+    queue = JobQueue(ImageGenerator(), max_in_flight=2, path=None)
+    queue.jobStarted.connect(lambda job: print("Started", job.id, job.payload["prompt"]))
+    queue.jobFinished.connect(lambda job, response: print("Finished", job.id, len(response.get("images", []))))
+    queue.jobFailed.connect(lambda job, msg, code: print("Failed", job.id, msg, code))
+    queue.idle.connect(app.quit)
+    for prompt, priority in (("a cat", 0), ("a dog", 0), ("a fox", 5)):
+        queue.enqueue("txt2img", {"prompt": prompt, "steps": 10, "width": 512, "height": 512}, priority)
+    app.exec()
@@ -0,0 +1,176 @@
+import time
+from collections import deque
+from statistics import fmean
+from typing import Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from api.queue.job_queue import GenerationJob
+
+Model = Tuple[Optional[str], Optional[str]]  # checkpoint, VAE; None for whatever is loaded
+
+
+def job_model(job: GenerationJob) -> Model:
+    """Checkpoint (without its ' [hash]' suffix) and VAE a job asks for through `override_settings`."""
+    overrides = job.payload.get("override_settings") or {}
+    checkpoint = overrides.get("sd_model_checkpoint")
+    return (checkpoint.split(" [")[0] if checkpoint else None), overrides.get("sd_vae")
+
+
+class ModelScheduler:
+    """
+    Orders the jobs of a `JobQueue` so the server switches checkpoints and VAEs rarely.
+
+    Tracks the model the server has loaded and, among the waiting jobs of the highest
+    priority, posts the first one that runs on it. Jobs without a checkpoint or VAE of
+    their own run on whatever is loaded and always match. When nothing matches, the
+    oldest job decides the next model. Once the oldest job has waited `max_wait_s` it
+    goes next regardless, so a lone job for another model isn't starved by a stream of
+    jobs for the loaded one.
+
+    Grouping only pays off if the server keeps a model loaded: the WebUI restores
+    overridden options after every request by default, so jobs with a model get
+    `override_settings_restore_afterwards` switched off.
+
+    Swaps are counted against the swaps the same jobs would have caused in plain
+    queue order. The time a swap costs is measured as the extra service time of jobs
+    that switched over jobs that didn't, `switch_cost_s` until both have been seen.
+
+    With a `BackendPool` behind the queue the model of the primary server is tracked,
+    the pool's affinity scheduling routes jobs among the servers.
+    """
+
+    def __init__(self, max_wait_s: float = 120.0, switch_cost_s: float = 10.0,
+                 loaded: Model = (None, None)):
+        self.max_wait_s = max_wait_s
+        self.switch_cost_s = switch_cost_s
+        self.loaded: Model = loaded
+        self.swaps = 0
+        self.forced = 0  # Swaps forced by the wait bound while jobs for the loaded model waited
+        self._initial: Model = loaded
+        self._posted: List[Tuple[int, Model]] = []  # Queue sequence and model of every posted job
+        self._started: Dict[str, Tuple[float, bool]] = {}  # job id -> post time, swapped
+        self._last_completion = 0.0
+        self._swap_service: Deque[float] = deque(maxlen=50)
+        self._plain_service: Deque[float] = deque(maxlen=50)
+
+    def set_loaded(self, checkpoint: Optional[str], vae: Optional[str] = None):
+        """What the server reports as loaded, e.g. from `/sdapi/v1/options`."""
+        loaded = (checkpoint.split(" [")[0] if checkpoint else None, vae if vae is not None else self.loaded[1])
+        if not self._posted:
+            self._initial = loaded
+        self.loaded = loaded
+
+    def matches(self, model: Model) -> bool:
+        return all(wanted is None or wanted == current for wanted, current in zip(model, self.loaded))
+
+    def pick(self, jobs: List[GenerationJob]) -> int:
+        """Index of the job to post next in `jobs`, which is sorted by priority, then queue order."""
+        top = [i for i, job in enumerate(jobs) if job.priority == jobs[0].priority]
+        oldest = top[0]
+        if time.time() - jobs[oldest].created >= self.max_wait_s:
+            if not self.matches(job_model(jobs[oldest])) and any(self.matches(job_model(jobs[i])) for i in top):
+                self.forced += 1
+                logger.info(f"Job {jobs[oldest].id} waited {self.max_wait_s:g} s, switching models for it")
+            return oldest
+        return next((i for i in top if self.matches(job_model(jobs[i]))), oldest)
+
+    def on_posted(self, job: GenerationJob, sequence: int):
+        model = job_model(job)
+        if model != (None, None):
+            job.payload["override_settings_restore_afterwards"] = False
+        swapped = not self.matches(model)
+        if swapped:
+            self.swaps += 1
+            logger.debug(f"Job {job.id} switches the server from {self.loaded} to {model}")
+        self.loaded = tuple(wanted if wanted is not None else current for wanted, current in zip(model, self.loaded))
+        self._posted.append((sequence, model))
+        self._started[job.id] = (time.perf_counter(), swapped)
+
+    def on_finished(self, job: GenerationJob, success: bool):
+        started = self._started.pop(job.id, None)
+        if started is None:
+            return
+        now = time.perf_counter()
+        posted, swapped = started
+        # The server runs one job at a time: a job's service starts when it was posted or
+        # when the one before it finished, whichever is later
+        service = now - max(posted, self._last_completion)
+        self._last_completion = now
+        if success:
+            (self._swap_service if swapped else self._plain_service).append(service)
+
+    @property
+    def swap_cost_s(self) -> float:
+        if self._swap_service and self._plain_service:
+            return max(0.0, fmean(self._swap_service) - fmean(self._plain_service))
+        return self.switch_cost_s
+
+    def fifo_swaps(self) -> int:
+        """Swaps the posted jobs would have caused in plain queue order."""
+        loaded = self._initial
+        swaps = 0
+        for _, model in sorted(self._posted):
+            if not all(wanted is None or wanted == current for wanted, current in zip(model, loaded)):
+                swaps += 1
+            loaded = tuple(wanted if wanted is not None else current for wanted, current in zip(model, loaded))
+        return swaps
+
+    def stats(self) -> Dict[str, float]:
+        fifo = self.fifo_swaps()
+        cost = self.swap_cost_s
+        return {"jobs": len(self._posted), "swaps": self.swaps, "fifo_swaps": fifo, "forced": self.forced,
+                "swaps_saved": fifo - self.swaps, "swap_cost_s": round(cost, 2),
+                "time_saved_s": round((fifo - self.swaps) * cost, 1)}
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return (f"{stats['swaps']} model swaps for {stats['jobs']} jobs ({stats['forced']} forced), "
+                f"{stats['fifo_swaps']} in queue order: {stats['swaps_saved']} saved, about "
+                f"{stats['time_saved_s']:.0f} s at {stats['swap_cost_s']:.1f} s per swap")
+
+
+if __name__ == "__main__":
+    # The same interleaved jobs for three checkpoints against a stub server that takes a
+    # second to switch, in queue order and with the scheduler
+    import argparse
+    import json
+    import urllib.request
+    from PySide6.QtWidgets import QApplication
+    from api.backend.stub_server import start_stub_servers
+    from api.generator import ImageGenerator
+    from api.queue.job_queue import JobQueue
+
+    parser = argparse.ArgumentParser(description="Model swaps with and without the scheduler")
+    parser.add_argument("--jobs", type=int, default=12)
+    parser.add_argument("--switch-delay", type=float, default=1.0)
+    parser.add_argument("--max-wait", type=float, default=120.0)
+    parser.add_argument("--port", type=int, default=7893)
+    args = parser.parse_args()
+
+    app = QApplication([])
+    checkpoints = ["model_a.safetensors", "model_b.safetensors", "model_c.safetensors"]
+
+    def run(port: int, scheduler: Optional[ModelScheduler]):
+        start_stub_servers(1, base_port=port, delay=0.2, switch_delay=args.switch_delay,
+                           checkpoint=checkpoints[0], checkpoints=checkpoints)
+        queue = JobQueue(ImageGenerator(f"http://127.0.0.1:{port}"), max_in_flight=2, path=None,
+                         scheduler=scheduler)
+        queue.pause()  # Everything queued first, as if added while the server was busy
+        for i in range(args.jobs):
+            queue.enqueue("txt2img", {"prompt": f"job {i}", "steps": 5, "override_settings_restore_afterwards": False,
+                                      "override_settings": {"sd_model_checkpoint": checkpoints[i % 3]}})
+        start = time.perf_counter()
+        queue.idle.connect(app.quit)
+        queue.resume()
+        app.exec()
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/stub/log") as response:
+            switches = json.load(response)["switches"]
+        return time.perf_counter() - start, switches
+
+    elapsed, switches = run(args.port, None)
+    print(f"Queue order: {elapsed:.1f} s, {switches} checkpoint switches on the server")
+    scheduler = ModelScheduler(args.max_wait, loaded=(checkpoints[0], None))
+    elapsed, switches = run(args.port + 1, scheduler)
+    print(f"Scheduled:   {elapsed:.1f} s, {switches} checkpoint switches on the server")
+    print(scheduler.summary())
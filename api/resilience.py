@@ -0,0 +1,165 @@
+import random
+from enum import Enum
+from typing import Dict, Optional
+
+from PySide6.QtCore import QObject, Signal, Slot, QTimer, QUrl
+from PySide6.QtNetwork import QNetworkReply, QNetworkRequest
+from loguru import logger
+
+
+class Backoff:
+    """
+    Exponential backoff with jitter.
+
+    Every `next_delay()` grows the delay by `factor` up to `max_ms`, then takes a random
+    share of up to `jitter` off it, so clients that failed together don't retry together.
+    """
+
+    def __init__(self, base_ms: int = 500, max_ms: int = 30000, factor: float = 2.0, jitter: float = 0.5):
+        self.base_ms = base_ms
+        self.max_ms = max_ms
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next_delay(self) -> int:
+        """The delay before the next attempt in milliseconds."""
+        delay = min(self.base_ms * self.factor ** self.attempts, self.max_ms)
+        if delay < self.max_ms:
+            self.attempts += 1
+        return int(delay * (1 - self.jitter * random.random()))
+
+    def reset(self):
+        self.attempts = 0
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker(QObject):
+    """
+    Circuit breaker of one SD WebUI server, shared by every client talking to it.
+
+    CLOSED: requests go out. `failure_threshold` connection failures in a row, or a failed
+    `check_server`, open the circuit.
+    OPEN: nothing is sent. After a backoff delay, which grows with every failed probe, the
+    circuit turns HALF_OPEN and `probeDue` asks the fetchers for a `check_server`.
+    HALF_OPEN: one probe is let through. Any answer from the server closes the circuit, a
+    failure or no answer within `probe_timeout_ms` opens it again.
+
+    Signals:
+        stateChanged (BreakerState): Emits on every transition.
+        availabilityChanged (bool): Emits when the server is found to be down (circuit opened)
+            or up (first answer, circuit closed).
+        probeDue (): Emits when a half-open probe should be sent.
+    """
+    stateChanged = Signal(object)
+    availabilityChanged = Signal(bool)
+    probeDue = Signal()
+
+    def __init__(self, name: str, failure_threshold: int = 3, backoff: Optional[Backoff] = None,
+                 probe_timeout_ms: int = 10000, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff or Backoff(1000, 30000)
+        self.probe_timeout_ms = probe_timeout_ms
+        self.state = BreakerState.CLOSED
+        self.available: Optional[bool] = None  # None until the server answered or failed once
+        self.failures = 0
+        self._probing = False
+
+        # The open delay, then the timeout of the half-open probe
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_timer)
+
+    def allow_request(self, probe: bool = False) -> bool:
+        """Whether a request may be sent now. `probe` requests may go out as the half-open probe."""
+        if self.state == BreakerState.CLOSED:
+            return True
+        if self.state == BreakerState.HALF_OPEN and probe and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != BreakerState.CLOSED:
+            logger.info(f"Circuit of {self.name} closed, the server is back")
+            self._timer.stop()
+            self._probing = False
+            self.backoff.reset()
+            self._set_state(BreakerState.CLOSED)
+        self._set_available(True)
+
+    def record_failure(self, probe: bool = False):
+        """Count a connection failure, a failed probe opens the circuit at once."""
+        if self.state == BreakerState.OPEN:
+            return  # Sent before the circuit opened
+        self.failures += 1
+        if probe or self.state == BreakerState.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    def record_reply(self, reply: QNetworkReply, probe: bool = False):
+        """Count a finished reply: any HTTP answer is a success, a connection error a failure."""
+        error = reply.error()
+        if reply.attribute(QNetworkRequest.HttpStatusCodeAttribute):
+            self.record_success()
+        elif 0 < error.value < 100 and error != QNetworkReply.NetworkError.OperationCanceledError:
+            self.record_failure(probe)  # Connection level errors are 1-99, cache misses are not counted
+
+    def _open(self):
+        self._probing = False
+        delay = self.backoff.next_delay()
+        logger.warning(f"Circuit of {self.name} open, probing again in {delay} ms")
+        self._timer.start(delay)
+        self._set_state(BreakerState.OPEN)
+        self._set_available(False)
+
+    @Slot()
+    def _on_timer(self):
+        if self.state == BreakerState.OPEN:
+            self._set_state(BreakerState.HALF_OPEN)
+            self._timer.start(self.probe_timeout_ms)
+            self.probeDue.emit()
+        elif self.state == BreakerState.HALF_OPEN:
+            self._open()  # The probe never answered
+
+    def _set_state(self, state: BreakerState):
+        if state != self.state:
+            self.state = state
+            self.stateChanged.emit(state)
+
+    def _set_available(self, available: bool):
+        if available != self.available:
+            self.available = available
+            self.availabilityChanged.emit(available)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(url: str) -> CircuitBreaker:
+    """The breaker of the server at `url`, one per host and port."""
+    qurl = QUrl(url)
+    key = f"{qurl.host()}:{qurl.port(443 if qurl.scheme() == 'https' else 80)}"
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker(key)
+    return breaker
+
+
+if __name__ == "__main__":
+    from PySide6.QtWidgets import QApplication
+    from api.fetcher import BaseFetcher
+
+    app = QApplication([])
+    fetcher = BaseFetcher("http://127.0.0.1:7899")  # Nothing listens here
+    fetcher.breaker.stateChanged.connect(lambda state: print("Circuit", state.value))
+    fetcher.check_server()
+    QTimer.singleShot(20000, app.quit)
+    app.exec()
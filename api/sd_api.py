@@ -1,11 +1,13 @@
-from typing import Dict, Any
-from PySide6.QtCore import Signal, QObject, Slot, Qt, QTimer
+from PySide6.QtCore import Signal, QObject, Slot, QTimer
 from loguru import logger
 
 from config import sd_config
 
-from api.generator import ImageGenerator
 from api.fetcher import ProgressTracker, BaseFetcher, StatusTracker
+from api.queue import JobQueue, GenerationJob, ModelScheduler
+from api.backend import BackendPool
+from api.grid import GridRunner, GridSpec
+from api.resilience import breaker_for
 
 
 class StableDiffusionAPI(QObject):
@@ -32,6 +34,7 @@ class StableDiffusionAPI(QObject):
     #img
     image_progress_updated = Signal(dict)
     image_generated = Signal(dict)
+    job_generated = Signal(object, dict)  # GenerationJob, response
     image_generation_error = Signal(str, int)
 
     #message
@@ -46,32 +49,51 @@ class StableDiffusionAPI(QObject):
         super().__init__(parent)
 
         self.base_url = base_url
-        self.cache_limit = sd_config.netCacheSize.value
         self.auth_token = None
-        self.image_generator = ImageGenerator(base_url, self)
-        self.info_fetcher = BaseFetcher(base_url, self.auth_token, cache_size=self.cache_limit, parent = self)
-        self.tracker_fetcher = BaseFetcher(base_url, self.auth_token, cache_size=self.cache_limit, parent = self)
+        urls = [base_url] + [url.strip() for url in sd_config.extraApiUrls.value.split(",") if url.strip()]
+        self.backend_pool = BackendPool(urls, sd_config.backendScheduling.value, parent=self)
+        self.image_generator = self.backend_pool.primary.generator
+        self.info_fetcher = BaseFetcher(base_url, self.auth_token, parent = self)
+        self.tracker_fetcher = BaseFetcher(base_url, self.auth_token, parent = self)
         self.progress_tracker = ProgressTracker(self.tracker_fetcher)
         self.status_tracker = StatusTracker(self.tracker_fetcher)
+        self.breaker = breaker_for(base_url)
+        self.job_queue = JobQueue(self.backend_pool, self._queue_slots(sd_config.queueMaxInFlight.value),
+                                  scheduler=self._make_scheduler(), parent=self)
         self.active_generation = False
+        self._preview_visible = True
 
         self._signal_mapping()
+        self._update_preview_polling()
 
     def _signal_mapping(self):
         #image
-        self.image_generator.generation_failed.connect(self.image_generation_error.emit)
-        self.image_generator.generation_failed.connect(lambda : self._on_generation_finished())
-        self.image_generator.generation_completed.connect(self.image_generated.emit)
-        self.image_generator.generation_completed.connect(lambda : self._on_generation_finished())
-        self.image_generator.generation_started.connect(self.gen_started)
+        self.job_queue.jobFailed.connect(lambda job, msg, code: self.image_generation_error.emit(msg, code))
+        self.job_queue.jobFailed.connect(lambda : self._on_generation_finished())
+        self.job_queue.jobPostponed.connect(
+            lambda job, msg: self.image_generation_error.emit(f"{msg}. The job waits in the queue until it is back", 0))
+        self.job_queue.jobPostponed.connect(lambda : self._on_generation_finished())
+        self.job_queue.jobFinished.connect(lambda job, data: self.image_generated.emit(data))
+        self.job_queue.jobFinished.connect(self.job_generated.emit)
+        self.job_queue.jobFinished.connect(lambda : self._on_generation_finished())
+        self.backend_pool.generation_started.connect(self.gen_started)
+        sd_config.queueMaxInFlight.valueChanged.connect(
+            lambda value: setattr(self.job_queue, 'max_in_flight', self._queue_slots(value)))
+        sd_config.jobScheduling.valueChanged.connect(
+            lambda _: setattr(self.job_queue, 'scheduler', self._make_scheduler()))
+        sd_config.modelSwitchMaxWait.valueChanged.connect(self._on_max_wait_changed)
+        self.backend_pool.primary.capabilitiesChanged.connect(self._on_primary_capabilities)
         #progress
         self.progress_tracker.progressData.connect(self.image_progress_updated.emit)
+        sd_config.showLivePreview.valueChanged.connect(lambda _: self._update_preview_polling())
+        sd_config.livePreviewDelayMs.valueChanged.connect(
+            lambda value: setattr(self.progress_tracker, 'preview_interval_ms', value))
         #tracker
         self.status_tracker.statusData.connect(self.server_status_changed.emit)
-        #fetcher
-        self.info_fetcher.dataFetched.connect(self._handle_response)
-        self.info_fetcher.fetchFailed.connect(self._handle_error)
-        self.info_fetcher.serverAvailable.connect(self.server_status_changed)
+        #server, from the circuit breaker shared by every client of the server
+        self.breaker.availabilityChanged.connect(self.server_status_changed)
+        # Jobs restored from the last session wait until the server is reachable
+        self.breaker.availabilityChanged.connect(self._on_server_available)
 
 
         # === Public API Methods ===
@@ -86,18 +108,12 @@ class StableDiffusionAPI(QObject):
     @Slot()
     def refresh_models(self):
         """Force refresh of model list"""
-        self.info_fetcher.refresh_models()
-        self.info_fetcher.dataFetched.connect(
-            lambda _, uuid: self.models_refreshed.emit(),
-            Qt.ConnectionType.SingleShotConnection)
+        self.info_fetcher.refresh_models(on_success=lambda _: self.models_refreshed.emit())
 
     @Slot()
     def refresh_loras(self):
         """Force refresh of LoRA list"""
-        self.info_fetcher.refresh_loras()
-        self.info_fetcher.dataFetched.connect(
-            lambda _, uuid: self.loras_refreshed.emit(),
-            Qt.ConnectionType.SingleShotConnection)
+        self.info_fetcher.refresh_loras(on_success=lambda _: self.loras_refreshed.emit())
 
     @Slot()
     def fetch_all_resources(self):
@@ -112,48 +128,45 @@ class StableDiffusionAPI(QObject):
     def check_server_status(self):
         """Check if the server is available"""
         self.info_fetcher.check_server()
+        self.backend_pool.check_health()
+
+    def _queue_slots(self, per_backend: int) -> int:
+        return per_backend * len(self.backend_pool.backends)
 
     @Slot()
     def get_models(self):
         """Fetch available models"""
-        uuid = self.info_fetcher.fetch_models()
-        self._pending_requests[uuid] = 'models'
+        self.info_fetcher.fetch_models(on_success=self.checkpoint_fetched.emit, on_failure=self.checkpoint_fetch_error.emit)
 
     @Slot()
     def get_vaes(self):
         """Fetch available VAEs"""
-        uuid = self.info_fetcher.fetch_vaes()
-        self._pending_requests[uuid] = 'vaes'
+        self.info_fetcher.fetch_vaes(on_success=self.vae_fetched.emit, on_failure=self.vae_fetch_error.emit)
 
     @Slot()
     def get_embeddings(self):
         """Fetch loaded embeddings"""
-        uuid = self.info_fetcher.fetch_embeddings()
-        self._pending_requests[uuid] = 'embeddings'
+        self.info_fetcher.fetch_embeddings(on_success=self.embedding_fetched.emit, on_failure=self.embedding_fetch_error.emit)
 
     @Slot()
     def get_loras(self):
         """Fetch available LoRAs"""
-        uuid = self.info_fetcher.fetch_loras()
-        self._pending_requests[uuid] = 'loras'
+        self.info_fetcher.fetch_loras(on_success=self.lora_fetched.emit, on_failure=self.lora_fetch_error.emit)
 
     @Slot()
     def get_styles(self):
         """Fetch prompt styles"""
-        uuid = self.info_fetcher.fetch_styles()
-        self._pending_requests[uuid] = 'styles'
+        self.info_fetcher.fetch_styles(on_success=self.style_fetched.emit, on_failure=self.style_fetch_error.emit)
 
     @Slot()
     def get_upscalers(self):
         """Fetch available upscalers"""
-        uuid = self.info_fetcher.fetch_upscalers()
-        self._pending_requests[uuid] = 'upscalers'
+        self.info_fetcher.fetch_upscalers(on_success=self.upscaler_fetched.emit, on_failure=self.upscaler_fetch_error.emit)
 
     @Slot()
     def get_samplers(self):
         """Fetch available samplers"""
-        uuid = self.info_fetcher.fetch_samplers()
-        self._pending_requests[uuid] = 'samplers'
+        self.info_fetcher.fetch_samplers(on_success=self.sampler_fetched.emit, on_failure=self.sampler_fetch_error.emit)
 
     @Slot(int)
     def start_progress_monitoring(self, interval_ms=500):
@@ -165,68 +178,76 @@ class StableDiffusionAPI(QObject):
         """Stop progress updates"""
         self.progress_tracker.stop_monitoring()
 
+    def set_preview_visible(self, visible: bool):
+        """Whether the live preview can be seen at all, progress polls skip the image when not."""
+        self._preview_visible = visible
+        self._update_preview_polling()
+
+    def _update_preview_polling(self):
+        self.progress_tracker.set_preview_enabled(sd_config.showLivePreview.value and self._preview_visible)
+
     @Slot()
     def _on_generation_finished(self):
+        if self.job_queue.running_count:
+            return  # The next job is already running, keep tracking it
         self.active_generation = False
         self.progress_tracker.stop_monitoring()
 
-    # === Internal Handlers ===
-    def _handle_response(self, data: Dict[str, Any], request_uuid: str):
-        """Route successful responses to appropriate signals"""
-        endpoint = self._pending_requests.pop(request_uuid, None)
-
-        if not endpoint:
-            return
-
-        if endpoint == 'models':
-            self.checkpoint_fetched.emit(data)
-        elif endpoint == 'vaes':
-            self.vae_fetched.emit(data)
-        elif endpoint == 'embeddings':
-            self.embedding_fetched.emit(data)
-        elif endpoint == 'loras':
-            self.lora_fetched.emit(data)
-        elif endpoint == 'styles':
-            self.style_fetched.emit(data)
-        elif endpoint == 'upscalers':
-            self.upscaler_fetched.emit(data)
-        elif endpoint  == 'samplers':
-            self.sampler_fetched.emit(data)
-
-    def _handle_error(self, error_msg: str, status_code: int, request_uuid: str):
-        """Route errors to appropriate signals"""
-        endpoint = self._pending_requests.pop(request_uuid, None)
-
-        if not endpoint:
-            return
-
-        if endpoint == 'models':
-            self.checkpoint_fetch_error.emit(error_msg, status_code)
-        elif endpoint == 'vaes':
-            self.vae_fetch_error.emit(error_msg, status_code)
-        elif endpoint == 'embeddings':
-            self.embedding_fetch_error.emit(error_msg, status_code)
-        elif endpoint == 'loras':
-            self.lora_fetch_error.emit(error_msg, status_code)
-        elif endpoint == 'styles':
-            self.style_fetch_error.emit(error_msg, status_code)
-        elif endpoint == 'upscalers':
-            self.upscaler_fetch_error.emit(error_msg, status_code)
-        elif endpoint == 'samplers':
-            self.sampler_fetch_error.emit(error_msg, status_code)
+    def _make_scheduler(self):
+        if sd_config.jobScheduling.value != "model_affinity":
+            return None
+        return ModelScheduler(sd_config.modelSwitchMaxWait.value, loaded=(self.backend_pool.primary.checkpoint, None))
+
+    def _on_max_wait_changed(self, value: int):
+        if self.job_queue.scheduler is not None:
+            self.job_queue.scheduler.max_wait_s = value
+
+    def _on_primary_capabilities(self):
+        scheduler = self.job_queue.scheduler
+        # Only while nothing runs, otherwise the reported model may predate a switch already posted
+        if scheduler is not None and not self.job_queue.running_count:
+            scheduler.set_loaded(self.backend_pool.primary.checkpoint)
+
+    @Slot(bool)
+    def _on_server_available(self, available: bool):
+        if available:
+            self.job_queue.resume()
 
     #generate helper
-    def generate_txt_image(self, payload: dict):
-        if self.gen_status:
-            logger.info("Generation already in progress")
-            return
-        self.image_generator.txt2img(payload)
+    def generate_txt_image(self, payload: dict, priority: int = 0, gen_type: str = None) -> str:
+        """Queue a txt2img generation. Returns the job id."""
+        return self.enqueue_generation("txt2img", payload, priority, gen_type)
+
+    def generate_img2img_image(self, payload: dict, priority: int = 0, gen_type: str = None) -> str:
+        """Queue an img2img generation. Returns the job id."""
+        return self.enqueue_generation("img2img", payload, priority, gen_type)
 
-    def generate_img2img_image(self, payload: dict):
+    def enqueue_generation(self, endpoint: str, payload: dict, priority: int = 0, gen_type: str = None) -> str:
         if self.gen_status:
-            logger.info("Generation already in progress")
-            return
-        self.image_generator.img2img(payload)
+            logger.info(f"Generation in progress, queued behind {self.job_queue.pending_count} job(s)")
+        # Asking for a generation means the server is expected to be up
+        self.job_queue.resume()
+        return self.job_queue.enqueue(endpoint, payload, priority, gen_type)
+
+    def generate_forever(self, endpoint: str, payload: dict, gen_type: str = None):
+        """Keep generating `payload` until `stop_generate_forever()`."""
+        self.job_queue.resume()
+        self.job_queue.repeat(endpoint, payload, gen_type)
+
+    def stop_generate_forever(self):
+        self.job_queue.stop_repeat()
+
+    def generate_grid(self, spec: GridSpec, gen_type: str = None) -> GridRunner:
+        """Run an X/Y/Z grid through the job queue, starting from the checkpoint the primary server has loaded."""
+        runner = GridRunner(spec, self.job_queue, gen_type, loaded={"checkpoint": self.backend_pool.primary.checkpoint},
+                            parent=self)
+        runner.finished.connect(runner.deleteLater)
+        self.job_queue.resume()
+        runner.start()
+        return runner
+
+    def cancel_generation(self, job_id: str) -> bool:
+        return self.job_queue.cancel(job_id)
 
     # Synchronous versions
     def generate_sync(self, payload: dict, endpoint: str):
@@ -245,14 +266,8 @@ class StableDiffusionAPI(QObject):
     def gen_status(self):
         return self.active_generation
 
-    @property
-    def _pending_requests(self) -> Dict[str, str]:
-        """Lazy initialization of request tracking dict"""
-        if not hasattr(self, '_internal_pending'):
-            self._internal_pending = {}
-        return self._internal_pending
-
     def close(self):
+        self.job_queue.save()
         self.info_fetcher.cancel()
         self.progress_tracker.stop_monitoring()
 
@@ -0,0 +1,159 @@
+import json
+from typing import Dict, Optional, Union
+
+from PySide6.QtCore import QObject, QUrl, QByteArray
+from PySide6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply, QHttp1Configuration
+from loguru import logger
+
+from config import sd_config
+from utils.cache_manager import cache_manager
+
+
+class NetworkSession(QObject):
+    """
+    One `QNetworkAccessManager` shared by every client of a group of servers.
+
+    Qt pools keep-alive connections per access manager, so clients sharing a session reuse
+    each other's connections instead of each opening their own: the progress poller polls
+    over an idle pooled connection next to the one a generation is waiting on. Requests
+    are built here, so the auth header, per-host connection limit, transfer timeout,
+    HTTP/2 opt-in and cache policy are the same for every client.
+
+    Replies are delivered through their own `finished` signal, the manager's `finished`
+    carries the replies of all clients.
+    """
+
+    def __init__(self, cache_namespace: Optional[str] = None, auth_token: Optional[str] = None,
+                 max_per_host: int = 6, timeout_ms: int = 30000, http2: bool = False, parent=None):
+        """
+        Args:
+            cache_namespace: `CacheManager` disk namespace of the HTTP cache, None for none.
+            auth_token: Sent as a bearer token with every request.
+            max_per_host: Connections kept open to one host.
+            timeout_ms: Default transfer timeout, the time without any data before a reply
+                is aborted. 0 disables it.
+            http2: Allow HTTP/2, negotiated with servers that support it over TLS.
+        """
+        super().__init__(parent)
+        self.auth_token = auth_token
+        self.timeout_ms = timeout_ms
+        self.http2 = http2
+        self.manager = QNetworkAccessManager(self)
+        self.cache = cache_manager().disk_cache(cache_namespace) if cache_namespace else None
+        if self.cache is not None:
+            self.manager.setCache(self.cache)
+        self._http1 = QHttp1Configuration()
+        self.set_max_per_host(max_per_host)
+
+    def set_max_per_host(self, count: int):
+        """Applies to connections opened from now on."""
+        self._http1.setNumberOfConnectionsPerHost(max(1, count))
+
+    def request(self, url: Union[str, QUrl], headers: Optional[Dict[str, str]] = None,
+                timeout_ms: Optional[int] = None, use_cache: bool = True) -> QNetworkRequest:
+        """Build a request with the session defaults, `timeout_ms` overrides the transfer timeout."""
+        request = QNetworkRequest(QUrl(url) if isinstance(url, str) else url)
+        if self.auth_token:
+            request.setRawHeader(b"Authorization", f"Bearer {self.auth_token}".encode())
+        for key, value in (headers or {}).items():
+            request.setRawHeader(key.encode(), value.encode())
+        request.setHttp1Configuration(self._http1)
+        request.setAttribute(QNetworkRequest.Attribute.Http2AllowedAttribute, self.http2)
+        request.setTransferTimeout(self.timeout_ms if timeout_ms is None else timeout_ms)
+        if not use_cache:
+            request.setAttribute(QNetworkRequest.Attribute.CacheLoadControlAttribute,
+                                 QNetworkRequest.CacheLoadControl.AlwaysNetwork)
+            request.setAttribute(QNetworkRequest.Attribute.CacheSaveControlAttribute, False)
+        return request
+
+    def send(self, method: str, request: QNetworkRequest, data: Optional[Union[bytes, QByteArray]] = None,
+             owner: Optional[QObject] = None) -> QNetworkReply:
+        """
+        Send `request`. With an `owner` the reply becomes its child, so it is aborted and
+        deleted along with the client instead of finishing into a deleted object.
+        """
+        method = method.upper()
+        data = QByteArray(data) if isinstance(data, bytes) else data if data is not None else QByteArray()
+        if method == "GET":
+            reply = self.manager.get(request)
+        elif method == "POST":
+            reply = self.manager.post(request, data)
+        elif method == "PUT":
+            reply = self.manager.put(request, data)
+        elif method == "DELETE":
+            reply = self.manager.deleteResource(request)
+        else:
+            reply = self.manager.sendCustomRequest(request, method.encode(), data)
+        if owner is not None:
+            reply.setParent(owner)
+        return reply
+
+    def get(self, request: QNetworkRequest, owner: Optional[QObject] = None) -> QNetworkReply:
+        return self.send("GET", request, owner=owner)
+
+    def post(self, request: QNetworkRequest, data: Union[bytes, QByteArray],
+             owner: Optional[QObject] = None) -> QNetworkReply:
+        return self.send("POST", request, data, owner)
+
+    def post_json(self, request: QNetworkRequest, body: Dict, owner: Optional[QObject] = None) -> QNetworkReply:
+        request.setHeader(QNetworkRequest.KnownHeaders.ContentTypeHeader, "application/json")
+        return self.send("POST", request, json.dumps(body).encode(), owner)
+
+
+_sessions: Dict[str, NetworkSession] = {}
+
+
+def network_session(namespace: str = "api") -> NetworkSession:
+    """
+    The session of `namespace`, created on first use.
+
+    Namespaces are the `CacheManager` disk namespaces: "api" for the SD WebUI servers,
+    "civitai" for Civitai metadata and "previews" for downloaded images. A session per
+    namespace keeps each disk cache with one owner, connections are per host anyway.
+    """
+    session = _sessions.get(namespace)
+    if session is None:
+        session = _sessions[namespace] = NetworkSession(namespace, http2=sd_config.enableHttp2.value)
+        logger.debug(f"Network session '{namespace}' created (HTTP/2 {'allowed' if session.http2 else 'off'})")
+    return session
+
+
+if __name__ == "__main__":
+    # Benchmark: latency of small API requests with pooled keep-alive connections,
+    # against a new connection for every request
+    import argparse
+    import statistics
+    import time
+    from PySide6.QtCore import QEventLoop
+    from PySide6.QtWidgets import QApplication
+    from api.backend.stub_server import start_stub_servers
+
+    parser = argparse.ArgumentParser(description="Request latency with and without connection reuse")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--port", type=int, default=7881)
+    args = parser.parse_args()
+
+    app = QApplication([])
+    start_stub_servers(1, base_port=args.port)
+    url = f"http://127.0.0.1:{args.port}/sdapi/v1/progress?skip_current_image=true"
+
+    def run(reuse: bool, report: bool = True):
+        session = NetworkSession()
+        headers = None if reuse else {"Connection": "close"}
+        latencies = []
+        for _ in range(args.requests):
+            loop = QEventLoop()
+            start = time.perf_counter()
+            reply = session.get(session.request(url, headers, use_cache=False))
+            reply.finished.connect(loop.quit)
+            loop.exec()
+            latencies.append((time.perf_counter() - start) * 1000)
+            reply.deleteLater()
+        latencies.sort()
+        if report:
+            print(f"{'reused' if reuse else 'new connection':>15}: median {statistics.median(latencies):.2f} ms, "
+                  f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms, mean {statistics.fmean(latencies):.2f} ms")
+
+    run(True, report=False)  # Warm-up
+    run(False)
+    run(True)
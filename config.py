@@ -88,6 +88,7 @@ class MyConfig(QConfig):
     txt2imgDir = ConfigItem("Output", "Txt2ImgDir", "outputs\\txt2img", ConfigValidator())
     img2imgDir = ConfigItem("Output", "Img2ImgDir", "outputs\\img2img", ConfigValidator())
     controlsDir = ConfigItem("Output", "ControlsDir", "outputs\\controls", ConfigValidator())
+    gridsDir = ConfigItem("Output", "GridsDir", "outputs/grids", ConfigValidator())
     defaultImageFormat = OptionsConfigItem("Output", "DefaultImageFormat", "jpeg", OptionsValidator(["png", "jpg", "webp", "jpeg"]))
 
     #data directory
@@ -99,12 +100,25 @@ class MyConfig(QConfig):
     # API
     apiUrl = ConfigItem("API", "Url", "http://127.0.0.1:7860", ConfigValidator(), restart=True)
     defaultSteps = RangeConfigItem("API", "DefaultSteps", 20, RangeValidator(1, 150))
+    queueMaxInFlight = RangeConfigItem("API", "QueueMaxInFlight", 1, RangeValidator(1, 8))
+    extraApiUrls = ConfigItem("API", "ExtraUrls", "", ConfigValidator(), restart=True)
+    backendScheduling = OptionsConfigItem("API", "BackendScheduling", "least_loaded",
+                                          OptionsValidator(["least_loaded", "affinity"]), restart=True)
+    jobScheduling = OptionsConfigItem("API", "JobScheduling", "fifo", OptionsValidator(["fifo", "model_affinity"]))
+    modelSwitchMaxWait = RangeConfigItem("API", "ModelSwitchMaxWait", 120, RangeValidator(0, 1800))
+    enableHttp2 = ConfigItem("API", "Http2", False, BoolValidator(), restart=True)
 
     # Cache
     netCacheSize = RangeConfigItem("Cache", "NetworkCacheSize", 104857600, RangeValidator(10485760, 1048576000), restart= True)
     thumbCacheSize = RangeConfigItem("Cache", "ThumbnailCacheSize", 104857600, RangeValidator(10485760, 1048576000), restart= True)
+    viewerCacheSize = RangeConfigItem("Cache", "ViewerCacheSize", 268435456, RangeValidator(10485760, 2147483648), restart= True)
 
 
+    # Payload images
+    initImageFormat = OptionsConfigItem("Payload", "InitImageFormat", "webp", OptionsValidator(["png", "webp", "jpeg"]))
+    initImageQuality = RangeConfigItem("Payload", "InitImageQuality", 95, RangeValidator(50, 100))
+    preResizeInputs = ConfigItem("Payload", "PreResizeInputs", True, BoolValidator())
+
     # Preview
     showLivePreview = ConfigItem("Preview", "ShowLivePreview", True, BoolValidator())
     livePreviewDelayMs = RangeConfigItem("Preview", "LivePreviewDelayMs", 500, RangeValidator(1, 5000))
@@ -112,10 +126,12 @@ class MyConfig(QConfig):
     # Save State
     saveGenInfoToTxt = ConfigItem("Save", "SaveGenInfoToTxt", True, BoolValidator())
     enableAutosave = ConfigItem("Save", "EnableAutosave", True, BoolValidator())
+    embedExifThumbnail = ConfigItem("Save", "EmbedExifThumbnail", True, BoolValidator())
 
     # Gallery
     maxGalleryImages = RangeConfigItem("Gallery", "PreLoadImages", 50, RangeValidator(50, 200))
     additionSearchPath = ConfigItem("Gallery", "AdditionalSearchPath", [], ConfigValidator())
+    viewerPrefetch = RangeConfigItem("Gallery", "ViewerPrefetch", 2, RangeValidator(0, 10))
 
     #update
     enableAutoUpdate = ConfigItem("Update", "EnableAutoUpdate", True, BoolValidator())
@@ -3,12 +3,14 @@ from .card import VerticalCard, HorizontalCard, CardBase, FlowCard, TitleCardBas
     , FlowTitleCard, DropDownCard
 from .slider import ThemedSlider, CustomSlider
 from .myFrame import VerticalFrame, HorizontalFrame, FlowFrame, GridFrame
-from .label import ThemedLabel, ChipBodyLabel
+from .label import ThemedLabel, ChipBodyLabel, elided_text
 from .myScroll import VerticalScrollWidget, HorizontalScrollWidget, FlowScrollWidget, VerticalScrollCard
 from .text_box import MyTextEdit
 from .stacked_widget import SegmentedStackedWidget
 from .splitter import HoverSplitter
 from .graphic_view import ImageViewer, InputImageViewer
+from .tiled_image import TiledImageItem
+from .live_preview import LivePreviewRenderer
 from .table_wiget import DictTableWidget
 from .tab_widget import MyTabWidget
 from .progress_bar import MyProgressBar
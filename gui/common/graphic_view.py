@@ -1,11 +1,11 @@
 import base64
 from idlelib.tree import wheel_event
 from pathlib import Path
-from typing import Union
+from typing import Union, Optional
 
-from PySide6.QtCore import Qt, QByteArray, QRect, QRectF, Signal
-from PySide6.QtGui import QColor, QBrush, QPainter, QPixmap, QImage, QFont, QPen, QPainterPath, QIcon
-from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QFrame, QFileDialog
+from PySide6.QtCore import Qt, QByteArray, QRect, QRectF, QSize, Signal
+from PySide6.QtGui import QColor, QBrush, QPainter, QPixmap, QImage, QFont, QPen, QPainterPath, QIcon, QImageReader
+from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QGraphicsItem, QFrame, QFileDialog
 from loguru import logger
 from qfluentwidgets import isDarkTheme, toggleTheme, qconfig
 
@@ -13,18 +13,83 @@ from qfluentwidgets import isDarkTheme, toggleTheme, qconfig
 from utils import recolorPixmap
 from config import Placeholder
 from utils import base64_pixmap
+from .tiled_image import TiledImageItem
 
 
 class ImageViewerBase:
     MIN_ZOOM = 0.1
     MAX_ZOOM = 10.0
+    # Images with at least this many pixels are drawn tile by tile instead of as one pixmap
+    TILED_MIN_PIXELS = 4096 * 4096
+    tiling_enabled = True
     imageChanged = Signal()
+
+    _current_pixmap: Optional[QPixmap] = None
+    _tiled_item: Optional[TiledImageItem] = None
+    _transformation_mode = Qt.TransformationMode.FastTransformation
+
+    @property
+    def current_pixmap(self) -> Optional[QPixmap]:
+        if self._current_pixmap is None and self._tiled_shown():
+            # Tiled images are only turned into a single pixmap when somebody asks for it
+            self._current_pixmap = QPixmap.fromImage(self._tiled_item.image())
+        return self._current_pixmap
+
+    @current_pixmap.setter
+    def current_pixmap(self, pixmap: Optional[QPixmap]):
+        self._current_pixmap = pixmap
+
+    def has_image(self) -> bool:
+        """Whether an image is shown, without materializing a tiled image as a pixmap."""
+        return self._current_pixmap is not None or self._tiled_shown()
+
+    def _use_tiling(self, size: QSize) -> bool:
+        return self.tiling_enabled and size.width() * size.height() >= self.TILED_MIN_PIXELS
+
+    def _tiled_shown(self) -> bool:
+        return self._tiled_item is not None and self._tiled_item.isVisible()
+
+    def _display_item(self) -> QGraphicsItem:
+        return self._tiled_item if self._tiled_shown() else self.image_item
+
+    def _tiled(self) -> TiledImageItem:
+        if self._tiled_item is None:
+            self._tiled_item = TiledImageItem()
+            self._tiled_item.setTransformationMode(self._transformation_mode)
+            self._tiled_item.setVisible(False)
+            self.scene.addItem(self._tiled_item)
+        return self._tiled_item
+
+    def _show_tiled(self, pixmap: Optional[QPixmap] = None):
+        item = self._tiled_item
+        self.image_item.setPixmap(QPixmap())
+        item.setVisible(True)
+        self.setSceneRect(item.boundingRect())
+        self.resetTransform()
+        self.zoom_factor = 1.0
+        self.current_pixmap = pixmap
+        size = item.image_size()
+        logger.info(f"Tiled image loaded: {size.width()}x{size.height()}")
+        self.fitInView(item, Qt.AspectRatioMode.KeepAspectRatio)
+        self.imageChanged.emit()
+        self.update()
+
+    def _hide_tiled(self):
+        if self._tiled_item is not None and self._tiled_item.isVisible():
+            self._tiled_item.clear()
+            self._tiled_item.setVisible(False)
+
     def load_image(self, file_path: Union[str, Path]):
         """Load an image from a file path."""
         try:
             file_path = Path(file_path) if isinstance(file_path, str) else file_path
             logger.info(f"Loading image from: {file_path}")
             self.image_path = file_path
+            if self._use_tiling(QImageReader(str(self.image_path)).size()):
+                if not self._tiled().set_file(str(self.image_path)):
+                    raise ValueError("Failed to load image: Image is null")
+                self._show_tiled()
+                return
             image = QPixmap(str(self.image_path))
             self.set_pixmap(image)
             if image.isNull():
@@ -32,9 +97,19 @@ class ImageViewerBase:
         except Exception as e:
             logger.exception(f"Error loading image: {e}")
 
+    def set_image(self, image: QImage, file_path: Union[str, Path, None] = None):
+        """Show an already decoded image, e.g. one prefetched on a worker thread."""
+        if file_path is not None:
+            self.image_path = Path(file_path) if isinstance(file_path, str) else file_path
+        if self._use_tiling(image.size()):
+            if self._tiled().set_image(image):
+                self._show_tiled()
+            return
+        self.set_pixmap(QPixmap.fromImage(image))
+
     def wheelEvent(self, event):
         """Handle mouse wheel events for zooming."""
-        if self.current_pixmap is None:
+        if not self.has_image():
             return
         delta = event.angleDelta().y()
         if delta > 0:
@@ -46,7 +121,7 @@ class ImageViewerBase:
 
     def zoom_in(self):
         """Increase zoom level."""
-        if self.zoom_factor < self.MAX_ZOOM and not self.image_item.pixmap().isNull():
+        if self.zoom_factor < self.MAX_ZOOM and not self._display_item().boundingRect().isEmpty():
             self.zoom_factor = min(self.MAX_ZOOM, self.zoom_factor * 1.1)
             self.scale(1.1, 1.1)
             # image_size = self.image_item.pixmap().size()
@@ -54,7 +129,7 @@ class ImageViewerBase:
 
     def zoom_out(self):
         """Decrease zoom level."""
-        if self.zoom_factor > self.MIN_ZOOM and not self.image_item.pixmap().isNull():
+        if self.zoom_factor > self.MIN_ZOOM and not self._display_item().boundingRect().isEmpty():
             self.zoom_factor = max(self.MIN_ZOOM, self.zoom_factor * 0.9)
             self.scale(0.9, 0.9)
 
@@ -63,9 +138,34 @@ class ImageViewerBase:
         if pixmap:
             self.set_pixmap(pixmap)
 
+    def show_frame(self, image: QImage):
+        """
+        Swap in a live preview frame, reusing the pixmap item.
+
+        Unlike `set_pixmap` the view transform is kept, so zoom and pan survive the frames.
+        The view is only fitted again when the frame size changes.
+        """
+        if image.isNull():
+            return
+        pixmap = QPixmap.fromImage(image)
+        self._hide_tiled()
+        resized = self.image_item.pixmap().size() != pixmap.size()
+        self.image_item.setPixmap(pixmap)
+        self.current_pixmap = pixmap
+        if resized:
+            self.setSceneRect(pixmap.rect())
+            self.resetTransform()
+            self.zoom_factor = 1.0
+            self.fitInView(self.image_item, Qt.AspectRatioMode.KeepAspectRatio)
+
     def set_pixmap(self, pixmap: QPixmap):
         if pixmap.isNull():
             return
+        if self._use_tiling(pixmap.size()):
+            if self._tiled().set_image(pixmap.toImage()):
+                self._show_tiled(pixmap)
+            return
+        self._hide_tiled()
         # self.image_item.setTransformationMode(Qt.TransformationMode.SmoothTransformation)
         self.image_item.setPixmap(pixmap)
         self.setSceneRect(pixmap.rect())
@@ -83,10 +183,13 @@ class ImageViewerBase:
         self.update()
 
     def resizeEvent(self, event, /):
-        self.fitInView(self.image_item, Qt.AspectRatioMode.KeepAspectRatio)
+        self.fitInView(self._display_item(), Qt.AspectRatioMode.KeepAspectRatio)
 
     def setPixmapTransformationMode(self, mode: Qt.TransformationMode):
+        self._transformation_mode = mode
         self.image_item.setTransformationMode(mode)
+        if self._tiled_item is not None:
+            self._tiled_item.setTransformationMode(mode)
 
 class ImageViewer(ImageViewerBase, QGraphicsView):
     MIN_ZOOM = 0.1
@@ -264,7 +367,7 @@ class InputImageViewer(ImageViewerBase, QGraphicsView):
     def mousePressEvent(self, event, /):
         super().mousePressEvent(event)
         if event.button() == Qt.MouseButton.LeftButton and self.acceptDrops():
-            if not self.current_pixmap:
+            if not self.has_image():
                 self._open_file_dialog()
 
     def _open_file_dialog(self):
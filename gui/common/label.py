@@ -1,8 +1,33 @@
+from functools import lru_cache
+
 from qfluentwidgets import getFont, themeColor, FluentLabelBase, \
     toggleTheme, isDarkTheme
 from PySide6.QtCore import Qt, Signal
+from PySide6.QtGui import QFont, QFontMetrics
 from qfluentwidgets import BodyLabel, setCustomStyleSheet
 
+
+@lru_cache(maxsize=64)
+def _font_metrics(font_key: str) -> QFontMetrics:
+    font = QFont()
+    font.fromString(font_key)
+    return QFontMetrics(font)
+
+
+@lru_cache(maxsize=4096)
+def _elided_text(text: str, width: int, font_key: str, mode: Qt.TextElideMode) -> str:
+    return _font_metrics(font_key).elidedText(text, mode, width)
+
+
+def elided_text(text: str, font: QFont, width: int, mode=Qt.TextElideMode.ElideMiddle) -> str:
+    """
+    Cached `QFontMetrics.elidedText`.
+
+    Titles are re-elided on every resize and repaint, the cache keyed on
+    (text, width, font) turns repeated calls into a dict lookup.
+    """
+    return _elided_text(text, width, font.toString(), mode)
+
 class ThemedLabel(FluentLabelBase):
     def __init__(self, text: str, parent=None):
         super().__init__(parent)
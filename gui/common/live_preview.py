@@ -0,0 +1,132 @@
+import base64
+import time
+from typing import Optional, Tuple, Union
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal, Slot
+from PySide6.QtGui import QImage
+from loguru import logger
+
+_frame_pool: Optional[QThreadPool] = None
+
+
+def _pool() -> QThreadPool:
+    global _frame_pool
+    if _frame_pool is None:
+        _frame_pool = QThreadPool()
+        _frame_pool.setMaxThreadCount(1)
+    return _frame_pool
+
+
+def decode_frame(frame: Union[str, bytes]) -> QImage:
+    """Decode a base64 preview image (with or without data URI prefix) or encoded image bytes."""
+    if isinstance(frame, str):
+        if frame.startswith("data:"):
+            frame = frame.split(",", 1)[1]
+        frame = base64.b64decode(frame)
+    return QImage.fromData(frame)
+
+
+class _FrameTask(QRunnable):
+    def __init__(self, renderer: "LivePreviewRenderer", sequence: int, frame: Union[str, bytes]):
+        super().__init__()
+        self.renderer = renderer
+        self.sequence = sequence
+        self.frame = frame
+
+    def run(self):
+        try:
+            image = decode_frame(self.frame)
+        except Exception as e:
+            logger.warning(f"Failed to decode live preview frame: {e}")
+            image = QImage()
+        self.renderer._decoded.emit(self.sequence, image)
+
+
+class LivePreviewRenderer(QObject):
+    """
+    Shows live preview frames in an image viewer without blocking the GUI thread.
+
+    Frames are decoded on a worker thread, one at a time. Only the newest frame waits for
+    a decode, older ones are dropped when a newer one arrives, so slow decodes never pile
+    up. Decoded frames are handed to `view.show_frame()` at most once per display refresh,
+    which swaps the pixmap in place and leaves the user's zoom and pan alone.
+    """
+    _decoded = Signal(int, QImage)
+
+    def __init__(self, view, parent=None):
+        """
+        Args:
+            view: An `ImageViewerBase` the frames are shown in.
+        """
+        super().__init__(parent)
+        self.view = view
+        self.rendered = 0
+        self.dropped = 0
+
+        self._sequence = 0
+        self._shown = 0  # Sequence of the last shown frame, anything older is stale
+        self._pending: Optional[Tuple[int, Union[str, bytes]]] = None  # Waiting for the decoder
+        self._ready: Optional[Tuple[int, QImage]] = None  # Decoded, waiting for the next refresh
+        self._decoding = False
+        self._last_render = 0.0
+
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.timeout.connect(self._render)
+        self._decoded.connect(self._on_decoded)
+
+    def submit(self, frame: Union[str, bytes]):
+        """Queue a frame, replacing any frame still waiting to be decoded."""
+        self._sequence += 1
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = (self._sequence, frame)
+        self._decode_next()
+
+    def reset(self):
+        """Drop every frame not shown yet, e.g. because the final image arrived."""
+        if self.rendered or self.dropped:
+            logger.debug(f"Live preview: {self.rendered} frames shown, {self.dropped} dropped")
+        self._shown = self._sequence
+        self._pending = None
+        self._ready = None
+        self._render_timer.stop()
+        self.rendered = self.dropped = 0
+
+    def frame_interval_ms(self) -> float:
+        screen = self.view.screen() if hasattr(self.view, "screen") else None
+        refresh_rate = screen.refreshRate() if screen is not None else 0
+        return 1000 / (refresh_rate if refresh_rate > 0 else 60)
+
+    def _decode_next(self):
+        if self._decoding or self._pending is None:
+            return
+        sequence, frame = self._pending
+        self._pending = None
+        self._decoding = True
+        _pool().start(_FrameTask(self, sequence, frame))
+
+    @Slot(int, QImage)
+    def _on_decoded(self, sequence: int, image: QImage):
+        self._decoding = False
+        if sequence > self._shown and not image.isNull():
+            if self._ready is not None:
+                self.dropped += 1
+            self._ready = (sequence, image)
+            if not self._render_timer.isActive():
+                elapsed = (time.monotonic() - self._last_render) * 1000
+                self._render_timer.start(max(0, int(self.frame_interval_ms() - elapsed)))
+        self._decode_next()
+
+    @Slot()
+    def _render(self):
+        if self._ready is None:
+            return
+        sequence, image = self._ready
+        self._ready = None
+        if sequence <= self._shown:
+            return
+        self._shown = sequence
+        self._last_render = time.monotonic()
+        self.view.show_frame(image)
+        self.rendered += 1
@@ -0,0 +1,377 @@
+import itertools
+import math
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+from PySide6.QtCore import Qt, QObject, QPoint, QRect, QRectF, QSize, QThread, QThreadPool, QRunnable, Signal, Slot
+from PySide6.QtGui import QImage, QImageReader, QImageIOHandler, QPainter
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsObject, QStyleOptionGraphicsItem
+from loguru import logger
+
+from utils import ImageLRUCache
+from utils.cache_manager import cache_manager
+
+TileKey = Tuple[int, int, int]  # level, column, row
+
+# Shared by every tiled item so the viewers together stay within one memory budget
+tile_cache = ImageLRUCache(192 * 1024 * 1024)
+cache_manager().register("tiles", tile_cache.clear, lambda: {
+    "hits": tile_cache.hits, "misses": tile_cache.misses, "bytes": tile_cache.size_bytes, "quota": tile_cache.max_bytes})
+_tile_pool: Optional[QThreadPool] = None
+_source_ids = itertools.count(1)
+
+
+def _pool() -> QThreadPool:
+    global _tile_pool
+    if _tile_pool is None:
+        _tile_pool = QThreadPool()
+        _tile_pool.setMaxThreadCount(max(2, min(4, QThread.idealThreadCount() // 2)))
+    return _tile_pool
+
+
+class _TileSource:
+    """
+    Thread-safe access to the pixels of one image at power-of-two downsampling levels.
+
+    Level 0 is full resolution, every following level halves both sides. The last level
+    fits in a single tile, so there is always something cheap to draw.
+    """
+
+    def __init__(self, size: QSize, tile_size: int):
+        self.id = next(_source_ids)
+        self.size = size
+        self.tile_size = tile_size
+        longest = max(size.width(), size.height(), 1)
+        self.max_level = max(0, math.ceil(math.log2(longest / tile_size))) if longest > tile_size else 0
+        self._levels: Dict[int, QImage] = {}
+        self._lock = threading.Lock()
+
+    def level_size(self, level: int) -> QSize:
+        step = (1 << level) - 1
+        return QSize((self.size.width() + step) >> level, (self.size.height() + step) >> level)
+
+    def tile_rect(self, level: int, column: int, row: int) -> QRect:
+        """Rect of a tile in the pixel coordinates of its level."""
+        rect = QRect(column * self.tile_size, row * self.tile_size, self.tile_size, self.tile_size)
+        return rect.intersected(QRect(QPoint(0, 0), self.level_size(level)))
+
+    def read(self, level: int, rect: QRect) -> QImage:
+        return self.level_image(level).copy(rect)
+
+    def level_image(self, level: int) -> QImage:
+        raise NotImplementedError
+
+    def image(self) -> QImage:
+        """The full resolution image."""
+        return self.level_image(0)
+
+
+class _ImageSource(_TileSource):
+    """Tiles cut from an image already in memory, lower levels are built by repeated halving."""
+
+    def __init__(self, image: QImage, tile_size: int):
+        super().__init__(image.size(), tile_size)
+        self._levels[0] = image
+
+    def level_image(self, level: int) -> QImage:
+        with self._lock:
+            image = self._levels.get(level)
+            if image is not None:
+                return image
+            # Halving one level at a time filters far better than a single large downscale
+            nearest = max(l for l in self._levels if l < level)
+            image = self._levels[nearest]
+            for current in range(nearest + 1, level + 1):
+                image = image.scaled(self.level_size(current), Qt.AspectRatioMode.IgnoreAspectRatio,
+                                     Qt.TransformationMode.SmoothTransformation)
+                self._levels[current] = image
+            return image
+
+
+class _ReaderSource(_TileSource):
+    """
+    Tiles decoded straight from the file with `QImageReader.setClipRect`.
+
+    Only used for formats whose handler supports clipped decoding (JPEG), so a tile costs
+    a fraction of a full decode. Levels small enough to be a preview are decoded whole once.
+    """
+    PREVIEW_LIMIT = 2048
+
+    def __init__(self, path: str, size: QSize, tile_size: int):
+        super().__init__(size, tile_size)
+        self.path = path
+
+    def read(self, level: int, rect: QRect) -> QImage:
+        level_size = self.level_size(level)
+        if max(level_size.width(), level_size.height()) <= self.PREVIEW_LIMIT:
+            return self.level_image(level).copy(rect)
+        scale = 1 << level
+        clip = QRect(rect.x() * scale, rect.y() * scale, rect.width() * scale, rect.height() * scale)
+        reader = QImageReader(self.path)
+        reader.setClipRect(clip.intersected(QRect(QPoint(0, 0), self.size)))
+        reader.setScaledSize(rect.size())
+        image = reader.read()
+        if image.isNull():
+            logger.warning(f"Failed to decode tile {level}:{rect} of {self.path}: {reader.errorString()}")
+        return image
+
+    def level_image(self, level: int) -> QImage:
+        with self._lock:
+            image = self._levels.get(level)
+            if image is None:
+                reader = QImageReader(self.path)
+                if level:
+                    reader.setScaledSize(self.level_size(level))
+                image = reader.read()
+                self._levels[level] = image
+            return image
+
+    def image(self) -> QImage:
+        # Not kept around, a full resolution decode is only needed when the image is sent elsewhere
+        return QImageReader(self.path).read()
+
+    @staticmethod
+    def supports(reader: QImageReader) -> bool:
+        return (reader.supportsOption(QImageIOHandler.ImageOption.ClipRect)
+                and reader.transformation() == QImageIOHandler.Transformation.TransformationNone)
+
+
+class _TileToken:
+    __slots__ = ("cancelled",)
+
+    def __init__(self):
+        self.cancelled = False
+
+
+class _TileTask(QRunnable):
+    def __init__(self, item: "TiledImageItem", source: _TileSource, key: TileKey, token: _TileToken):
+        super().__init__()
+        self.item = item
+        self.source = source
+        self.key = key
+        self.token = token
+
+    def run(self):
+        if self.token.cancelled:
+            return
+        level, column, row = self.key
+        try:
+            image = self.source.read(level, self.source.tile_rect(level, column, row))
+        except Exception as e:
+            logger.error(f"Failed to load tile {self.key}: {e}")
+            image = QImage()
+        if not image.isNull():
+            # Premultiplied/RGB32 are the formats the raster engine blits without converting
+            image = image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied if image.hasAlphaChannel()
+                                          else QImage.Format.Format_RGB32)
+            tile_cache.put((self.source.id, *self.key), image)
+        if self.token.cancelled:
+            return
+        try:
+            self.item._tileLoaded.emit(self.source.id, level, column, row, not image.isNull())
+        except RuntimeError:
+            pass  # The item was deleted while the tile was decoding
+
+
+class TiledImageItem(QGraphicsObject):
+    """
+    Graphics item that draws very large images tile by tile.
+
+    The image is split into `tile_size` tiles over a mip pyramid: at any zoom only the
+    tiles of the level closest to the screen resolution that intersect the viewport are
+    drawn. Missing tiles are decoded on a background pool into a shared byte-bounded LRU,
+    and meanwhile the region is drawn from the best coarser level already cached.
+    Item coordinates are full resolution pixels, just like a `QGraphicsPixmapItem`.
+    """
+    _tileLoaded = Signal(int, int, int, int, bool)  # source id, level, column, row, success
+
+    PRIORITY_COARSE = 20
+    PRIORITY_VISIBLE = 10
+
+    def __init__(self, tile_size: int = 512, parent: Optional[QGraphicsItem] = None):
+        super().__init__(parent)
+        self.tile_size = tile_size
+        self._source: Optional[_TileSource] = None
+        self._pending: Dict[TileKey, _TileToken] = {}
+        self._failed: Set[TileKey] = set()
+        self._smooth = False
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+        self._tileLoaded.connect(self._on_tile_loaded)
+
+    def set_file(self, path: str) -> bool:
+        """Show an image file, decoding tiles straight from it when the format allows."""
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        if _ReaderSource.supports(reader) and reader.size().isValid():
+            self._set_source(_ReaderSource(path, reader.size(), self.tile_size))
+            return True
+        image = reader.read()
+        if image.isNull():
+            logger.error(f"Failed to load image {path}: {reader.errorString()}")
+            return False
+        return self.set_image(image)
+
+    def set_image(self, image: QImage) -> bool:
+        """Show an image already in memory."""
+        if image.isNull():
+            return False
+        self._set_source(_ImageSource(image, self.tile_size))
+        return True
+
+    def clear(self):
+        self._set_source(None)
+
+    def image(self) -> QImage:
+        """The full resolution image, e.g. for handing it to another widget."""
+        return self._source.image() if self._source is not None else QImage()
+
+    def image_size(self) -> QSize:
+        return QSize(self._source.size) if self._source is not None else QSize()
+
+    def setTransformationMode(self, mode: Qt.TransformationMode):
+        self._smooth = mode == Qt.TransformationMode.SmoothTransformation
+        self.update()
+
+    def boundingRect(self) -> QRectF:
+        if self._source is None:
+            return QRectF()
+        return QRectF(0, 0, self._source.size.width(), self._source.size.height())
+
+    def _set_source(self, source: Optional[_TileSource]):
+        self._cancel(list(self._pending))
+        self._failed.clear()
+        self.prepareGeometryChange()
+        self._source = source
+        if source is not None:
+            logger.debug(f"Tiled image {source.size.width()}x{source.size.height()}, {source.max_level + 1} levels")
+            self._request((source.max_level, 0, 0), self.PRIORITY_COARSE)
+        self.update()
+
+    def level_for_scale(self, scale: float) -> int:
+        """Finest level whose resolution is still at or above `scale` device pixels per image pixel."""
+        if self._source is None or scale >= 1:
+            return 0
+        return min(self._source.max_level, int(math.floor(math.log2(1 / max(scale, 1e-6)))))
+
+    def _item_rect(self, level: int, column: int, row: int) -> QRectF:
+        rect = self._source.tile_rect(level, column, row)
+        scale = 1 << level
+        return QRectF(rect.x() * scale, rect.y() * scale, rect.width() * scale, rect.height() * scale) \
+            .intersected(self.boundingRect())
+
+    def _tiles_in(self, level: int, rect: QRectF):
+        span = self.tile_size << level
+        rect = rect.intersected(self.boundingRect())
+        if rect.isEmpty():
+            return
+        first_column, last_column = int(rect.left()) // span, int(math.ceil(rect.right()) - 1) // span
+        first_row, last_row = int(rect.top()) // span, int(math.ceil(rect.bottom()) - 1) // span
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                yield level, column, row
+
+    def _cached(self, key: TileKey) -> Optional[QImage]:
+        return tile_cache.get((self._source.id, *key))
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
+        if self._source is None:
+            return
+        transform = painter.worldTransform()
+        scale = QStyleOptionGraphicsItem.levelOfDetailFromTransform(transform)
+        if widget is not None:
+            scale *= widget.devicePixelRatioF()
+        level = self.level_for_scale(scale)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, self._smooth or level > 0)
+
+        for key in self._tiles_in(level, option.exposedRect):
+            target = self._item_rect(*key)
+            image = self._cached(key)
+            if image is not None:
+                painter.drawImage(target, image, QRectF(image.rect()))
+            else:
+                self._draw_fallback(painter, key, target)
+
+        # The exposed rect may be a single repainted tile, request against the whole viewport
+        visible = option.exposedRect
+        if widget is not None:
+            inverted, ok = transform.inverted()
+            if ok:
+                visible = inverted.mapRect(QRectF(widget.rect()))
+        wanted = set()
+        center = visible.center()
+        keys = sorted(self._tiles_in(level, visible),
+                      key=lambda k: (self._item_rect(*k).center() - center).manhattanLength())
+        for key in keys:
+            wanted.add(key)
+            if self._cached(key) is None:
+                self._request(key, self.PRIORITY_VISIBLE)
+        coarsest = (self._source.max_level, 0, 0)
+        wanted.add(coarsest)
+        if self._cached(coarsest) is None:
+            self._request(coarsest, self.PRIORITY_COARSE)
+        self._cancel([key for key in self._pending if key not in wanted])
+
+    def _draw_fallback(self, painter: QPainter, key: TileKey, target: QRectF):
+        """Draw `target` from the finest cached coarser level, stretched until the real tile arrives."""
+        level, column, row = key
+        for coarse in range(level + 1, self._source.max_level + 1):
+            shift = coarse - level
+            image = self._cached((coarse, column >> shift, row >> shift))
+            if image is None:
+                continue
+            origin = self._item_rect(coarse, column >> shift, row >> shift).topLeft()
+            scale = 1 << coarse
+            source = QRectF((target.x() - origin.x()) / scale, (target.y() - origin.y()) / scale,
+                            target.width() / scale, target.height() / scale)
+            painter.drawImage(target, image, source)
+            return
+
+    def _request(self, key: TileKey, priority: int):
+        if key in self._pending or key in self._failed:
+            return
+        token = _TileToken()
+        self._pending[key] = token
+        _pool().start(_TileTask(self, self._source, key, token), priority)
+
+    def _cancel(self, keys):
+        for key in keys:
+            self._pending.pop(key).cancelled = True
+
+    @Slot(int, int, int, int, bool)
+    def _on_tile_loaded(self, source_id: int, level: int, column: int, row: int, success: bool):
+        if self._source is None or source_id != self._source.id:
+            return
+        key = (level, column, row)
+        self._pending.pop(key, None)
+        if not success:
+            self._failed.add(key)
+        self.update(self._item_rect(*key))
+
+
+if __name__ == "__main__":
+    import sys
+    from PySide6.QtGui import QColor, QLinearGradient, QBrush
+    from PySide6.QtWidgets import QApplication, QGraphicsScene, QGraphicsView
+
+    app = QApplication(sys.argv)
+    big = QImage(12000, 8000, QImage.Format.Format_RGB32)
+    p = QPainter(big)
+    gradient = QLinearGradient(0, 0, big.width(), big.height())
+    gradient.setColorAt(0, QColor("navy"))
+    gradient.setColorAt(1, QColor("orange"))
+    p.fillRect(big.rect(), QBrush(gradient))
+    p.setPen(QColor("white"))
+    for x in range(0, big.width(), 500):
+        p.drawLine(x, 0, x, big.height())
+    p.end()
+
+    scene = QGraphicsScene()
+    item = TiledImageItem()
+    item.set_image(big)
+    scene.addItem(item)
+    view = QGraphicsView(scene)
+    view.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
+    view.resize(1000, 700)
+    view.fitInView(item, Qt.AspectRatioMode.KeepAspectRatio)
+    view.show()
+    sys.exit(app.exec())
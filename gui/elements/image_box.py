@@ -9,14 +9,15 @@ from PySide6.QtWidgets import (
 from qfluentwidgets import FluentIcon, ToggleToolButton, TogglePushButton, FluentIconBase, ImageLabel
 from utils import IconManager
 from gui.common import (
-    VerticalFrame, ThemedToolButton, HorizontalFrame, ImageViewer, FlowFrame, HorizontalScrollWidget
+    VerticalFrame, ThemedToolButton, HorizontalFrame, ImageViewer, FlowFrame, HorizontalScrollWidget,
+    LivePreviewRenderer
 )
 from api import sd_api_manager
 from loguru import logger
 from config import Placeholder, GenerationTypeFlags
 
 from gui.components import ProgressWidget
-from utils import base64_pixmap
+from utils import DecodedImage, image_decoder
 
 def create_themed_tool_button(icon: FluentIconBase, tooltip: str = None, cursor: QCursor | Qt.CursorShape = Qt.CursorShape.PointingHandCursor):
     button = ThemedToolButton(icon)
@@ -56,12 +57,15 @@ class GenerateButton(TogglePushButton):
 
 class OutputImageBox(VerticalFrame):
     generate_image = Signal()
+    generate_forever = Signal(bool)
     reprocess_image = Signal()
     skip_generation = Signal()
     pause_generation = Signal()
     stop_generation = Signal()
 
     sendTo_signal = Signal(GenerationTypeFlags, QPixmap)
+
+    PREVIEW_THUMBNAIL_SIZE = 200  # 100 px cards, sharp on 2x displays
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setLayoutMargins(0, 0, 0, 0)
@@ -80,14 +84,15 @@ class OutputImageBox(VerticalFrame):
         # self.generate_button.clicked.connect(lambda: self.progress_widget.setHidden(False))
 
         reprocess_image = create_themed_tool_button(IconManager.PROCESS, 'Reprocess Image')
-        generate_forever = ToggleToolButton(FluentIcon.SYNC, 'Generate Forever')
+        self.generate_forever_button = ToggleToolButton(FluentIcon.SYNC, 'Generate Forever')
+        self.generate_forever_button.setToolTip('Generate Forever')
         skip_generation = create_themed_tool_button(IconManager.SKIP_FORWARD, 'Skip Generation')
         pause_generation = create_themed_tool_button(FluentIcon.PAUSE,  'Pause Generation')
         stop_generation = create_themed_tool_button(IconManager.STOP,  'Stop Generation')
 
         gen_container.addWidget(self.generate_button)
         gen_container.addWidget(reprocess_image)
-        gen_container.addWidget(generate_forever)
+        gen_container.addWidget(self.generate_forever_button)
         gen_container.addWidget(skip_generation)
         gen_container.addWidget(pause_generation)
         gen_container.addWidget(stop_generation)
@@ -95,6 +100,7 @@ class OutputImageBox(VerticalFrame):
         # Set up the graphics view and scene
         self.view = ImageViewer(self)
         self.view.setPixmapTransformationMode(Qt.TransformationMode.SmoothTransformation)
+        self.preview_renderer = LivePreviewRenderer(self.view, self)
 
         #extra options
         self.extra_option_container = HorizontalFrame(self)
@@ -134,6 +140,7 @@ class OutputImageBox(VerticalFrame):
         self.small_preview.setContentSpacing(10)
         self.small_preview.setFixedHeight(100)
         self.hide_preview()
+        self._streamed_previews = 0
 
         self.signal_handler()
 
@@ -144,6 +151,7 @@ class OutputImageBox(VerticalFrame):
         self.send_to_control_button.clicked.connect(lambda :  self.on_send_to_image(GenerationTypeFlags.CONTROLS))
 
         self.generate_button.clicked.connect(self.on_generate_toggled)
+        self.generate_forever_button.toggled.connect(self.generate_forever.emit)
 
     def on_generate_toggled(self, state: bool):
         logger.debug(f"Generation Button Toggled: {state}")
@@ -176,23 +184,33 @@ class OutputImageBox(VerticalFrame):
         image = progress["current_image"]
         if show_live_progress:
             if image is None:
-                logger.debug("No Progress Image Generated")
-                if not self.view.current_pixmap:
+                # Not generated yet, unchanged or skipped by the poller, the progress still counts
+                if not self.view.has_image():
                     self.view.set_pixmap(Placeholder.NOISE.pixmap())
-                return
-            self.view.display_base64_image(image)
+            else:
+                self.preview_renderer.submit(image)
         self.progress_widget.set_progress(progress)
         self.progress_widget.setVisible(True)
         progress["current_image"] = None
         logger.debug(f"updating progress image: {progress}")
 
+    def on_image_received(self, index: int, image: DecodedImage):
+        """Show an image of a running generation as soon as it's decoded."""
+        self.preview_renderer.reset()  # A late preview frame must not cover the result
+        self.view.setPixmapTransformationMode(Qt.TransformationMode.SmoothTransformation)
+        self._add_preview(image, not index)
+        self._streamed_previews += 1
+
     def on_finished(self, image_data: dict):
         logger.debug("Image Generated")
         image_data = image_data["images"]
+        self.preview_renderer.reset()
         self.view.setPixmapTransformationMode(Qt.TransformationMode.SmoothTransformation)
         # self.view.display_base64_image(image_data[0])
-        for index, image in enumerate(image_data):
+        # Streamed images already have their preview
+        for index, image in enumerate(image_data[self._streamed_previews:], self._streamed_previews):
             self._add_preview(image, not index)
+        self._streamed_previews = 0
 
         self.generate_button.setChecked(False)
         self.enable_generation(True)
@@ -202,28 +220,42 @@ class OutputImageBox(VerticalFrame):
     def on_error(self, error: str):
         self.progress_widget.setError(error)
         self.enable_generation(True)
+        self._streamed_previews = 0
+        self.preview_renderer.reset()
 
     # def set_image(self, image_data: str):
     #     self.view.display_base64_image(image_data)
 
 
     def _add_preview(self, image_data, is_selected: bool = True):
-        pixmap = base64_pixmap(image_data)
-        if not pixmap:
+        try:
+            image = DecodedImage.from_any(image_data)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Invalid preview image: {e}")
             return
-        if is_selected:
-            self.view.set_pixmap(pixmap)
-        card = ImageLabel(pixmap, self.small_preview)
+        # The card takes its place right away so the order holds, the pixels follow once decoded
+        card = ImageLabel(self.small_preview)
         card.setCursor(Qt.CursorShape.PointingHandCursor)
-        card.clicked.connect(lambda: self.view.set_pixmap(pixmap))
+        card.clicked.connect(lambda: self.view.set_image(image.image()))
         card.setFixedSize(100, 100)
         card.setScaledContents(True)
 
         self.small_preview.addWidget(card)
+        image_decoder().decode(image, lambda decoded: self._on_preview_decoded(card, decoded, is_selected),
+                               card, (self.PREVIEW_THUMBNAIL_SIZE,))
         #enabling extra controls
         self.extra_option_container.setEnabled(True)
         self.show_preview()
 
+    def _on_preview_decoded(self, card: ImageLabel, image: DecodedImage, is_selected: bool):
+        if image is None or image.image().isNull():
+            card.deleteLater()
+            return
+        card.setImage(image.thumbnail(self.PREVIEW_THUMBNAIL_SIZE))
+        card.setFixedSize(100, 100)
+        if is_selected:
+            self.view.set_image(image.image())
+
     def reset_preview(self):
         self.small_preview.clear()
 
@@ -53,10 +53,13 @@ class ImageInfoBox(VerticalScrollCard):
         self.structured_metadata_frame = VerticalFrame()
 
         self.positive_label = SubtitleLabel("Positive Prompt", self.structured_metadata_frame)
-        self.positive_prompt_container = FlowFrame(parent=self.structured_metadata_frame)
+        # Tight, non animated flow layouts: pooled chips are hidden instead of deleted
+        self.positive_prompt_container = FlowFrame(self.structured_metadata_frame, needAni=False, isTight=True)
 
         self.negative_label = SubtitleLabel("Negative Prompt", self.structured_metadata_frame)
-        self.negative_prompt_container = FlowFrame(parent=self.structured_metadata_frame)
+        self.negative_prompt_container = FlowFrame(self.structured_metadata_frame, needAni=False, isTight=True)
+        self._positive_chips: list[ChipBodyLabel] = []
+        self._negative_chips: list[ChipBodyLabel] = []
 
         self.generation_params_table = DictTableWidget({}, parent=self.structured_metadata_frame)
         self.generation_params_table.setColumnCount(2)
@@ -114,6 +117,7 @@ class ImageInfoBox(VerticalScrollCard):
         """
         Set structured metadata including positive/negative prompts and parameters.
         """
+        info = info or {}
         meta = info.get("meta", {})
         # self.generation_params_table.clear()
         self.generation_params_table.add_rows(meta)
@@ -132,14 +136,26 @@ class ImageInfoBox(VerticalScrollCard):
         self.set_file_size(size)
 
     def set_positive_prompt(self, prompts: list[str]) -> None:
-        self.positive_prompt_container.clear()
-        for prompt in prompts:
-            self.positive_prompt_container.addWidget(self._create_chip_label(prompt))
+        self._set_chips(self.positive_prompt_container, self._positive_chips, prompts)
 
     def set_negative_prompt(self, prompts: list[str]) -> None:
-        self.negative_prompt_container.clear()
-        for prompt in prompts:
-            self.negative_prompt_container.addWidget(self._create_chip_label(prompt))
+        self._set_chips(self.negative_prompt_container, self._negative_chips, prompts)
+
+    def _set_chips(self, container: FlowFrame, pool: list[ChipBodyLabel], prompts: list[str]) -> None:
+        """Reuse pooled chips for `prompts`, only creating new ones when the pool runs short."""
+        container.setUpdatesEnabled(False)
+        for i, prompt in enumerate(prompts):
+            if i < len(pool):
+                chip = pool[i]
+                chip.setText(prompt)
+            else:
+                chip = self._create_chip_label(prompt)
+                pool.append(chip)
+                container.addWidget(chip)
+            chip.setVisible(True)
+        for chip in pool[len(prompts):]:
+            chip.setVisible(False)
+        container.setUpdatesEnabled(True)
 
     def set_source_text(self, text: str) -> None:
         self.source_text_browser.setText(text)
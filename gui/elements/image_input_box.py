@@ -55,6 +55,9 @@ class SizeFlyout(FlyoutViewBase):
 
 
 class InpaintImage(InputImageViewer):
+    # The mask is painted over a single pixmap of the full image
+    tiling_enabled = False
+
     def __init__(self, parent = None):
         super().__init__(parent = parent)
 
@@ -78,6 +81,9 @@ class InpaintImage(InputImageViewer):
         self.image_mask_item.setZValue(1)
         self.image_mask_item.setOpacity(0.5)
         self.scene.addItem(self.image_mask_item)
+        # Kept until the mask is painted on, so its cache key stays and the payload
+        # encoder can reuse the encoded mask
+        self._created_mask = None
 
         self._last_pos = None
 
@@ -123,6 +129,8 @@ class InpaintImage(InputImageViewer):
         self.image_mask = QPixmap(self.image_item.pixmap().size())
         self.image_mask.fill(Qt.GlobalColor.transparent)
         self.image_mask_item.setPixmap(self.image_mask)
+        self.is_inpainted = False
+        self._created_mask = None
 
 
     def mousePressEvent(self, event):
@@ -158,6 +166,7 @@ class InpaintImage(InputImageViewer):
     def drawLine(self, end_point):
         """Draw a line from last_point to end_point"""
         self.is_inpainted = True
+        self._created_mask = None
         painter = QPainter(self.image_mask)
         painter.setRenderHint(QPainter.Antialiasing)
 
@@ -171,6 +180,7 @@ class InpaintImage(InputImageViewer):
 
     def eraseLine(self, end_point):
         """Erase along a line from last_point to end_point"""
+        self._created_mask = None
         painter = QPainter(self.image_mask)
         painter.setRenderHint(QPainter.Antialiasing)
         painter.setCompositionMode(QPainter.CompositionMode_Clear)
@@ -199,14 +209,19 @@ class InpaintImage(InputImageViewer):
         """Clear the drawing area"""
         self.image_mask.fill(Qt.GlobalColor.transparent)
         self.image_mask_item.setPixmap(self.image_mask)
+        self.is_inpainted = False
+        self._created_mask = None
 
     def create_mask(self):
+        if self._created_mask is not None:
+            return self._created_mask
         mask = QPixmap(self.image_mask.size())
         mask.fill(Qt.GlobalColor.white)
         painter = QPainter(mask)
         painter.setRenderHint(QPainter.Antialiasing)
         painter.drawPixmap(0, 0, self.image_mask)
         painter.end()
+        self._created_mask = mask
         return mask
 
     @property
@@ -325,6 +340,14 @@ class ImageInputBox(VerticalFrame):
     def get_mask_pixmap(self):
         return self.mask_viewer.get_image()
 
+    def get_mask(self):
+        """The mask to send with the image: the loaded mask in Mask mode, the painted one in Inpaint mode."""
+        if self.mask_button.isChecked():
+            return self.get_mask_pixmap()
+        if self.image_inpaint_button.isChecked() and self.image_viewer.inpainted:
+            return self.image_viewer.create_mask()
+        return None
+
     def set_pixmap(self, pixmap):
         self.image_viewer.set_pixmap(pixmap)
         self.image_viewer.setPixmapTransformationMode(Qt.TransformationMode.SmoothTransformation)
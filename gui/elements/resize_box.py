@@ -13,7 +13,9 @@ from gui.common import HorizontalFrame, VerticalFrame
 from gui.components import SliderCard
 from qfluentwidgets import TogglePushButton
 from PySide6.QtWidgets import QButtonGroup, QWidget
-from PySide6.QtCore import Signal
+from typing import Optional
+
+from PySide6.QtCore import Signal, QSize
 
 
 class ResizeBox(HorizontalFrame):
@@ -47,9 +49,13 @@ class ResizeBox(HorizontalFrame):
         mode_container.layout().addStretch(1)
 
         # === Sliders ===
-        self.resize_scale = SliderCard("Scale", "Scale")
-        self.resize_width = SliderCard("Width", "Width")
-        self.resize_height = SliderCard("Height", "Height")
+        self.resize_scale = DoubleSliderCard("Scale", "Scale")
+        self.resize_scale.set_range(0.05, 4, 2)
+        self.resize_scale.set_value(1.0)
+        self.resize_width = SliderCard("Width", "Width, 0 to follow the height and the image's aspect ratio")
+        self.resize_width.set_range(0, 4096)
+        self.resize_height = SliderCard("Height", "Height, 0 to follow the width and the image's aspect ratio")
+        self.resize_height.set_range(0, 4096)
 
         slider_container = VerticalFrame()
         slider_container.layout().setSpacing(0)
@@ -109,6 +115,30 @@ class ResizeBox(HorizontalFrame):
                 "height": self.resize_height.value()
             }
 
+    def target_size(self, source: QSize, multiple: int = 8) -> Optional[QSize]:
+        """
+        Size the user asked to resize an image of size `source` to, rounded to a `multiple`.
+
+        'by' mode scales `source`. In 'to' mode a width or height of 0 follows the other one
+        with the aspect ratio of `source`. None while the box is untouched, at scale 1.0 or
+        with both at 0, the caller then leaves the size to the server.
+        """
+        width, height = source.width(), source.height()
+        if self.current_mode() == "by":
+            if self.getScale() == 1.0:
+                return None
+            width, height = width * self.getScale(), height * self.getScale()
+        elif not (self.getWidth() or self.getHeight()):
+            return None
+        elif not self.getHeight():
+            width, height = self.getWidth(), height * self.getWidth() / width
+        elif not self.getWidth():
+            width, height = width * self.getHeight() / height, self.getHeight()
+        else:
+            width, height = self.getWidth(), self.getHeight()
+        return QSize(max(multiple, round(width / multiple) * multiple),
+                     max(multiple, round(height / multiple) * multiple))
+
     def getScale(self):
         return self.resize_scale.value()
 
@@ -8,13 +8,15 @@ from qfluentwidgets import FluentIconBase, PushButton, isDarkTheme, RoundMenu, A
     TransparentToolButton, TransparentDropDownToolButton, PrimaryPushButton, IconWidget, ComboBox, SearchLineEdit, \
     ToolButton, CheckableMenu, MenuIndicatorType, Flyout
 
-from gui.common import FlowFrame, VerticalFrame, FlowScrollWidget, HorizontalFrame, ImageViewer
-from gui.components.cover_card import CoverCard
+from gui.common import FlowFrame, VerticalFrame, HorizontalFrame, ImageViewer
 from gui.elements.image_info_box import ImageInfoBox
+from gui.interface.gallery.prefetch import ThumbnailPrefetcher
+from gui.interface.gallery.gallery_view import GalleryView
+from gui.interface.gallery.viewer_session import ViewerSession
 
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QPushButton, QGridLayout
 from PySide6.QtCore import Qt, QTimer, Signal, QSize
-from PySide6.QtGui import QColor, QPainter, QBrush, QIcon, QActionGroup
+from PySide6.QtGui import QColor, QPainter, QBrush, QIcon, QActionGroup, QImage
 from qframelesswindow import TitleBar
 import pandas as pd
 from manager import ImageManager, image_manager, card_manager
@@ -371,12 +373,21 @@ class ImageDialog(QDialog):
                         (self.image_display.height() - button.height()) // 2)
         button.show()
 
-    def set_image(self, path, meta_data: dict):
+    def set_image(self, path, meta_data: dict, image: Optional[QImage] = None):
+        """
+        Args:
+            path: Image path.
+            meta_data: Nested metadata of the image.
+            image: Already decoded image, the file is decoded synchronously if None.
+        """
         logger.info(f"Setting Image: {path}")
         self.file_path = path
         name =  path.rsplit("\\", 1)[-1]
         name = name.rsplit("/", 1)[-1]
-        self.image_display.load_image(path)
+        if image is not None and not image.isNull():
+            self.image_display.set_image(image, path)
+        else:
+            self.image_display.load_image(path)
         self.image_info_box.set_filename(name)
         self.image_info_box.set_path(path)
         self.image_info_box.set_info(meta_data)
@@ -420,51 +431,36 @@ class GalleryTab(VerticalFrame):
         self.setLayoutMargins(9, 0, 0, 0)
         self._prev_hash = None
         # self.setContentSpacing(20)
-        self.card_lookup = {}
         self.dir_path = dir_path
         self.tab_dataframe = image_manager.filter_directory(dir_path)
 
         self.option_container = FilterBar(icon, dir_path, self)
 
+        self.display_container = GalleryView(self, horizontal_spacing=30, vertical_spacing=10)
+        self.display_container.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)  # Ensure vertical scrollbar exists
+        self.display_container.clicked.connect(self.showFlyout)
 
-        self.display_container = FlowScrollWidget(None, self, False, False)
-        self.display_container.setLayoutMargins(0, 0, 0, 0)
-        self.display_container.setVerticalSpacing(10)
-        self.display_container.setHorizontalSpacing(30)
-        self.display_container.scrollArea.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)  # Ensure vertical scrollbar exists
-        self.display_container.scrollArea.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        self.prefetcher = ThumbnailPrefetcher(
+            self.display_container.verticalScrollBar(),
+            row_height=self.display_container.row_height,
+            columns=self.display_container.columns,
+            path_at=self.display_container.path_at,
+            count=self.display_container.gallery_model.rowCount,
+            parent=self
+        )
 
         self.image_viewer = ImageDialog(self)
+        self.viewer_session = ViewerSession(parent=self)
+        self.viewer_session.imageReady.connect(self._on_viewer_image)
 
         self.addWidget(self.option_container)
         self.addWidget(self.display_container, stretch=1)
 
-        self._batch_total = 50
-        self._batch_size = 10  # Load 10 images at a time
-        self._current_batch_start = len(self.card_lookup) + self._batch_total
-        self._current_batch_max_index = min(len(self.tab_dataframe), self._current_batch_start + self._batch_total)
-
-        self._batch_timer = QTimer(self)
-        self._batch_timer.setInterval(500)
-        self._batch_timer.setSingleShot(True)
-        self._batch_timer.timeout.connect(self._load_batch)
-        # self._batch_timer.start(50)
-
         if  self.tab_dataframe is not None:
             self.apply_sort()
 
         self.signal_listener()
 
-
-
-
-
-
-    def on_scroll(self, value):
-        scroll_bar = self.display_container.scrollArea.verticalScrollBar()
-        if value == scroll_bar.maximum():
-            self.load_image()
-
     def signal_listener(self):
         self.option_container.refreshSignal.connect(self.refresh)
         self.option_container.sortSignal.connect(self.apply_sort)
@@ -476,8 +472,6 @@ class GalleryTab(VerticalFrame):
 
     def apply_sort(self, by: str='size', ascending = True):
         logger.info(f"Applying Sorting-{by}-order asc {ascending}")
-        self.card_lookup.clear()
-        self.display_container.clear()
         # self.tab_dataframe.reset_index(drop=True, inplace=True)
         self.tab_dataframe = image_manager.apply_sort(self.tab_dataframe, by, ascending)
         self._prev_hash = None
@@ -496,107 +490,36 @@ class GalleryTab(VerticalFrame):
     def update_view(self):
         if self.tab_dataframe is None:
             return
-
-        # 1. Get valid paths (existing in the DataFrame)
-        valid_paths = set(self.tab_dataframe['path'])
-
-        # 2. Identify paths in card_lookup that are no longer valid
-        existing_paths = set(self.card_lookup.keys())
-        paths_to_remove = existing_paths - valid_paths  # Paths to remove
-
-        # 3. Remove invalid paths (clean up removed cards)
-        for path in paths_to_remove:
-            logger.debug(f"Removing card for {path} (no longer in dataframe)")
-            card = self.card_lookup[path]['card']
-            self.display_container.removeWidget(card)
-            card.deleteLater()  # Properly delete the widget
-            del self.card_lookup[path]  # Remove from lookup
-
-        self.load_image()
-
-    def load_image(self):
-        if self.tab_dataframe is None:
-            return
-        self._current_batch_start = len(self.card_lookup)
-        self._current_batch_max_index = min(len(self.tab_dataframe), self._current_batch_start + self._batch_total)
-        logger.info(f"Start: {self._current_batch_start}, Max: {self._current_batch_max_index}, len: {len(self.card_lookup)}")
-        # print("done")
-        self._batch_timer.start(500)
-
-    def _load_batch(self):
-        self._batch_timer.stop()
-        start = len(self.card_lookup)
-        end = min(start + self._batch_size, len(self.tab_dataframe), self._batch_total)
-        for row in self.tab_dataframe.iloc[start:end][['path', 'hash']].itertuples(
-                index=False):
-            path = row.path
-            file_hash = row.hash
-
-            if path in self.card_lookup:
-                if self.card_lookup[path]['hash'] == file_hash:
-                    logger.debug(f"Skipping {path} as hash is same")
-                    continue
-                else:
-                    logger.debug(f"Updating {path} as hash is different")
-                    self.card_lookup[path]['card'].set_image(path)
-                    self.card_lookup[path]['hash'] = file_hash
-            else:
-                card = self.add_card(path)
-                self.card_lookup[path] = {'card': card, 'hash': file_hash}
-
-        if len(self.card_lookup) >= min(len(self.tab_dataframe) , self._current_batch_max_index):
-            self._batch_timer.stop()
-            logger.info(
-                f"Completed loading all images: total_loaded: {len(self.card_lookup)}, batch_start: {self._current_batch_start}, max_index: {self._current_batch_max_index}")
-
-        elif len(self.card_lookup) <= self._current_batch_max_index:
-            logger.info(
-                f"Processed batch: total_loaded: {len(self.card_lookup)}, batch_start: {self._current_batch_start}, remaining: {self._current_batch_max_index} - {len(self.card_lookup)}",
-            )
-            self._batch_timer.start(500)
-
-    def add_card(self, path: str)->Optional[CoverCard]:
-        title = path.rsplit('\\', 1)[1]
-        cover_image = path
-        card = CoverCard(title, cover_image, parent=self)
-        card.clicked.connect(self.showFlyout)
-        self.display_container.addWidget(card)
-        return card
+        self.display_container.set_dataframe(self.tab_dataframe, incremental=True)
+        self.viewer_session.set_paths(self.tab_dataframe['path'].tolist())
+        self.prefetcher.reset()
 
     def search_text(self, text: str):
         # Convert text to lowercase for case-insensitive search
         paths = image_manager.apply_filter(self.tab_dataframe, text)
-        paths.head(10)
         if paths is None:
             return
         self._filter_cards(paths)
 
     def _filter_cards(self, paths: pd.DataFrame):
-        # Convert incoming paths to a set for quick lookup
-        visible_paths = set(paths['path'])
-
-        # Loop through all known cards
-        for path, data in self.card_lookup.items():
-            data['card'].setHidden(path not in visible_paths)
-
-        # Add new cards from paths if they don't exist
-        for row in paths.itertuples(index=False):
-            if row.path not in self.card_lookup:
-                card = self.add_card(row.path)
-                self.card_lookup[row.path] = {'card': card, 'hash': row.hash}
+        # Applied as a diff against the visible rows, cells are only painted once they scroll into view
+        self.display_container.set_dataframe(paths, incremental=True)
+        self.prefetcher.schedule()
 
     def reset_filter(self):
         # Show all cards
-        for data in self.card_lookup.values():
-            data['card'].setHidden(False)
+        if self.tab_dataframe is None:
+            return
+        self.display_container.set_dataframe(self.tab_dataframe, incremental=True)
+        self.prefetcher.schedule()
 
-    def showFlyout(self, image_path):
-        metadata = image_manager.get_image_metadata(image_path)
-        self.image_viewer.set_image(image_path, metadata)
+    def showFlyout(self, image_path, step: int = 1):
+        self.viewer_session.open(image_path, step)
         if not self.image_viewer.isVisible():
             self.image_viewer.showMaximized()
-        else:
-            return
+
+    def _on_viewer_image(self, path: str, image: QImage, metadata: Optional[dict]):
+        self.image_viewer.set_image(path, metadata or {}, image)
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
@@ -604,19 +527,24 @@ class GalleryTab(VerticalFrame):
         self.image_viewer.resize(self.size())
 
     def next_image(self):
-        next_path = self.get_adjacent_row('next')['path']
-        logger.exception(f"Next image: {next_path}")
-        self.showFlyout(next_path)
-
+        next_path = self._adjacent_path(1)
+        logger.debug(f"Next image: {next_path}")
+        if next_path:
+            self.showFlyout(next_path, 1)
 
     def prev_image(self):
-        prev_path = self.get_adjacent_row('previous')['path']
-        logger.exception(f"Prev image: {prev_path}")
-        self.showFlyout(prev_path)
-        # paths = self.tab_dataframe['path'].tolist()
-        # current_index = paths.index(self.image_viewer.image_path)
-        # prev_index = (current_index - 1) % len(paths)
-        # self.showFlyout(paths[prev_index])
+        prev_path = self._adjacent_path(-1)
+        logger.debug(f"Prev image: {prev_path}")
+        if prev_path:
+            self.showFlyout(prev_path, -1)
+
+    def _adjacent_path(self, step: int) -> Optional[str]:
+        # The viewer session has an O(1) path index, the dataframe scan is only a fallback
+        path = self.viewer_session.adjacent(self.viewer_session.current or self.image_viewer.image_path, step)
+        if path is None:
+            row = self.get_adjacent_row('next' if step > 0 else 'previous')
+            path = None if row is None else row['path']
+        return path
 
     def get_adjacent_row(self, direction: str = 'next', loop: bool = True) -> Optional[
         pd.Series]:
@@ -0,0 +1,530 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+import pandas as pd
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRect, QRectF, Signal, QTimer
+from PySide6.QtGui import QPainter, QPainterPath, QColor, QPixmap, QPixmapCache, QRegion
+from PySide6.QtWidgets import QStyledItemDelegate, QStyleOptionViewItem, QStyle, QFileDialog, QAbstractItemView
+from qfluentwidgets import RoundMenu, Action, FluentIcon, SmoothScrollDelegate, isDarkTheme
+from loguru import logger
+
+from gui.common import elided_text
+from manager import card_manager, thumbnail_manager
+from utils import open_folder, open_file_with_default_app, copy_to_clipboard, copy_file_to_clipboard, save_image_as, \
+    get_cached_pixmap
+
+
+class GalleryModel(QAbstractListModel):
+    """
+    Flat list model over the image paths of a gallery tab.
+
+    Only the path and hash of each row are held; thumbnails live in the shared
+    `QPixmapCache` and are requested lazily by the delegate when a row is painted.
+    """
+    PathRole = Qt.ItemDataRole.UserRole + 1
+    HashRole = Qt.ItemDataRole.UserRole + 2
+    PixmapRole = Qt.ItemDataRole.UserRole + 3
+
+    def __init__(self, parent=None, placeholder_limit: int = 256, max_diff_ranges: int = 256):
+        super().__init__(parent)
+        self.max_diff_ranges = max_diff_ranges
+        self._paths: List[str] = []
+        self._hashes: List[Any] = []
+        self._rows: Dict[str, int] = {}
+        # EXIF placeholders are not cached globally, keep the most recent ones here
+        self._placeholders: OrderedDict[str, QPixmap] = OrderedDict()
+        self._placeholder_limit = placeholder_limit
+        thumbnail_manager.thumbnailReady.connect(self._on_thumbnail_ready)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._paths):
+            return None
+        path = self._paths[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return Path(path).name
+        if role == Qt.ItemDataRole.ToolTipRole or role == self.PathRole:
+            return path
+        if role == self.HashRole:
+            return self._hashes[index.row()]
+        if role == self.PixmapRole:
+            return self.thumbnail(path)
+        return None
+
+    def thumbnail(self, path: str) -> Optional[QPixmap]:
+        """Return the best thumbnail available right now, requesting it if missing."""
+        pixmap = thumbnail_manager.cached(path)
+        if pixmap is not None:
+            return pixmap
+        if not thumbnail_manager.is_pending(path):
+            thumbnail_manager.request(path, priority=thumbnail_manager.PRIORITY_NORMAL)
+        return self._placeholders.get(path)
+
+    def set_dataframe(self, dataframe: Optional[pd.DataFrame], incremental: bool = True):
+        """
+        Show the `path`/`hash` columns of `dataframe`.
+
+        Args:
+            dataframe: Rows to show, None clears the model.
+            incremental: Apply the change as remove/insert ranges against the current rows
+                so the view keeps its scroll position and only repaints what changed. Falls
+                back to a model reset when the order of the kept rows changed or the diff
+                is too fragmented to be worth it.
+        """
+        if dataframe is None or dataframe.empty:
+            paths, hashes = [], []
+        else:
+            paths = dataframe['path'].tolist()
+            hashes = dataframe['hash'].tolist()
+
+        if not incremental or not self._paths or not self._apply_diff(paths, hashes):
+            self.beginResetModel()
+            self._paths, self._hashes = paths, hashes
+            self._rows = {path: row for row, path in enumerate(self._paths)}
+            self._placeholders.clear()
+            self.endResetModel()
+
+    def _apply_diff(self, paths: List[str], hashes: List[Any]) -> bool:
+        """Turn the current rows into `paths` with contiguous remove/insert ranges."""
+        old_rows = self._rows
+        new_rows = {path: row for row, path in enumerate(paths)}
+        if len(new_rows) != len(paths):
+            return False  # Duplicate paths can't be diffed by identity
+
+        # Rows that survive must keep their relative order, otherwise it's a re-sort
+        if [p for p in self._paths if p in new_rows] != [p for p in paths if p in old_rows]:
+            return False
+
+        removed = self._ranges(row for row, path in enumerate(self._paths) if path not in new_rows)
+        inserted = self._ranges(row for row, path in enumerate(paths) if path not in old_rows)
+        if len(removed) + len(inserted) > self.max_diff_ranges:
+            return False
+
+        parent = QModelIndex()
+        # Back to front so earlier ranges keep their positions
+        for first, last in reversed(removed):
+            self.beginRemoveRows(parent, first, last)
+            del self._paths[first:last + 1]
+            del self._hashes[first:last + 1]
+            self.endRemoveRows()
+
+        # Front to back, everything before `first` already matches the new order
+        for first, last in inserted:
+            self.beginInsertRows(parent, first, last)
+            self._paths[first:first] = paths[first:last + 1]
+            self._hashes[first:first] = hashes[first:last + 1]
+            self.endInsertRows()
+
+        self._rows = new_rows
+        for row, (old_hash, new_hash) in enumerate(zip(self._hashes, hashes)):
+            if old_hash != new_hash:
+                self._hashes[row] = new_hash
+                QPixmapCache.remove(thumbnail_manager.cache_key(paths[row]))
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+        logger.debug(f"Applied gallery diff: {len(removed)} removed, {len(inserted)} inserted ranges")
+        return True
+
+    @staticmethod
+    def _ranges(rows) -> List[tuple]:
+        """Group ascending row numbers into inclusive (first, last) ranges."""
+        ranges = []
+        for row in rows:
+            if ranges and ranges[-1][1] == row - 1:
+                ranges[-1][1] = row
+            else:
+                ranges.append([row, row])
+        return [tuple(r) for r in ranges]
+
+    def path_at(self, row: int) -> Optional[str]:
+        if 0 <= row < len(self._paths):
+            return self._paths[row]
+        return None
+
+    def row_of(self, path: str) -> int:
+        return self._rows.get(path, -1)
+
+    def _on_thumbnail_ready(self, path: str, pixmap: QPixmap, is_final: bool):
+        row = self._rows.get(path)
+        if row is None:
+            return
+        if is_final:
+            self._placeholders.pop(path, None)
+        else:
+            self._placeholders[path] = pixmap
+            self._placeholders.move_to_end(path)
+            while len(self._placeholders) > self._placeholder_limit:
+                self._placeholders.popitem(last=False)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [self.PixmapRole])
+
+
+class CoverDelegate(QStyledItemDelegate):
+    """Paints a gallery cell: rounded cover, centered title and the hover overlay."""
+    TITLE_HEIGHT = 24
+    BUTTON_SIZE = 28
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cover_size = card_manager.get_size()
+        self.border_radius = 5
+        self.interactive = False
+        self._placeholder: Optional[QPixmap] = None
+
+    def set_cover_size(self, size: QSize, interactive: bool = False):
+        """
+        Args:
+            size: New cover size.
+            interactive: While the size is being dragged, covers are drawn with a fast
+                scale instead of building rounded covers for every intermediate size.
+        """
+        self.cover_size = QSize(size)
+        self.interactive = interactive
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        return QSize(self.cover_size.width(), self.cover_size.height() + self.TITLE_HEIGHT)
+
+    def cover_rect(self, cell: QRect) -> QRect:
+        x = cell.x() + (cell.width() - self.cover_size.width()) // 2
+        return QRect(x, cell.y(), self.cover_size.width(), self.cover_size.height())
+
+    def more_button_rect(self, cell: QRect) -> QRect:
+        cover = self.cover_rect(cell)
+        return QRect(cover.right() - self.BUTTON_SIZE - 4, cover.top() + 4, self.BUTTON_SIZE, self.BUTTON_SIZE)
+
+    def rounded_cover(self, pixmap: QPixmap) -> QPixmap:
+        """Scale and round `pixmap` to the cell size once, painting is then a plain blit."""
+        key = f"cover:{self.cover_size.width()}x{self.cover_size.height()}:{pixmap.cacheKey()}"
+        cached = QPixmap()
+        if QPixmapCache.find(key, cached):
+            return cached
+
+        rounded = QPixmap(self.cover_size)
+        rounded.fill(Qt.GlobalColor.transparent)
+        clip = QPainterPath()
+        clip.addRoundedRect(QRectF(rounded.rect()), self.border_radius, self.border_radius)
+        painter = QPainter(rounded)
+        painter.setRenderHints(QPainter.RenderHint.Antialiasing | QPainter.RenderHint.SmoothPixmapTransform)
+        painter.setClipPath(clip)
+        painter.fillRect(rounded.rect(), QColor(255, 255, 255, 13) if isDarkTheme() else QColor(0, 0, 0, 8))
+        painter.drawPixmap(rounded.rect(), pixmap)
+        painter.end()
+        QPixmapCache.insert(key, rounded)
+        return rounded
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex):
+        painter.save()
+        cover = self.cover_rect(option.rect)
+
+        pixmap = index.data(GalleryModel.PixmapRole)
+        if pixmap is None:
+            if self._placeholder is None:
+                self._placeholder = get_cached_pixmap(None, QSize(512, 512))
+            pixmap = self._placeholder
+        if self.interactive:
+            painter.drawPixmap(cover, pixmap)
+        else:
+            painter.drawPixmap(cover.topLeft(), self.rounded_cover(pixmap))
+
+        hovered = bool(option.state & QStyle.StateFlag.State_MouseOver)
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        if hovered or selected:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor(0, 0, 0, 128 if hovered else 64))
+            painter.drawRoundedRect(QRectF(cover), self.border_radius, self.border_radius)
+        if hovered:
+            FluentIcon.MORE.render(painter, QRectF(self.more_button_rect(option.rect)).adjusted(6, 6, -6, -6),
+                                   fill="#ffffff")
+
+        title_rect = QRect(cover.left(), cover.bottom() + 1, cover.width(), self.TITLE_HEIGHT)
+        title = elided_text(index.data(Qt.ItemDataRole.DisplayRole) or "", option.font, title_rect.width())
+        painter.setFont(option.font)
+        painter.setPen(QColor(255, 255, 255) if isDarkTheme() else QColor(0, 0, 0))
+        painter.drawText(title_rect, Qt.AlignmentFlag.AlignCenter, title)
+        painter.restore()
+
+
+class GalleryView(QAbstractItemView):
+    """
+    Virtualized image grid.
+
+    Replaces one `CoverCard` widget per image: cells are uniform, so their geometry is
+    computed arithmetically from the row number and only the visible cells are painted.
+    Memory, relayout and scroll cost stay flat regardless of the number of images.
+    Actions go through a single shared context menu.
+    """
+    clicked = Signal(str)
+    deleteSignal = Signal(str)
+
+    def __init__(self, parent=None, horizontal_spacing: int = 30, vertical_spacing: int = 10):
+        super().__init__(parent)
+        self.horizontal_spacing = horizontal_spacing
+        self.vertical_spacing = vertical_spacing
+        self._grid_size = QSize(1, 1)
+        self._hover_row = -1
+        self._menu_path: Optional[str] = None
+
+        self.gallery_model = GalleryModel(self)
+        self.cover_delegate = CoverDelegate(self)
+        self.setModel(self.gallery_model)
+        self.setItemDelegate(self.cover_delegate)
+        self.scroll_delegate = SmoothScrollDelegate(self)
+        for signal in (self.gallery_model.modelReset, self.gallery_model.rowsInserted,
+                       self.gallery_model.rowsRemoved, self.gallery_model.layoutChanged):
+            signal.connect(self.scheduleDelayedItemsLayout)
+
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setMouseTracking(True)
+        self.setFrameShape(QAbstractItemView.Shape.NoFrame)
+        self.setStyleSheet("QAbstractItemView { background: transparent; border: none; }")
+
+        # Covers are re-rounded at full quality once the size slider settles
+        self._settle_timer = QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(150)
+        self._settle_timer.timeout.connect(self._on_size_settled)
+
+        self._create_menu()
+        self._apply_cover_size(card_manager.get_size())
+        card_manager.size_changed.connect(self.set_cover_size)
+
+    # Grid geometry
+
+    def gridSize(self) -> QSize:
+        return self._grid_size
+
+    def setGridSize(self, size: QSize):
+        self._grid_size = QSize(max(1, size.width()), max(1, size.height()))
+        self.updateGeometries()
+        self.viewport().update()
+
+    def row_height(self) -> int:
+        return self._grid_size.height()
+
+    def columns(self) -> int:
+        return max(1, self.viewport().width() // self._grid_size.width())
+
+    def _cell_rect(self, row: int) -> QRect:
+        """Rect of `row` in content coordinates."""
+        columns = self.columns()
+        return QRect((row % columns) * self._grid_size.width(), (row // columns) * self._grid_size.height(),
+                     self._grid_size.width(), self._grid_size.height())
+
+    def updateGeometries(self):
+        rows = -(-self.gallery_model.rowCount() // self.columns())
+        page = self.viewport().height()
+        scroll_bar = self.verticalScrollBar()
+        scroll_bar.setRange(0, max(0, rows * self._grid_size.height() - page))
+        scroll_bar.setPageStep(page)
+        scroll_bar.setSingleStep(max(1, self._grid_size.height() // 4))
+        super().updateGeometries()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.updateGeometries()
+
+    # QAbstractItemView interface
+
+    def visualRect(self, index: QModelIndex) -> QRect:
+        if not index.isValid():
+            return QRect()
+        return self._cell_rect(index.row()).translated(0, -self.verticalOffset())
+
+    def indexAt(self, point) -> QModelIndex:
+        column = point.x() // self._grid_size.width()
+        if point.x() < 0 or column >= self.columns():
+            return QModelIndex()
+        row = (point.y() + self.verticalOffset()) // self._grid_size.height() * self.columns() + column
+        if not 0 <= row < self.gallery_model.rowCount():
+            return QModelIndex()
+        return self.gallery_model.index(row)
+
+    def scrollTo(self, index: QModelIndex, hint=QAbstractItemView.ScrollHint.EnsureVisible):
+        rect = self.visualRect(index)
+        scroll_bar = self.verticalScrollBar()
+        if hint == QAbstractItemView.ScrollHint.PositionAtTop or rect.top() < 0:
+            scroll_bar.setValue(scroll_bar.value() + rect.top())
+        elif hint == QAbstractItemView.ScrollHint.PositionAtCenter:
+            scroll_bar.setValue(scroll_bar.value() + rect.center().y() - self.viewport().height() // 2)
+        elif rect.bottom() > self.viewport().height():
+            scroll_bar.setValue(scroll_bar.value() + rect.bottom() - self.viewport().height())
+
+    def moveCursor(self, action, modifiers) -> QModelIndex:
+        count = self.gallery_model.rowCount()
+        if count == 0:
+            return QModelIndex()
+        current = self.currentIndex().row() if self.currentIndex().isValid() else 0
+        columns = self.columns()
+        page = max(1, self.viewport().height() // self._grid_size.height()) * columns
+        move = QAbstractItemView.CursorAction
+        step = {
+            move.MoveLeft: -1, move.MovePrevious: -1,
+            move.MoveRight: 1, move.MoveNext: 1,
+            move.MoveUp: -columns, move.MoveDown: columns,
+            move.MovePageUp: -page, move.MovePageDown: page,
+        }
+        if action == move.MoveHome:
+            row = 0
+        elif action == move.MoveEnd:
+            row = count - 1
+        else:
+            row = current + step.get(action, 0)
+        return self.gallery_model.index(min(max(row, 0), count - 1))
+
+    def horizontalOffset(self) -> int:
+        return 0
+
+    def verticalOffset(self) -> int:
+        return self.verticalScrollBar().value()
+
+    def isIndexHidden(self, index: QModelIndex) -> bool:
+        return False
+
+    def setSelection(self, rect: QRect, flags):
+        index = self.indexAt(rect.center())
+        if index.isValid():
+            self.selectionModel().select(index, flags)
+
+    def visualRegionForSelection(self, selection) -> QRegion:
+        region = QRegion()
+        for index in selection.indexes():
+            region += self.visualRect(index)
+        return region
+
+    def paintEvent(self, event):
+        count = self.gallery_model.rowCount()
+        if count == 0:
+            return
+        painter = QPainter(self.viewport())
+        option = QStyleOptionViewItem()
+        self.initViewItemOption(option)
+        columns = self.columns()
+        offset = self.verticalOffset()
+        first = max(0, (offset + event.rect().top()) // self._grid_size.height() * columns)
+        last = min(count - 1, ((offset + event.rect().bottom()) // self._grid_size.height() + 1) * columns - 1)
+        selection = self.selectionModel()
+        base_state = option.state
+        for row in range(first, last + 1):
+            index = self.gallery_model.index(row)
+            option.rect = self.visualRect(index)
+            option.state = base_state
+            if row == self._hover_row:
+                option.state |= QStyle.StateFlag.State_MouseOver
+            if selection.isSelected(index):
+                option.state |= QStyle.StateFlag.State_Selected
+            self.cover_delegate.paint(painter, option, index)
+        painter.end()
+
+    def mouseMoveEvent(self, event):
+        super().mouseMoveEvent(event)
+        index = self.indexAt(event.position().toPoint())
+        row = index.row() if index.isValid() else -1
+        if row != self._hover_row:
+            self._update_row(self._hover_row)
+            self._hover_row = row
+            self._update_row(row)
+
+    def _update_row(self, row: int):
+        if row >= 0:
+            self.viewport().update(self.visualRect(self.gallery_model.index(row)))
+
+    def _create_menu(self):
+        menu = RoundMenu(parent=self)
+        menu.addActions([
+            Action(FluentIcon.FIT_PAGE, "Open", menu, triggered=lambda: self.clicked.emit(self._menu_path)),
+            Action(FluentIcon.SAVE, "Save As", menu, triggered=self._save_as_action),
+            Action(FluentIcon.DELETE, "Delete", menu, triggered=lambda: self.deleteSignal.emit(self._menu_path)),
+            Action(FluentIcon.COPY, "Copy", menu, triggered=lambda: copy_file_to_clipboard(self._menu_path)),
+            Action(FluentIcon.FONT, "Copy Name", menu, triggered=lambda: copy_to_clipboard(Path(self._menu_path).name)),
+            Action(FluentIcon.COMMAND_PROMPT, "Copy Path", menu, triggered=lambda: copy_to_clipboard(self._menu_path)),
+            Action(FluentIcon.FOLDER, "Open in Explorer", menu,
+                   triggered=lambda: open_folder(str(Path(self._menu_path).parent))),
+            Action(FluentIcon.APPLICATION, "Open in Default App", menu,
+                   triggered=lambda: open_file_with_default_app(self._menu_path)),
+        ])
+        self.menu = menu
+
+    def _save_as_action(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save As",
+            "",
+            "Images (*.jpg *.jpeg *.png *.gif *.bmp *.webp *.avif *.jpe);;All Files (*)"
+        )
+        if file_path:
+            logger.info(f"Saving to: {file_path}")
+            if save_image_as(self._menu_path, file_path):
+                logger.info(f"Saved to: {file_path}")
+            else:
+                logger.error(f"Failed to save to: {file_path}")
+
+    def set_cover_size(self, size: QSize):
+        """Resize all cells with a single relayout, drawing fast covers until the size settles."""
+        self.cover_delegate.set_cover_size(size, interactive=True)
+        self._apply_cover_size(size)
+        self._settle_timer.start()
+
+    def _apply_cover_size(self, size: QSize):
+        # Cell geometry is arithmetic, so a new grid size is a single relayout of the visible rows
+        self.setGridSize(QSize(size.width() + self.horizontal_spacing,
+                               size.height() + CoverDelegate.TITLE_HEIGHT + self.vertical_spacing))
+
+    def _on_size_settled(self):
+        self.cover_delegate.set_cover_size(self.cover_delegate.cover_size, interactive=False)
+        self.viewport().update()
+
+    def set_dataframe(self, dataframe: Optional[pd.DataFrame], incremental: bool = True):
+        self.gallery_model.set_dataframe(dataframe, incremental)
+
+    def path_at(self, row: int) -> Optional[str]:
+        return self.gallery_model.path_at(row)
+
+    def show_menu(self, path: str, global_pos):
+        self._menu_path = path
+        self.menu.exec(global_pos)
+
+    def mousePressEvent(self, event):
+        index = self.indexAt(event.position().toPoint())
+        if not index.isValid():
+            return super().mousePressEvent(event)
+        path = index.data(GalleryModel.PathRole)
+        if event.button() == Qt.MouseButton.RightButton:
+            self.setCurrentIndex(index)
+            self.show_menu(path, event.globalPosition().toPoint())
+            return
+        if event.button() == Qt.MouseButton.LeftButton:
+            more_rect = self.cover_delegate.more_button_rect(self.visualRect(index))
+            if more_rect.contains(event.position().toPoint()):
+                self.show_menu(path, self.viewport().mapToGlobal(more_rect.bottomLeft()))
+                return
+            super().mousePressEvent(event)
+            self.clicked.emit(path)
+            return
+        super().mousePressEvent(event)
+
+    def leaveEvent(self, event):
+        super().leaveEvent(event)
+        self._update_row(self._hover_row)
+        self._hover_row = -1
+
+
+if __name__ == "__main__":
+    import sys
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication(sys.argv)
+    folder = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(".")
+    paths = [str(p) for p in folder.rglob("*") if p.suffix.lower() in (".png", ".jpg", ".jpeg", ".webp")]
+    view = GalleryView()
+    view.set_dataframe(pd.DataFrame({"path": paths, "hash": [None] * len(paths)}))
+    view.clicked.connect(lambda path: print(f"Clicked: {path}"))
+    view.resize(1200, 800)
+    view.show()
+    app.exec()
@@ -0,0 +1,144 @@
+from typing import Callable, Optional, Set
+
+from PySide6.QtCore import QObject, QTimer, QElapsedTimer, Signal
+from PySide6.QtWidgets import QScrollBar
+from loguru import logger
+
+from manager import thumbnail_manager
+
+
+class ThumbnailPrefetcher(QObject):
+    """
+    Scroll-direction-aware thumbnail prefetch for grid views.
+
+    Tracks the scroll velocity of `scroll_bar` and keeps the thumbnail pool busy with the
+    rows the user is about to see: visible and upcoming rows are requested at high
+    priority, a few rows behind at low priority, and queued work far outside the
+    viewport is cancelled. The faster the scroll, the further ahead it reaches.
+
+    The view geometry is supplied through callables so the scheduler works for any
+    grid that maps a flat index to a path.
+    """
+    rangeChanged = Signal(int, int)  # first_index, last_index of the prefetch window
+
+    def __init__(self, scroll_bar: QScrollBar, row_height: Callable[[], int], columns: Callable[[], int],
+                 path_at: Callable[[int], Optional[str]], count: Callable[[], int],
+                 ahead_rows: int = 3, behind_rows: int = 1, cancel_margin_rows: int = 6,
+                 lookahead_ms: int = 400, parent=None):
+        """
+        Args:
+            scroll_bar: Vertical scroll bar of the view.
+            row_height: Returns the height of one row including spacing, in pixels.
+            columns: Returns the number of items per row.
+            path_at: Maps a flat item index to its image path.
+            count: Returns the total number of items.
+            ahead_rows: Rows prefetched ahead of the viewport when idle.
+            behind_rows: Rows kept warm behind the viewport.
+            cancel_margin_rows: Queued work further than this from the viewport is cancelled.
+            lookahead_ms: How far ahead in time the velocity extends the prefetch window.
+        """
+        super().__init__(parent)
+        self.scroll_bar = scroll_bar
+        self.row_height = row_height
+        self.columns = columns
+        self.path_at = path_at
+        self.count = count
+        self.ahead_rows = ahead_rows
+        self.behind_rows = behind_rows
+        self.cancel_margin_rows = cancel_margin_rows
+        self.lookahead_ms = lookahead_ms
+
+        self.velocity = 0.0  # px/s, smoothed
+        self.direction = 1
+        self._last_value = scroll_bar.value()
+        self._clock = QElapsedTimer()
+        self._clock.start()
+        self._requested: Set[str] = set()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(30)
+        self._timer.timeout.connect(self.update_prefetch)
+
+        self.scroll_bar.valueChanged.connect(self._on_scroll)
+        self.scroll_bar.rangeChanged.connect(lambda *_: self.schedule())
+
+    def schedule(self):
+        """Coalesce updates, many scroll events per frame end in a single pass."""
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def reset(self):
+        """Forget the current window, e.g. after the underlying order changed."""
+        for path in self._requested:
+            thumbnail_manager.cancel(path)
+        self._requested.clear()
+        self.velocity = 0.0
+        self._last_value = self.scroll_bar.value()
+        self.schedule()
+
+    def _on_scroll(self, value: int):
+        elapsed = max(self._clock.restart(), 1)
+        delta = value - self._last_value
+        self._last_value = value
+        if delta:
+            self.direction = 1 if delta > 0 else -1
+        # Idle gaps longer than the window reset the estimate instead of averaging it down slowly
+        instant = delta * 1000.0 / elapsed if elapsed < 250 else 0.0
+        self.velocity = 0.6 * self.velocity + 0.4 * instant
+        self.schedule()
+
+    def _indices(self, first_row: int, last_row: int, columns: int, total: int) -> range:
+        return range(max(0, first_row * columns), min(total, (last_row + 1) * columns))
+
+    def update_prefetch(self):
+        total = self.count()
+        if total <= 0:
+            return
+        row_height = max(1, self.row_height())
+        columns = max(1, self.columns())
+        value = self.scroll_bar.value()
+
+        first_row = value // row_height
+        last_row = (value + self.scroll_bar.pageStep()) // row_height
+        speed_rows = int(abs(self.velocity) * self.lookahead_ms / 1000 / row_height)
+        ahead = self.ahead_rows + speed_rows
+
+        if self.direction >= 0:
+            ahead_first, ahead_last = last_row + 1, last_row + ahead
+            behind_first, behind_last = first_row - self.behind_rows, first_row - 1
+        else:
+            ahead_first, ahead_last = first_row - ahead, first_row - 1
+            behind_first, behind_last = last_row + 1, last_row + self.behind_rows
+
+        high = list(self._indices(first_row, last_row, columns, total))
+        # Nearest rows first so ties in the pool queue resolve in viewing order
+        upcoming = list(self._indices(ahead_first, ahead_last, columns, total))
+        if self.direction < 0:
+            upcoming.reverse()
+        high.extend(upcoming)
+        low = self._indices(behind_first, behind_last, columns, total)
+
+        wanted = set()
+        for indices, priority in ((high, thumbnail_manager.PRIORITY_HIGH), (low, thumbnail_manager.PRIORITY_LOW)):
+            for index in indices:
+                path = self.path_at(index)
+                if path is None or path in wanted:
+                    continue
+                wanted.add(path)
+                thumbnail_manager.request(path, priority=priority)
+
+        stale = self._requested - wanted
+        if stale:
+            keep_range = self._indices(min(first_row, ahead_first) - self.cancel_margin_rows,
+                                       max(last_row, ahead_last) + self.cancel_margin_rows, columns, total)
+            keep_paths = {self.path_at(index) for index in keep_range}
+            for path in stale - keep_paths:
+                thumbnail_manager.cancel(path)
+            stale &= keep_paths
+        self._requested = wanted | stale
+
+        window = range(min(ahead_first, behind_first, first_row) * columns,
+                       (max(ahead_last, behind_last, last_row) + 1) * columns)
+        self.rangeChanged.emit(max(0, window.start), min(total, window.stop) - 1)
+        logger.trace(f"Prefetch rows {first_row}-{last_row}, ahead {ahead}, velocity {self.velocity:.0f}px/s")
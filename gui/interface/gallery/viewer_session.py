@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any
+
+from PySide6.QtCore import QObject, Signal, Slot, QRunnable, QThreadPool
+from PySide6.QtGui import QImage, QImageReader
+from loguru import logger
+
+from config import sd_config
+from manager import image_manager
+from utils import ImageLRUCache
+
+
+class _LoadToken:
+    __slots__ = ("cancelled",)
+
+    def __init__(self):
+        self.cancelled = False
+
+
+class _ViewerLoadTask(QRunnable):
+    """Decodes a full resolution image off the GUI thread."""
+    def __init__(self, session: "ViewerSession", path: str, token: _LoadToken):
+        super().__init__()
+        self.session = session
+        self.path = path
+        self.token = token
+
+    def run(self):
+        if self.token.cancelled:
+            return
+        image = self.session.cache.get(self.path)
+        if image is None:
+            reader = QImageReader(self.path)
+            reader.setAutoTransform(True)
+            image = reader.read()
+            if image.isNull():
+                logger.warning(f"Failed to decode {self.path}: {reader.errorString()}")
+            else:
+                self.session.cache.put(self.path, image)
+        self.session._loaded.emit(self.path, image)
+
+
+class ViewerSession(QObject):
+    """
+    Keeps the image viewer one step ahead of the user.
+
+    Opening an image also decodes the next/previous `prefetch` images on a thread pool
+    into a byte-bounded `ImageLRUCache`, so flipping through the gallery is served from
+    memory instead of a synchronous full resolution decode. Their metadata is looked up
+    when they are requested, on the GUI thread that owns the image index.
+    """
+    imageReady = Signal(str, QImage, object)  # path, image, metadata
+    _loaded = Signal(str, QImage)
+
+    OPEN_PRIORITY = 100  # Above every prefetch priority
+
+    def __init__(self, prefetch: Optional[int] = None, cache_bytes: Optional[int] = None, max_workers: int = 2,
+                 metadata_limit: int = 64, parent=None):
+        super().__init__(parent)
+        self.prefetch = sd_config.viewerPrefetch.value if prefetch is None else prefetch
+        self.cache = ImageLRUCache(sd_config.viewerCacheSize.value if cache_bytes is None else cache_bytes)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+
+        self.current: Optional[str] = None
+        self._shown: Optional[str] = None
+        self._paths: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._metadata: OrderedDict[str, Any] = OrderedDict()
+        self._metadata_limit = metadata_limit
+        self._pending: Dict[str, _LoadToken] = {}
+        self._loaded.connect(self._on_loaded)
+
+    def set_paths(self, paths: List[str]):
+        """Set the navigation order, usually the sorted paths of the gallery tab."""
+        self._paths = list(paths)
+        self._index = {path: i for i, path in enumerate(self._paths)}
+
+    def adjacent(self, path: str, step: int = 1) -> Optional[str]:
+        """Path `step` positions away from `path`, wrapping around at both ends."""
+        index = self._index.get(path)
+        if index is None or not self._paths:
+            return None
+        return self._paths[(index + step) % len(self._paths)]
+
+    def open(self, path: str, step: int = 1):
+        """
+        Show `path`: emits `imageReady` right away when it's cached, otherwise once decoded.
+
+        Args:
+            path: Image to show.
+            step: Navigation direction, neighbors in this direction are prefetched first.
+        """
+        self.current = path
+        self._shown = None
+        image = self.cache.get(path)
+        if image is not None and path in self._metadata:
+            self._metadata.move_to_end(path)
+            self._shown = path
+            self.imageReady.emit(path, image, self._metadata[path])
+        else:
+            self._request(path, self.OPEN_PRIORITY)
+        self._prefetch_around(path, 1 if step >= 0 else -1)
+
+    def clear(self):
+        for token in self._pending.values():
+            token.cancelled = True
+        self._pending.clear()
+        self._metadata.clear()
+        self.cache.clear()
+
+    def _request(self, path: str, priority: int):
+        if path in self._pending:
+            if priority < self.OPEN_PRIORITY:
+                return
+            # The user is waiting on this one now, re-queue it ahead of the prefetches
+            self._pending[path].cancelled = True
+        if path not in self._metadata:
+            self._remember_metadata(path)
+        token = _LoadToken()
+        self._pending[path] = token
+        self.pool.start(_ViewerLoadTask(self, path, token), priority)
+
+    def _remember_metadata(self, path: str):
+        try:
+            metadata = image_manager.get_image_metadata(path)
+        except Exception as e:
+            logger.error(f"Failed to read metadata for {path}: {e}")
+            metadata = None
+        self._metadata[path] = metadata
+        while len(self._metadata) > self._metadata_limit:
+            self._metadata.popitem(last=False)
+
+    def _prefetch_around(self, path: str, direction: int):
+        window = {path}
+        for distance in range(1, self.prefetch + 1):
+            for step in (direction * distance, -direction * distance):
+                neighbor = self.adjacent(path, step)
+                if neighbor is None or neighbor in window:
+                    continue
+                window.add(neighbor)
+                if neighbor in self.cache and neighbor in self._metadata:
+                    continue
+                # Closer and forward neighbors first
+                self._request(neighbor, self.OPEN_PRIORITY - 2 * distance - (step != direction * distance))
+
+        for stale in [p for p in self._pending if p not in window]:
+            self._pending.pop(stale).cancelled = True
+
+    @Slot(str, QImage)
+    def _on_loaded(self, path: str, image: QImage):
+        self._pending.pop(path, None)
+        if path == self.current and path != self._shown:
+            self._shown = path
+            self.imageReady.emit(path, image, self._metadata.get(path))
+
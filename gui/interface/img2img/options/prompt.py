@@ -1,5 +1,9 @@
 from gui.common import VerticalScrollWidget, VerticalFrame, ThemedLabel
 from gui.elements import PromptBox, SizeAndBatch,  ResizeBox
+from gui.components import ComboBoxCard
+
+# The WebUI's img2img resize modes, the payload's `resize_mode` is the index
+RESIZE_MODES = ["Just resize", "Crop and resize", "Resize and fill", "Just resize (latent upscale)"]
 
 class ImgPromptInterface(VerticalScrollWidget):
     def __init__(self, parent = None, *args, **kwargs):
@@ -9,11 +13,22 @@ class ImgPromptInterface(VerticalScrollWidget):
         self.prompt_box = PromptBox()
         resize_label = ThemedLabel("Resize")
         self.resize_box = ResizeBox()
+        self.resize_mode = ComboBoxCard(
+            "Resize Mode",
+            description="""How the image is fitted to the output size when the aspect ratios differ:
+            - Just resize: Stretches the image
+            - Crop and resize: Fills the size and crops the edges
+            - Resize and fill: Fits the image and fills the borders
+            - Just resize (latent upscale): Stretches in latent space""",
+            show_info_on_focus=True
+        )
+        self.resize_mode.set_items(RESIZE_MODES)
 
         self.addWidget(prompt_label)
         self.addWidget(self.prompt_box)
         self.addWidget(resize_label)
         self.addWidget(self.resize_box)
+        self.addWidget(self.resize_mode)
         self.setContentSpacing(0)
         self.setContentsMargins(0, 0, 0, 0)
         self.setLayoutMargins(0, 0, 0, 0)
@@ -26,10 +41,13 @@ class ImgPromptInterface(VerticalScrollWidget):
 
     def get_payload(self):
         payload = self.prompt_box.get_payload()
+        payload["resize_mode"] = self.resize_mode.currentIndex()
         return payload
 
     def set_payload(self, payload: dict):
         self.prompt_box.set_payload(payload)
+        if payload.get("resize_mode") in range(len(RESIZE_MODES)):
+            self.resize_mode.comboBox.setCurrentIndex(payload["resize_mode"])
 
 
 if __name__ == "__main__":
@@ -1,3 +1,6 @@
+from typing import Optional
+
+from PySide6.QtCore import QSize
 from PySide6.QtWidgets import QStackedWidget
 from gui.common import SegmentedStackedWidget
 from gui.interface.img2img.options import ImgBaseInterface, ImgPromptInterface, ImgAdvanceInterface
@@ -31,6 +34,10 @@ class ImgOptionWindow(SegmentedStackedWidget):
         payload.update(self.advance_interface.get_payload())
         return payload
 
+    def target_size(self, source: QSize) -> Optional[QSize]:
+        """Output size for an input image of size `source` set in the resize box, None for the server's default."""
+        return self.prompt_interface.resize_box.target_size(source)
+
     def set_payload(self, payload: dict):
         self.base_interface.set_payload(payload)
         self.prompt_interface.set_payload(payload)
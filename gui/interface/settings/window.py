@@ -128,6 +128,13 @@ class SettingsInterface(VerticalScrollWidget):
             parent=self,
             icon=FluentIcon.ROBOT
         )
+        grids_dir = FolderSettingCard(
+            configItem=sd_config.gridsDir,
+            title="Grids Directory",
+            content="Select the directory where the X/Y/Z grids will be saved",
+            parent=self,
+            icon=FluentIcon.TILES
+        )
 
         data_dir = FolderSettingCard(
             configItem=sd_config.dataDir,
@@ -150,6 +157,7 @@ class SettingsInterface(VerticalScrollWidget):
                 txt2img_dir,
                 img2img_dir,
                 controls_dir,
+                grids_dir,
                 data_dir,
                 cache_dir
             ]
@@ -176,10 +184,85 @@ class SettingsInterface(VerticalScrollWidget):
             parent=self
         )
 
+        queue_max_in_flight = RangeSettingCard(
+            configItem=sd_config.queueMaxInFlight,
+            icon=FluentIcon.SEND,
+            title="Jobs In Flight",
+            content="Number of queued generations posted to each server at once, 2 keeps the next one waiting on the server",
+            parent=self
+        )
+        extra_api_urls = LineEditSettingCard(
+            icon=FluentIcon.CLOUD,
+            title="Additional Servers",
+            content="Comma separated URLs of more WebUI servers to spread generations over",
+            config_item=sd_config.extraApiUrls,
+            parent=self
+        )
+        backend_scheduling = ComboBoxSettingCard(
+            configItem=sd_config.backendScheduling,
+            icon=FluentIcon.IOT,
+            title="Server Scheduling",
+            content="Least loaded server, or prefer the one that already has the checkpoint loaded",
+            texts=["Least loaded", "Checkpoint affinity"],
+            parent=self
+        )
+        job_scheduling = ComboBoxSettingCard(
+            configItem=sd_config.jobScheduling,
+            icon=FluentIcon.SYNC,
+            title="Queue Order",
+            content="Queue order, or group waiting jobs by checkpoint so the server switches models less often",
+            texts=["Queue order", "Group by checkpoint"],
+            parent=self
+        )
+        model_switch_max_wait = RangeSettingCard(
+            configItem=sd_config.modelSwitchMaxWait,
+            icon=FluentIcon.STOP_WATCH,
+            title="Max Wait For A Model Switch",
+            content="Seconds a job for another checkpoint waits at most before the server switches to it",
+            parent=self
+        )
+
+        enable_http2 = SwitchSettingCard(
+            icon=FluentIcon.SPEED_HIGH,
+            title="Allow HTTP/2",
+            content="Use HTTP/2 with servers that support it over HTTPS",
+            configItem=sd_config.enableHttp2
+        )
+        init_image_format = ComboBoxSettingCard(
+            configItem=sd_config.initImageFormat,
+            icon=FluentIcon.PHOTO,
+            title="Input Image Encoding",
+            content="Format input images are sent in, lossless WebP is smaller than PNG, JPEG far smaller but lossy",
+            texts=["PNG", "WebP (lossless)", "JPEG"],
+            parent=self
+        )
+        init_image_quality = RangeSettingCard(
+            configItem=sd_config.initImageQuality,
+            icon=IconManager.SLIDER,
+            title="Input Image JPEG Quality",
+            content="Quality of input images sent as JPEG",
+            parent=self
+        )
+        pre_resize_inputs = SwitchSettingCard(
+            icon=FluentIcon.ZOOM,
+            title="Resize Input Images",
+            content="Scale input images and masks down to the output size before sending them",
+            configItem=sd_config.preResizeInputs
+        )
+
         api_group.addSettingCards(
             [
                 api_url,
-                default_steps
+                default_steps,
+                queue_max_in_flight,
+                extra_api_urls,
+                backend_scheduling,
+                job_scheduling,
+                model_switch_max_wait,
+                enable_http2,
+                init_image_format,
+                init_image_quality,
+                pre_resize_inputs
             ]
         )
 
@@ -202,6 +285,13 @@ class SettingsInterface(VerticalScrollWidget):
             content="Set the size of the thumbnail cache for Gallery(in memory)",
             parent=self
         )
+        viewer_cache_size = SizeSettingCard(
+            configItem=sd_config.viewerCacheSize,
+            icon=IconManager.TEMP_FOLDER,
+            title="Viewer Cache Size",
+            content="Set the size of the decoded image cache for the Gallery viewer(in memory)",
+            parent=self
+        )
         clear_cache = PushSettingCard(
             text="Clear Cache",
             icon=IconManager.DELETE,
@@ -214,6 +304,7 @@ class SettingsInterface(VerticalScrollWidget):
             [
                 net_cache_size,
                 thumb_cache_size,
+                viewer_cache_size,
                 clear_cache
             ]
         )
@@ -236,7 +327,7 @@ class SettingsInterface(VerticalScrollWidget):
             configItem=sd_config.livePreviewDelayMs,
             icon=FluentIcon.STOP_WATCH,
             title="Live Preview Delay",
-            content="Set the delay of the live preview",
+            content="Minimum time between two live preview images, progress is polled independently",
             parent=self
         )
         live_preview_delay_ms.setSuffix("ms")
@@ -264,6 +355,12 @@ class SettingsInterface(VerticalScrollWidget):
             content="Enable autosave",
             configItem=sd_config.enableAutosave
         )
+        embed_exif_thumbnail = SwitchSettingCard(
+            icon=FluentIcon.PHOTO,
+            title="Embed EXIF Thumbnail",
+            content="Embed a small preview in saved JPEGs for faster gallery loading",
+            configItem=sd_config.embedExifThumbnail
+        )
         backup = PrimaryPushSettingCard(
             text="Backup",
             icon=FluentIcon.SAVE_AS,
@@ -282,6 +379,7 @@ class SettingsInterface(VerticalScrollWidget):
             [
                 save_gen_info_to_txt,
                 enable_autosave,
+                embed_exif_thumbnail,
                 backup,
                 restore
             ]
@@ -301,7 +399,14 @@ class SettingsInterface(VerticalScrollWidget):
             content="Set the maximum number of images in the gallery",
             parent=self
         )
-        gallery_group.addSettingCard(max_gallery_images)
+        viewer_prefetch = RangeSettingCard(
+            configItem=sd_config.viewerPrefetch,
+            icon=FluentIcon.PHOTO,
+            title="Viewer Prefetch",
+            content="Number of next/previous images decoded ahead in the image viewer",
+            parent=self
+        )
+        gallery_group.addSettingCards([max_gallery_images, viewer_prefetch])
 
         #update
         update_group = SettingCardGroup(
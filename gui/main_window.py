@@ -2,8 +2,9 @@ import json
 import os
 import zipfile
 from datetime import datetime
-from typing import Callable, Optional
-from PySide6.QtCore import Qt, QUrl, QTimer
+from dataclasses import replace
+from typing import Callable, Optional, Dict, List
+from PySide6.QtCore import Qt, QUrl, QTimer, QEvent
 from PySide6.QtGui import QDesktopServices, QPixmap, QColor
 from PySide6.QtWidgets import QHBoxLayout, QFrame, QWidget, QFileDialog, QGridLayout, QDialog
 from qasync import asyncSlot
@@ -16,8 +17,11 @@ from gui.interface import GalleryInterface
 from gui.interface import TxtOptionWindow, ExtraOptionWindow, ControlOptionWindow, ImgOptionWindow, SettingsInterface
 from loguru import logger
 from api import sd_api_manager
-from manager import info_view_manager, image_manager
-from utils import IconManager, save_sdwebui_image_with_info, base64_pixmap, pixmap_base64
+from manager import info_view_manager, image_manager, thumbnail_manager
+from utils import IconManager, save_sdwebui_image_with_info, DecodedImage, image_saver, EncodedImage, \
+    image_encoder, EncodeSettings, metadata_from_infotext, human_readable_size
+from utils.cache_manager import cache_manager
+from utils.image.encoded import SERVER_DEFAULT_SIZE
 from gui.elements import OutputImageBox, ImageInputBox
 from gui.common import NaviAvatarWidget, InfoTime
 from gui.components import NotificationWidget, BackupOptionsDialog
@@ -29,6 +33,7 @@ class SDFront(FluentWindow):
 
 
         self._current_image_data = dict()
+        self._decoded_images: Dict[str, List[DecodedImage]] = {}  # job id -> images streamed so far
         self.setWindowTitle("SD Front")
         self._current_image_gen = GenerationTypeFlags.TEXT2IMAGE
         self._previous_gen_data = dict()
@@ -120,11 +125,15 @@ class SDFront(FluentWindow):
 
     def _signal_listener(self):
         sd_api_manager.image_progress_updated.connect(self.on_generation_progress)
-        sd_api_manager.image_generated.connect(self.on_generation_finished)
+        sd_api_manager.job_generated.connect(self.on_job_finished)
+        sd_api_manager.job_queue.imageReceived.connect(self.on_image_received)
+        sd_api_manager.job_queue.jobFailed.connect(lambda job, *_: self._decoded_images.pop(job.id, None))
         sd_api_manager.image_generation_error.connect(self.on_generation_error)
         sd_api_manager.server_status_changed.connect(self.on_server_status_changed)
+        self.stackedWidget.currentChanged.connect(lambda _: self._update_preview_visibility())
 
         self.outputImageView.generate_image.connect(self._on_image_generate)
+        self.outputImageView.generate_forever.connect(self._on_generate_forever)
         self.outputImageView.sendTo_signal.connect(self.send_to)
 
         #notification
@@ -155,42 +164,124 @@ class SDFront(FluentWindow):
 
 
     def _on_image_generate(self):
-        current_widget = self.option_stack.currentWidget()
         self.outputImageView.reset_preview()
         self.outputImageView.hide_preview()
+        self._start_current_job(
+            lambda endpoint, payload, gen_type: sd_api_manager.enqueue_generation(endpoint, payload, gen_type=gen_type)
+        )
+
+        # logger.debug(f"Current Image Generation Type: {self._current_image_gen}, Payload: {payload}")
+
+    def _on_generate_forever(self, enabled: bool):
+        if not enabled:
+            sd_api_manager.stop_generate_forever()
+            return
+        started = self._start_current_job(
+            lambda endpoint, payload, gen_type: sd_api_manager.generate_forever(endpoint, payload, gen_type=gen_type)
+        )
+        if not started:
+            self.outputImageView.generate_forever_button.setChecked(False)
+
+    def _start_current_job(self, start: Callable[[str, dict, int], None]) -> bool:
+        """
+        Hand the job of the active option window to `start(endpoint, payload, gen_type)`.
+
+        Input images are scaled down to the output size (see `EncodeSettings.size`), the
+        payload's or else the server's default, and encoded first, off the GUI thread and
+        only once per image and settings. Returns False when the window can't generate.
+        """
+        job = self._current_job()
+        if job is None:
+            return False
+        endpoint, payload, images = job
+        gen_type = self._current_image_gen.value
+        if not images:
+            start(endpoint, payload, gen_type)
+            return True
+
+        # Without a size of its own the server generates at its default, the inputs are fitted to that
+        size = (payload.get('width', SERVER_DEFAULT_SIZE[0]), payload.get('height', SERVER_DEFAULT_SIZE[1]))
+        settings = EncodeSettings.from_config(size, payload.get('resize_mode', 0))
+        pending = set(images)
+        failed = []
+
+        def on_encoded(field: str, encoded: Optional[EncodedImage]):
+            if failed:
+                return
+            if encoded is None:
+                failed.append(field)
+                self.info_bar.error_msg("Error", f"Failed to encode the {'mask' if field == 'mask' else 'input image'}")
+                self.outputImageView.generate_forever_button.setChecked(False)
+                self.outputImageView.enable_generation(True)
+                return
+            payload[field] = [encoded.data] if field == 'init_images' else encoded.data
+            pending.discard(field)
+            if not pending:
+                start(endpoint, payload, gen_type)
+
+        for field, pixmap in images.items():
+            # Masks stay lossless, a JPEG mask would blur the inpainted area's edges
+            field_settings = replace(settings, format="webp") if field == 'mask' and settings.format == "jpeg" \
+                else settings
+            image_encoder().encode(pixmap, lambda encoded, field=field: on_encoded(field, encoded),
+                                   field_settings, owner=self)
+        return True
+
+    def _current_job(self) -> Optional[tuple]:
+        """
+        Endpoint, payload and input images by payload field of the active option window,
+        None when it can't generate.
+        """
+        current_widget = self.option_stack.currentWidget()
         if current_widget == self.text2image_interface:
             logger.debug("Text Generate")
             payload = self.text2image_interface.get_payload()
             self._current_image_gen = GenerationTypeFlags.TEXT2IMAGE
-            # print(payload)
-            sd_api_manager.generate_txt_image(payload)
+            return "txt2img", payload, {}
         elif current_widget == self.image2image_interface:
             logger.debug("Image Generate")
             init_image = self.inputImageView.get_pixmap()
             if init_image is None:
                 self.info_bar.error_msg("Error", "Please insert valid image to input image box")
                 QTimer.singleShot(500, lambda : self.outputImageView.enable_generation(True))
-                return
+                return None
             payload = self.image2image_interface.get_payload()
-            raw_init_image = pixmap_base64(init_image, "png")
-            # logger.critical(f"Init Image: {raw_init_image[100]}")
-            pixmap = base64_pixmap(raw_init_image)
-            payload['init_images'] = [raw_init_image]
+            target = self.image2image_interface.target_size(init_image.size())
+            if target is not None:
+                payload['width'], payload['height'] = target.width(), target.height()
+            images = {'init_images': init_image}
+            mask = self.inputImageView.get_mask()
+            if mask is not None and not mask.isNull():
+                images['mask'] = mask
             self._current_image_gen = GenerationTypeFlags.IMAGE2IMAGE
-            sd_api_manager.generate_img2img_image(payload)
+            return "img2img", payload, images
         elif current_widget == self.controls_interface:
             logger.debug("Controls Generate")
             self._current_image_gen = GenerationTypeFlags.CONTROLS
         elif current_widget == self.extras_interface:
             logger.debug("Extras Generate")
             self._current_image_gen = GenerationTypeFlags.EXTRAS
-
-        # logger.debug(f"Current Image Generation Type: {self._current_image_gen}, Payload: {payload}")
+        return None
 
     def on_generation_progress(self, progress: dict):
         live_preview = sd_config.showLivePreview.value
         self.outputImageView.on_progress(progress, live_preview)
 
+    def on_image_received(self, job, index: int, data: bytes):
+        # One decode per image, shared by the preview, the saver and the gallery
+        image = DecodedImage(data)
+        self._decoded_images.setdefault(job.id, []).append(image)
+        self.outputImageView.on_image_received(index, image)
+
+    def on_job_finished(self, job, image_data: dict):
+        # Jobs finish in queue order, not necessarily of the window that is active now
+        if job.gen_type:
+            self._current_image_gen = GenerationTypeFlags(job.gen_type)
+        streamed = self._decoded_images.pop(job.id, [])
+        images = image_data.get('images') or []
+        image_data = {**image_data, 'images': streamed + [DecodedImage.from_any(image) for image in images[len(streamed):]]}
+        self.on_generation_finished(image_data)
+
     def on_generation_finished(self, image_data: dict):
         # self._previous_gen_data = self._current_image_data
         images = image_data.get('images')
@@ -200,7 +291,8 @@ class SDFront(FluentWindow):
             self.outputImageView.on_error("No images generated")
             return
 
-        self._current_image_data = image_data
+        # Only the parameters are needed later, don't keep the images alive
+        self._current_image_data = {key: value for key, value in image_data.items() if key != 'images'}
         self.outputImageView.on_finished(image_data)
         #todo: make it dynamic(based on config).
         match self._current_image_gen:
@@ -216,8 +308,33 @@ class SDFront(FluentWindow):
                 output_dir = None
                 logger.error("Unknown generation type")
 
-        if save_sdwebui_image_with_info(image_data, output_dir, save_txt=sd_config.saveGenInfoToTxt.value,
-                                        image_format=sd_config.defaultImageFormat.value):
+        save_txt = sd_config.saveGenInfoToTxt.value
+        image_format = sd_config.defaultImageFormat.value
+        embed_thumbnail = sd_config.embedExifThumbnail.value
+
+        def save():
+            saved = []
+            success = save_sdwebui_image_with_info(image_data, output_dir, save_txt=save_txt, image_format=image_format,
+                                                   embed_thumbnail=embed_thumbnail, saved=saved)
+            records = []
+            for entry in saved:
+                if entry["infotext"]:
+                    try:
+                        records.append(metadata_from_infotext(entry["path"], entry["hash"], entry["infotext"]))
+                    except Exception as e:
+                        logger.warning(f"Failed to index {entry['path']}: {e}")
+            return success, saved, records
+
+        # Encoding and writing happen off the GUI thread, from the pixels the preview already
+        # decoded, one save at a time so concurrent jobs don't pick the same file index
+        image_saver().run(save, self._on_images_saved, self)
+
+    def _on_images_saved(self, result):
+        success, saved, records = result or (False, [], [])
+        for entry in saved:
+            thumbnail_manager.prime(entry["path"], entry["image"])
+        image_manager.add_metadata(records)
+        if success:
             logger.info("Image saved successfully")
         else:
             logger.error("Failed to save image")
@@ -295,6 +412,24 @@ class SDFront(FluentWindow):
         super().resizeEvent(event)
         self.notification_widget.move(self.width() - self.notification_widget.width() - 20, 20)
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._update_preview_visibility()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._update_preview_visibility()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange:
+            self._update_preview_visibility()
+
+    def _update_preview_visibility(self):
+        # Progress polls only download preview images while someone can see them
+        visible = self.isVisible() and not self.isMinimized() and self.stackedWidget.currentWidget() is self.spliter
+        sd_api_manager.set_preview_visible(visible)
+
     def save_state(self):
         """Save the current state of the application."""
         logger.info("Saving application state")
@@ -454,8 +589,12 @@ class SDFront(FluentWindow):
 
     def clear_cache(self):
         """Clear the cache of the application."""
-        logger.info("Clearing cache")
-        #todo: clear cache
+        manager = cache_manager()
+        for namespace, stats in manager.stats().items():
+            logger.info(f"Cache {namespace}: {human_readable_size(stats['bytes'])}, "
+                        f"{stats['hits']} hits, {stats['misses']} misses")
+        self.show_message("Clear Cache", f"Delete {human_readable_size(manager.size())} of cached data?",
+                          on_confirm=manager.clear)
 
     def closeEvent(self, event, /):
         logger.info("Closing application")
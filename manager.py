@@ -1,17 +1,21 @@
 import asyncio
 import mimetypes
 from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, List, Union, Callable, Tuple
 import re
 
 import numpy as np
 import pandas as pd
-from PySide6.QtGui import QIcon
+from PySide6.QtGui import QIcon, QImage, QPixmap, QPixmapCache
 from loguru import logger
-from PySide6.QtCore import Signal, QObject, QSize, Slot
+from PySide6.QtCore import Signal, QObject, QSize, Slot, QRunnable, QThreadPool, QTimer
 from pathlib import Path
 from pandas import DataFrame
-from utils import scan_and_update_images
+from shiboken6 import isValid
+from utils import scan_and_update_images, get_cached_pixmap, load_exif_thumbnail_image, load_thumbnail_image, \
+    pad_image, DecodedImage
+from utils.image.index import update_dataframe
+from utils.cache_manager import cache_manager
 from config import sd_config
 import json
 
@@ -38,24 +42,39 @@ class InfoNotificationManager(QObject):
 
 
 class CoverCardManager(QObject):
+    """
+    Shared cover size/border radius of gallery cards.
+
+    Size changes are coalesced: a slider drag sets the size many times per frame,
+    `size_changed` is emitted at most once per frame with the latest value.
+    """
     size_changed = Signal(QSize)
     border_radius_changed = Signal(int, int, int, int)
-    def __init__(self, parent = None):
+    def __init__(self, parent = None, frame_interval: int = 16):
         super().__init__(parent)
         self.cover_size = QSize(150, 150)
         self.border_radius = [5, 5, 5, 5]
 
+        self._size_timer = QTimer(self)
+        self._size_timer.setSingleShot(True)
+        self._size_timer.setInterval(frame_interval)
+        self._size_timer.timeout.connect(self._emit_size)
+
     def set_width(self, width: int):
-        self.cover_size.setWidth(width)
-        self.size_changed.emit(self.cover_size)
+        self.set_size(QSize(width, self.cover_size.height()))
 
     def set_height(self, height: int):
-        self.cover_size.setHeight(height)
-        self.size_changed.emit(self.cover_size)
+        self.set_size(QSize(self.cover_size.width(), height))
 
     def set_size(self, size: QSize):
-        self.cover_size = size
-        self.size_changed.emit(size)
+        if size == self.cover_size and not self._size_timer.isActive():
+            return
+        self.cover_size = QSize(size)
+        if not self._size_timer.isActive():
+            self._size_timer.start()
+
+    def _emit_size(self):
+        self.size_changed.emit(QSize(self.cover_size))
 
     # @property
     def get_size(self) -> QSize:
@@ -70,6 +89,181 @@ class CoverCardManager(QObject):
         return tuple(self.border_radius)
 
 
+class _ThumbnailJob:
+    """Shared cancellation token of the two stage tasks of one request."""
+    __slots__ = ("priority", "cancelled")
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.cancelled = False
+
+
+class _ThumbnailTask(QRunnable):
+    """Decodes one thumbnail stage on a worker thread."""
+    def __init__(self, manager: "ThumbnailManager", job: _ThumbnailJob, path: str, size: QSize, is_final: bool,
+                 source: Optional[DecodedImage] = None):
+        super().__init__()
+        self.manager = manager
+        self.job = job
+        self.path = path
+        self.size = size
+        self.is_final = is_final
+        self.source = source
+
+    def run(self):
+        if self.job.cancelled:
+            return
+        try:
+            if self.source is not None:
+                image = pad_image(self.source.thumbnail(max(self.size.width(), self.size.height())), self.size)
+            elif self.is_final:
+                image = load_thumbnail_image(self.path, self.size)
+            else:
+                image = load_exif_thumbnail_image(self.path, self.size)
+        except Exception as e:
+            logger.error(f"Thumbnail task failed for {self.path}: {e}")
+            image = None
+        self.manager._taskFinished.emit(self.path, image if image is not None else QImage(), self.is_final)
+
+
+class ThumbnailManager(QObject):
+    """
+    Two stage thumbnail loader for gallery cards.
+
+    Stage one reads the embedded EXIF thumbnail (header-only read) so a card can show
+    something immediately, stage two decodes the image at thumbnail resolution and
+    stores it in `QPixmapCache`. Both stages run on a thread pool; callbacks are
+    invoked on the GUI thread.
+
+    Requests carry a priority so the visible rows are decoded before prefetched ones,
+    and queued work can be cancelled when it scrolls out of range.
+    """
+    thumbnailReady = Signal(str, QPixmap, bool)  # path, pixmap, is_final
+    _taskFinished = Signal(str, QImage, bool)
+
+    PRIORITY_LOW = 0
+    PRIORITY_NORMAL = 10
+    PRIORITY_HIGH = 20
+
+    def __init__(self, thumb_size: QSize = QSize(512, 512), max_workers: int = 4, parent=None):
+        super().__init__(parent)
+        self.thumb_size = thumb_size
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self._callbacks: Dict[str, List[Tuple[Callable, Optional[QObject]]]] = {}
+        self._jobs: Dict[str, _ThumbnailJob] = {}
+        self._taskFinished.connect(self._on_task_finished)
+        self.hits = 0
+        self.misses = 0
+        QPixmapCache.setCacheLimit(sd_config.thumbCacheSize.value // 1024)
+        cache_manager().register("thumbnails", self.clear, lambda: {
+            "hits": self.hits, "misses": self.misses, "quota": QPixmapCache.cacheLimit() * 1024})
+
+    @staticmethod
+    def cache_key(path: str) -> str:
+        return f"thumb:{path}"
+
+    def cached(self, path: str) -> Optional[QPixmap]:
+        """Return the high quality thumbnail of `path` if it is already cached."""
+        pixmap = QPixmap()
+        if QPixmapCache.find(self.cache_key(path), pixmap):
+            self.hits += 1
+            return pixmap
+        self.misses += 1
+        return None
+
+    def clear(self):
+        """Drop every cached thumbnail, they are decoded again when next requested."""
+        for job in self._jobs.values():
+            job.cancelled = True
+        self._jobs.clear()
+        QPixmapCache.clear()
+
+    def is_pending(self, path: str) -> bool:
+        return path in self._jobs
+
+    def request(self, path: str, callback: Optional[Callable[[str, QPixmap, bool], None]] = None,
+                owner: Optional[QObject] = None, priority: int = PRIORITY_NORMAL):
+        """
+        Request the thumbnail of `path`.
+
+        Args:
+            path: Image path.
+            callback: Called as callback(path, pixmap, is_final), possibly twice: once with
+                the EXIF placeholder and once with the final thumbnail. May be None to
+                only warm the cache.
+            owner: Optional QObject; the callback is skipped if it was deleted meanwhile.
+            priority: Queue priority, a pending request is re-queued if raised.
+        """
+        pixmap = self.cached(path)
+        if pixmap is not None:
+            if callback is not None:
+                callback(path, pixmap, True)
+            return
+
+        if callback is not None:
+            self._callbacks.setdefault(path, []).append((callback, owner))
+
+        job = self._jobs.get(path)
+        if job is not None:
+            if job.priority >= priority:
+                return
+            # QThreadPool can't re-prioritize, so drop the queued tasks and queue new ones
+            job.cancelled = True
+
+        job = _ThumbnailJob(priority)
+        self._jobs[path] = job
+        self.pool.start(_ThumbnailTask(self, job, path, self.thumb_size, False), priority + 1)
+        self.pool.start(_ThumbnailTask(self, job, path, self.thumb_size, True), priority)
+
+    def prime(self, path: str, image: DecodedImage):
+        """
+        Cache the thumbnail of `path` from an image that is already decoded in memory,
+        e.g. one that was just generated and saved, instead of reading the file back.
+        """
+        if self.cached(path) is not None:
+            return
+        job = self._jobs.get(path)
+        if job is not None:
+            job.cancelled = True
+        job = _ThumbnailJob(self.PRIORITY_HIGH)
+        self._jobs[path] = job
+        self.pool.start(_ThumbnailTask(self, job, path, self.thumb_size, True, image), self.PRIORITY_HIGH)
+
+    def cancel(self, path: str):
+        """
+        Cancel the queued decode of `path`.
+
+        Registered callbacks are kept and fire if the path is requested again.
+        """
+        job = self._jobs.pop(path, None)
+        if job is not None:
+            job.cancelled = True
+
+    @Slot(str, QImage, bool)
+    def _on_task_finished(self, path: str, image: QImage, is_final: bool):
+        if is_final:
+            job = self._jobs.pop(path, None)
+            if job is not None:
+                job.cancelled = True
+            callbacks = self._callbacks.pop(path, [])
+            # Unreadable files cache the shared placeholder so views don't re-request them on every paint
+            pixmap = get_cached_pixmap(None, self.thumb_size) if image.isNull() else QPixmap.fromImage(image)
+            QPixmapCache.insert(self.cache_key(path), pixmap)
+        else:
+            # Placeholder stage: ignore if the final thumbnail already won the race
+            if path not in self._jobs or image.isNull():
+                return
+            callbacks = self._callbacks.get(path, [])
+            pixmap = QPixmap.fromImage(image)
+
+        for callback, owner in callbacks:
+            if owner is not None and not isValid(owner):
+                continue
+            callback(path, pixmap, is_final)
+        self.thumbnailReady.emit(path, pixmap, is_final)
+
+
 class ImageManager(QObject):
     scan_progress = Signal(int, int)  # current, total
     scan_completed = Signal()
@@ -177,6 +371,13 @@ class ImageManager(QObject):
             self.error_occurred.emit(str(e))
             return False
 
+    def add_metadata(self, records: List[Dict[str, Any]]) -> None:
+        """Merge index records of freshly saved images, so they are known without a rescan."""
+        if not records:
+            return
+        self.image_dataframe = update_dataframe(records, self.image_dataframe, feather_path=None)
+        logger.debug(f"Indexed {len(records)} generated images")
+
     def get_image_metadata(self, image_path: str) -> Optional[Dict[str, Any]]:
         """Get metadata for a specific image."""
         if self.image_dataframe is None:
@@ -433,5 +634,6 @@ class ImageManager(QObject):
 
 
 card_manager = CoverCardManager()
+thumbnail_manager = ThumbnailManager()
 image_manager = ImageManager()
 info_view_manager = InfoNotificationManager()
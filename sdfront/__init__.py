@@ -0,0 +1 @@
+from .batch import BatchJob, BatchRunner, BatchStats, load_jobs
\ No newline at end of file
@@ -0,0 +1,24 @@
+import argparse
+import sys
+
+from sdfront import batch
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m sdfront", description="SD Front")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("gui", help="Start the GUI (the default)")
+    batch.add_arguments(commands.add_parser("batch", help="Generate a list of payloads without the GUI",
+                                            description=batch.__doc__,
+                                            formatter_class=argparse.RawDescriptionHelpFormatter))
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        return batch.run(args)
+    import main as gui
+    gui.main()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+Batch generation without the GUI.
+
+Runs a list of payloads against one or more servers and saves the images like the GUI
+does: same file naming, EXIF infotext, .txt files and gallery index. Jobs come from
+
+- a JSONL file, one payload per line, or {"endpoint": "img2img", "payload": {...}};
+- a CSV file, one payload per row, cells are parsed as JSON where they can be;
+- a JSON file holding a payload or a list of them, `file.json#section` picks a section,
+  e.g. ``config/app_state.json#txt2img`` for the payload saved by the GUI.
+
+Finished jobs are appended to a journal next to the input, a rerun of the same command
+skips them, so an interrupted batch resumes where it stopped::
+
+    python -m sdfront batch prompts.csv --defaults config/app_state.json#txt2img \\
+        --server http://127.0.0.1:7860 --server http://gpu2:7860 --in-flight 2
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+from loguru import logger
+
+from api.aio import APIError, AsyncSDClient
+from config import sd_config
+from utils.image.index import load_existing_dataframe, metadata_from_infotext, update_dataframe
+from utils.image.tools import save_sdwebui_image_with_info
+
+ENDPOINTS = ("txt2img", "img2img")
+# Where `ImageManager` keeps the gallery index
+INDEX_PATH = Path("data") / "data.feather"
+
+
+@dataclass
+class BatchJob:
+    id: str
+    endpoint: str
+    payload: Dict[str, Any]
+
+
+def read_spec(spec: str) -> Tuple[Path, Any]:
+    """Read `path` or `path#section` of a JSON, JSONL or CSV file."""
+    path_text, _, section = spec.partition("#")
+    path = Path(path_text)
+    suffix = path.suffix.lower()
+    if suffix == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            data = [json.loads(line) for line in f if line.strip()]
+    elif suffix == ".csv":
+        with open(path, encoding="utf-8", newline="") as f:
+            data = [{key: _parse_cell(value) for key, value in row.items() if key and value not in (None, "")}
+                    for row in csv.DictReader(f)]
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    if section:
+        if not isinstance(data, dict) or section not in data:
+            raise ValueError(f"{path} has no section '{section}'")
+        data = data[section]
+    return path, data
+
+
+def _parse_cell(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def load_jobs(spec: str, defaults: Optional[Dict[str, Any]] = None, endpoint: Optional[str] = None,
+              repeat: int = 1) -> List[BatchJob]:
+    """
+    The jobs of `spec`, each payload merged over `defaults`.
+
+    The endpoint is taken from `endpoint`, an "endpoint" entry, the section name, or
+    guessed from the presence of init images. Job ids hash the position and payload,
+    so they stay the same between runs of the same input.
+    """
+    _, data = read_spec(spec)
+    section = spec.partition("#")[2]
+    entries = data if isinstance(data, list) else [data]
+    jobs = []
+    for index, entry in enumerate(entries * repeat):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Entry {index} of {spec} is not an object")
+        entry = dict(entry)
+        payload = entry.pop("payload", None)
+        job_endpoint = entry.pop("endpoint", None)
+        if payload is None:
+            payload = entry
+        payload = {**(defaults or {}), **payload}
+        job_endpoint = endpoint or job_endpoint or (section if section in ENDPOINTS else None) \
+            or ("img2img" if payload.get("init_images") else "txt2img")
+        if job_endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{job_endpoint}' in entry {index} of {spec}")
+        digest = hashlib.sha1(json.dumps([index, job_endpoint, payload], sort_keys=True).encode()).hexdigest()
+        jobs.append(BatchJob(f"{index:05d}-{digest[:12]}", job_endpoint, payload))
+    return jobs
+
+
+class Journal:
+    """Append-only record of finished jobs, for resuming."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: Set[str] = set()
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line)["id"])
+                    except (ValueError, KeyError):
+                        pass  # A line cut off by the interruption
+        self._file = None
+
+    def record(self, job: BatchJob, server: str, seconds: float, paths: List[str]):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps({"id": job.id, "endpoint": job.endpoint, "server": server,
+                                     "seconds": round(seconds, 3), "paths": paths, "time": time.time()}) + "\n")
+        self._file.flush()
+        self.done.add(job.id)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class GalleryIndex:
+    """The gallery index, written every `flush_every` jobs rather than after each one."""
+
+    def __init__(self, path: Path = INDEX_PATH, flush_every: int = 10):
+        self.path = path
+        self.flush_every = flush_every
+        self.dataframe, _ = load_existing_dataframe(path)
+        self.pending: List[Dict[str, Any]] = []
+        self._jobs = 0
+
+    def add(self, records: List[Dict[str, Any]]):
+        self.pending.extend(records)
+        self._jobs += 1
+        if self._jobs % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.dataframe = update_dataframe(self.pending, self.dataframe, feather_path=str(self.path))
+        self.pending = []
+
+
+@dataclass
+class BatchStats:
+    total: int
+    skipped: int = 0
+    done: int = 0
+    failed: int = 0
+    images: int = 0
+    server_seconds: Dict[str, float] = field(default_factory=dict)  # Time in generation requests
+    server_images: Dict[str, int] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+
+    def add(self, server: str, seconds: float, images: int):
+        self.done += 1
+        self.images += images
+        self.server_seconds[server] = self.server_seconds.get(server, 0.0) + seconds
+        self.server_images[server] = self.server_images.get(server, 0) + images
+
+    def images_per_minute(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.images * 60 / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        lines = [f"{self.done} jobs done, {self.failed} failed, {self.skipped} skipped from an earlier run, "
+                 f"{self.images} images in {elapsed:.1f} s: {self.images_per_minute():.1f} images/min"]
+        for server, seconds in self.server_seconds.items():
+            images = self.server_images[server]
+            if images:
+                lines.append(f"  {server}: {images} images, {seconds / images:.2f} server s/image")
+        return "\n".join(lines)
+
+
+class BatchRunner:
+    """
+    Feeds jobs to `in_flight` workers per server and saves their images.
+
+    Saving runs on one thread beside the event loop, so the next generations are already
+    on their way while images are written. One thread, because the file index of
+    `save_sdwebui_image_with_info` is taken from the directory contents.
+
+    A job whose server can't be reached goes back to the queue. A worker backs off
+    after each such connection error and stops after `retries` of them in a row, so a
+    dead server is dropped while the others carry on. A job that was sent but timed out
+    or lost its answer is not requeued, the server may have run it. Those, the jobs
+    failed by the server and the ones left when every worker stopped are not journaled:
+    a rerun tries them again.
+    """
+
+    def __init__(self, jobs: List[BatchJob], servers: List[str], journal: Journal,
+                 index: Optional[GalleryIndex] = None, in_flight: int = 1, output_dir: Optional[str] = None,
+                 image_format: str = "jpeg", save_txt: bool = True, embed_thumbnail: bool = True,
+                 retries: int = 2, auth_token: Optional[str] = None):
+        self.servers = servers
+        self.journal = journal
+        self.index = index
+        self.in_flight = in_flight
+        self.output_dir = output_dir
+        self.image_format = image_format
+        self.save_txt = save_txt
+        self.embed_thumbnail = embed_thumbnail
+        self.retries = retries
+        self.auth_token = auth_token
+        self.jobs = [job for job in jobs if job.id not in journal.done]
+        self.stats = BatchStats(len(jobs), skipped=len(jobs) - len(self.jobs))
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-save")
+
+    async def run(self) -> BatchStats:
+        for job in self.jobs:
+            self._queue.put_nowait(job)
+        clients = [AsyncSDClient(server, self.auth_token, max_connections=self.in_flight + 1,
+                                 max_generations=self.in_flight) for server in self.servers]
+        workers = asyncio.gather(*(self._worker(client) for client in clients for _ in range(self.in_flight)))
+        all_done = asyncio.ensure_future(self._queue.join())
+        try:
+            # Done when the queue is, or when every server was dropped
+            await asyncio.wait([all_done, workers], return_when=asyncio.FIRST_COMPLETED)
+            if not all_done.done():
+                self.stats.failed += self._queue.qsize()
+                logger.error(f"No server left, {self._queue.qsize()} jobs not run")
+        finally:
+            all_done.cancel()
+            workers.cancel()
+            await asyncio.gather(workers, return_exceptions=True)
+            await asyncio.gather(*(client.close() for client in clients))
+            self._saver.shutdown(wait=True)
+            self.journal.close()
+            if self.index is not None:
+                self.index.flush()
+        return self.stats
+
+    async def _worker(self, client: AsyncSDClient):
+        loop = asyncio.get_running_loop()
+        unreachable = 0
+        while unreachable <= self.retries:
+            job = await self._queue.get()
+            try:
+                await self._run_job(client, job, loop)
+                unreachable = 0
+            except APIError as e:
+                if e.status_code != 0 or e.sent:
+                    # Running it again here could generate it twice, a rerun picks it up
+                    self.stats.failed += 1
+                    logger.error(f"Job {job.id} failed on {client.base_url}: {e}")
+                    continue
+                # Let another worker have the job, and keep this one off its server for a while
+                self._queue.put_nowait(job)
+                unreachable += 1
+                logger.warning(f"{client.base_url} failed job {job.id} ({e}), requeued")
+                if unreachable <= self.retries:
+                    await asyncio.sleep(min(2 ** unreachable, 30))
+            except Exception as e:
+                self.stats.failed += 1
+                logger.exception(f"Job {job.id} failed: {e}")
+            finally:
+                self._queue.task_done()
+        logger.error(f"Dropping {client.base_url}, unreachable {unreachable} times in a row")
+
+    async def _run_job(self, client: AsyncSDClient, job: BatchJob, loop: asyncio.AbstractEventLoop):
+        start = time.perf_counter()
+        result = await client.generate(job.endpoint, job.payload)
+        seconds = time.perf_counter() - start
+        saved, records = await loop.run_in_executor(self._saver, self._save, job, result)
+        self.journal.record(job, client.base_url, seconds, [entry["path"] for entry in saved])
+        if self.index is not None:
+            self.index.add(records)
+        self.stats.add(client.base_url, seconds, len(saved))
+        finished = self.stats.done + self.stats.failed + self.stats.skipped
+        print(f"[{finished}/{self.stats.total}] {job.id}: {len(saved)} images in {seconds:.1f} s "
+              f"on {client.base_url}, {self.stats.images_per_minute():.1f} images/min", flush=True)
+
+    def _save(self, job: BatchJob, result: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        output_dir = self.output_dir or (sd_config.img2imgDir.value if job.endpoint == "img2img"
+                                         else sd_config.txt2imgDir.value)
+        saved = []
+        save_sdwebui_image_with_info(result, output_dir, save_txt=self.save_txt, image_format=self.image_format,
+                                     embed_thumbnail=self.embed_thumbnail, saved=saved)
+        records = []
+        for entry in saved:
+            if entry["infotext"]:
+                try:
+                    records.append(metadata_from_infotext(entry["path"], entry["hash"], entry["infotext"]))
+                except Exception as e:
+                    logger.warning(f"Failed to index {entry['path']}: {e}")
+        return saved, records
+
+
+def default_servers() -> List[str]:
+    extra = [url.strip() for url in sd_config.extraApiUrls.value.split(",") if url.strip()]
+    return [sd_config.apiUrl.value] + extra
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("jobs", help="JSONL, CSV or JSON file of payloads, 'file.json#section' for a section")
+    parser.add_argument("--defaults", help="Payload the jobs are merged over, same format, "
+                                           "e.g. config/app_state.json#txt2img")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, help="Endpoint of every job, guessed per job by default")
+    parser.add_argument("--repeat", type=int, default=1, help="Run the job list this many times")
+    parser.add_argument("--server", action="append", dest="servers",
+                        help="Server URL, repeat for several. Default: the servers of the settings")
+    parser.add_argument("--in-flight", type=int, default=sd_config.queueMaxInFlight.value,
+                        help="Generations in flight per server")
+    parser.add_argument("--output", help="Output directory. Default: the txt2img/img2img directory of the settings")
+    parser.add_argument("--format", choices=("jpeg", "png"), default=None, help="Image format")
+    parser.add_argument("--no-txt", action="store_true", help="Don't write infotext .txt files")
+    parser.add_argument("--index", default=str(INDEX_PATH), help="Gallery index to add the images to")
+    parser.add_argument("--no-index", action="store_true", help="Don't add the images to the gallery index")
+    parser.add_argument("--journal", help="Journal of finished jobs. Default: next to the job file")
+    parser.add_argument("--restart", action="store_true", help="Ignore the journal and run every job again")
+    parser.add_argument("--retries", type=int, default=2, help="Requeues of a job whose server can't be reached")
+    parser.add_argument("--log-level", default="WARNING")
+
+
+def run(args: argparse.Namespace) -> int:
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level.upper())
+
+    defaults = None
+    if args.defaults:
+        _, defaults = read_spec(args.defaults)
+        if not isinstance(defaults, dict):
+            raise SystemExit(f"--defaults {args.defaults} is not a single payload")
+    jobs = load_jobs(args.jobs, defaults, args.endpoint, args.repeat)
+
+    path_text, _, section = args.jobs.partition("#")
+    journal_path = Path(args.journal) if args.journal else \
+        Path(path_text).with_name(Path(path_text).name + (f".{section}" if section else "") + ".done.jsonl")
+    if args.restart:
+        journal_path.unlink(missing_ok=True)
+    journal = Journal(journal_path)
+
+    image_format = args.format or ("png" if sd_config.defaultImageFormat.value == "png" else "jpeg")
+    runner = BatchRunner(jobs, args.servers or default_servers(), journal,
+                         index=None if args.no_index else GalleryIndex(Path(args.index)), in_flight=max(1, args.in_flight),
+                         output_dir=args.output, image_format=image_format,
+                         save_txt=not args.no_txt and sd_config.saveGenInfoToTxt.value,
+                         embed_thumbnail=sd_config.embedExifThumbnail.value, retries=args.retries)
+    if runner.stats.skipped:
+        print(f"Resuming: {runner.stats.skipped} of {len(jobs)} jobs already done (journal {journal_path})")
+    print(f"Running {len(runner.jobs)} jobs on {', '.join(runner.servers)}, {runner.in_flight} in flight per server")
+    try:
+        stats = asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        print(f"Interrupted, finished jobs are in {journal_path}, run the same command to resume")
+        print(runner.stats.summary())
+        return 130
+    print(stats.summary())
+    return 1 if stats.failed else 0
@@ -0,0 +1,158 @@
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from PySide6.QtCore import QObject, QUrl
+from PySide6.QtNetwork import QNetworkDiskCache, QNetworkCacheMetaData
+from loguru import logger
+from shiboken6 import isValid
+
+from config import sd_config
+
+
+class TrackedDiskCache(QNetworkDiskCache):
+    """`QNetworkDiskCache` that counts lookups and written bytes."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.hits = 0
+        self.misses = 0
+        self.written = 0
+
+    def metaData(self, url: QUrl) -> QNetworkCacheMetaData:
+        meta_data = super().metaData(url)
+        if not meta_data.isValid():
+            self.misses += 1
+        return meta_data
+
+    def data(self, url: QUrl):
+        device = super().data(url)
+        if device is not None:
+            self.hits += 1
+        return device
+
+    def insert(self, device):
+        self.written += device.size()
+        super().insert(device)
+
+
+class CacheManager(QObject):
+    """
+    Owns every cache of the application under `sd_config.cacheDir`.
+
+    Disk namespaces each get their own directory and a share of `netCacheSize`, so they
+    no longer evict each other's files or count each other's bytes:
+
+    - api: SD WebUI responses and the `ResourceCache` file.
+    - civitai: Civitai model metadata.
+    - previews: downloaded preview images.
+
+    In-memory caches (gallery thumbnails, viewer tiles...) register themselves with
+    `register()`, so `stats()` and `clear()` cover them too.
+    """
+    DISK_SHARES = {"api": 0.2, "civitai": 0.3, "previews": 0.5}
+    # Left behind by the caches that used to share the root directory
+    _LEGACY_DIRS = ("data8", "data9", "prepared")
+
+    def __init__(self, root: str, total_bytes: int, parent=None):
+        super().__init__(parent)
+        self.root = Path(root)
+        self.total_bytes = total_bytes
+        self._disk_caches: Dict[str, TrackedDiskCache] = {}
+        self._clearers: Dict[str, Callable[[], None]] = {}
+        self._stats: Dict[str, Callable[[], Dict[str, int]]] = {}
+
+    def path(self, namespace: str, name: str = "") -> Path:
+        """Directory of `namespace`, or the file `name` in it."""
+        directory = self.root / namespace
+        return directory / name if name else directory
+
+    def quota(self, namespace: str) -> int:
+        return int(self.total_bytes * self.DISK_SHARES.get(namespace, 0))
+
+    def disk_cache(self, namespace: str) -> Optional[TrackedDiskCache]:
+        """
+        The disk cache of `namespace`, for `QNetworkAccessManager.setCache`.
+
+        A network access manager takes ownership of its cache, so each namespace can be
+        handed out once. Returns None while the cache is in use by another manager, the
+        caller then runs uncached rather than corrupting the directory.
+        """
+        if namespace not in self.DISK_SHARES:
+            raise ValueError(f"Unknown cache namespace: {namespace}")
+        cache = self._disk_caches.get(namespace)
+        if cache is not None and isValid(cache):
+            logger.warning(f"Disk cache '{namespace}' is already in use, continuing without it")
+            return None
+        cache = TrackedDiskCache()
+        cache.setCacheDirectory(str(self.path(namespace)))
+        cache.setMaximumCacheSize(self.quota(namespace))
+        self._disk_caches[namespace] = cache
+        return cache
+
+    def register(self, namespace: str, clear: Callable[[], None],
+                 stats: Optional[Callable[[], Dict[str, int]]] = None):
+        """Add a cache to `clear()`. `stats` returns a dict with any of hits, misses and bytes."""
+        self._clearers[namespace] = clear
+        if stats is not None:
+            self._stats[namespace] = stats
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hits, misses, bytes in use and quota of every namespace."""
+        result = {}
+        for namespace in self.DISK_SHARES:
+            cache = self._live_cache(namespace)
+            result[namespace] = {
+                "hits": cache.hits if cache else 0,
+                "misses": cache.misses if cache else 0,
+                "bytes": cache.cacheSize() if cache else self._directory_size(self.path(namespace)),
+                "quota": self.quota(namespace),
+            }
+        for namespace, stats in self._stats.items():
+            result[namespace] = {"hits": 0, "misses": 0, "bytes": 0, **stats()}
+        return result
+
+    def size(self) -> int:
+        """Bytes in use by all caches."""
+        return sum(stats["bytes"] for stats in self.stats().values())
+
+    def clear(self, namespace: Optional[str] = None) -> int:
+        """Clear one namespace or everything. Returns the number of bytes freed."""
+        before = self.size()
+        namespaces = [namespace] if namespace else list(self.DISK_SHARES) + list(self._clearers)
+        for name in namespaces:
+            if name in self._clearers:
+                self._clearers[name]()
+            if name in self.DISK_SHARES:
+                cache = self._live_cache(name)
+                if cache is not None:
+                    cache.clear()
+                else:
+                    shutil.rmtree(self.path(name), ignore_errors=True)
+        if namespace is None:
+            for legacy in self._LEGACY_DIRS:
+                shutil.rmtree(self.root / legacy, ignore_errors=True)
+        freed = max(0, before - self.size())
+        logger.info(f"Cleared {namespace or 'all'} cache, {freed / 1048576:.1f} MB freed")
+        return freed
+
+    def _live_cache(self, namespace: str) -> Optional[TrackedDiskCache]:
+        cache = self._disk_caches.get(namespace)
+        return cache if cache is not None and isValid(cache) else None
+
+    @staticmethod
+    def _directory_size(path: Path) -> int:
+        if not path.exists():
+            return 0
+        return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+_cache_manager: Optional[CacheManager] = None
+
+
+def cache_manager() -> CacheManager:
+    """The shared `CacheManager`, created on first use."""
+    global _cache_manager
+    if _cache_manager is None:
+        _cache_manager = CacheManager(sd_config.cacheDir.value, sd_config.netCacheSize.value)
+    return _cache_manager
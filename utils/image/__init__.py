@@ -4,4 +4,9 @@ from .parser import (
 )
 from .tools import get_dir_imgs, is_image_file, \
     save_image_as, save_sdwebui_image_with_info, base64_pixmap, pixmap_base64
-from .index import scan_and_update_images
\ No newline at end of file
+from .index import scan_and_update_images, metadata_from_infotext
+from .thumbnail import read_exif_thumbnail, load_exif_thumbnail_image, load_thumbnail_image, pad_image
+from .cache import ImageLRUCache
+from .decoded import DecodedImage, ImageDecoder, image_decoder, image_saver
+from .encoded import EncodeSettings, EncodedImage, ImageEncoder, image_encoder, encode_image
+from .grid import GridCanvas
\ No newline at end of file
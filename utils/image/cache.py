@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Hashable
+
+from PySide6.QtGui import QImage
+
+
+class ImageLRUCache:
+    """
+    Thread-safe LRU of decoded `QImage`s bounded by their byte size.
+
+    `QImage` is implicitly shared and safe to hand across threads, so worker threads can
+    insert decoded images while the GUI thread reads them.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: Total pixel bytes kept before the least recently used images are evicted.
+        """
+        self.max_bytes = max_bytes
+        self._images: OrderedDict[Hashable, QImage] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[QImage]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._images.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key: Hashable, image: QImage):
+        if image is None or image.isNull():
+            return
+        size = image.sizeInBytes()
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self._bytes -= old.sizeInBytes()
+            self._images[key] = image
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= evicted.sizeInBytes()
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            image = self._images.pop(key, None)
+            if image is not None:
+                self._bytes -= image.sizeInBytes()
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._images
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
@@ -0,0 +1,204 @@
+import base64
+import threading
+from typing import Optional, Dict, Union, Callable, Any, Tuple
+
+from PIL import Image
+from PySide6.QtCore import QObject, Signal, Slot, QRunnable, QThreadPool, Qt, QSize
+from PySide6.QtGui import QImage
+from loguru import logger
+from shiboken6 import isValid
+
+
+class DecodedImage:
+    """
+    A generated image decoded once and shared by everything that needs its pixels.
+
+    Holds the encoded bytes as received from the server, the full size `QImage` decoded
+    on first use and thumbnails scaled from it on demand. The preview, the saver, the
+    gallery thumbnail cache and the index all read from the same object instead of
+    decoding the bytes again. All methods are thread-safe, so the decoding can be done
+    up front on a worker thread with `prepare()`.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._image: Optional[QImage] = None
+        self._thumbnails: Dict[int, QImage] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_any(cls, image: Union["DecodedImage", bytes, bytearray, str]) -> "DecodedImage":
+        """Wrap encoded bytes or a base64 string (with or without a data URI prefix)."""
+        if isinstance(image, DecodedImage):
+            return image
+        if isinstance(image, str):
+            image = base64.b64decode(image.split(",", 1)[1] if image.startswith("data:") else image)
+        return cls(bytes(image))
+
+    @property
+    def format(self) -> Optional[str]:
+        """'PNG', 'JPEG' or 'WEBP' going by the signature of the encoded bytes."""
+        head = self.data[:12]
+        if head.startswith(b"\x89PNG"):
+            return "PNG"
+        if head.startswith(b"\xff\xd8"):
+            return "JPEG"
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return "WEBP"
+        return None
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._image is not None
+
+    def image(self) -> QImage:
+        """The full size image, decoded on first call. Null if the bytes are not an image."""
+        with self._lock:
+            if self._image is None:
+                self._image = QImage.fromData(self.data)
+                if self._image.isNull():
+                    logger.error(f"Failed to decode image ({len(self.data)} bytes)")
+            return self._image
+
+    def size(self) -> QSize:
+        return self.image().size()
+
+    def thumbnail(self, max_size: int) -> QImage:
+        """The image scaled to fit `max_size` x `max_size`, cached per size."""
+        image = self.image()
+        with self._lock:
+            thumbnail = self._thumbnails.get(max_size)
+            if thumbnail is None:
+                if image.isNull() or (image.width() <= max_size and image.height() <= max_size):
+                    thumbnail = image
+                else:
+                    thumbnail = image.scaled(max_size, max_size, Qt.AspectRatioMode.KeepAspectRatio,
+                                             Qt.TransformationMode.SmoothTransformation)
+                self._thumbnails[max_size] = thumbnail
+            return thumbnail
+
+    def prepare(self, thumbnail_sizes: Tuple[int, ...] = ()) -> "DecodedImage":
+        """Decode now and build the given thumbnails, meant to run on a worker thread."""
+        self.image()
+        for max_size in thumbnail_sizes:
+            self.thumbnail(max_size)
+        return self
+
+    def to_pil(self, max_size: Optional[int] = None) -> Image.Image:
+        """
+        RGB PIL image of the decoded pixels (or of a thumbnail), for encoders that need PIL.
+
+        Converts the already decoded `QImage` rather than decoding the bytes a second time.
+        """
+        image = self.image() if max_size is None else self.thumbnail(max_size)
+        if image.isNull():
+            raise ValueError("Image could not be decoded")
+        rgb = image.convertToFormat(QImage.Format.Format_RGB888)
+        return Image.frombuffer("RGB", (rgb.width(), rgb.height()), bytes(rgb.constBits()),
+                                "raw", "RGB", rgb.bytesPerLine(), 1)
+
+    def release(self):
+        """Drop the decoded pixels, keeping the encoded bytes."""
+        with self._lock:
+            self._image = None
+            self._thumbnails.clear()
+
+
+class _DecodeTask(QRunnable):
+    def __init__(self, decoder: "ImageDecoder", key: int, fn: Callable[[], Any]):
+        super().__init__()
+        self.decoder = decoder
+        self.key = key
+        self.fn = fn
+
+    def run(self):
+        try:
+            result = self.fn()
+        except Exception as e:
+            logger.error(f"Image task failed: {e}")
+            result = None
+        self.decoder._taskFinished.emit(self.key, result)
+
+
+class ImageDecoder(QObject):
+    """
+    Worker pool for decoding and encoding generated images off the GUI thread.
+
+    Callbacks are invoked on the GUI thread, and skipped if their `owner` was deleted
+    meanwhile.
+    """
+    _taskFinished = Signal(int, object)
+
+    def __init__(self, max_workers: int = 2, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self._callbacks: Dict[int, Tuple[Optional[Callable[[Any], None]], Optional[QObject]]] = {}
+        self._next_key = 0
+        self._taskFinished.connect(self._on_task_finished)
+
+    def run(self, fn: Callable[[], Any], callback: Optional[Callable[[Any], None]] = None,
+            owner: Optional[QObject] = None):
+        """Run `fn` on the pool, then `callback(result)` on the GUI thread. Result is None on error."""
+        key = self._next_key
+        self._next_key += 1
+        self._callbacks[key] = (callback, owner)
+        self.pool.start(_DecodeTask(self, key, fn))
+
+    def decode(self, image: DecodedImage, callback: Optional[Callable[[DecodedImage], None]] = None,
+               owner: Optional[QObject] = None, thumbnail_sizes: Tuple[int, ...] = ()):
+        """Decode `image` (and its thumbnails) on the pool."""
+        self.run(lambda: image.prepare(thumbnail_sizes), callback, owner)
+
+    @Slot(int, object)
+    def _on_task_finished(self, key: int, result: Any):
+        callback, owner = self._callbacks.pop(key, (None, None))
+        if callback is None or (owner is not None and not isValid(owner)):
+            return
+        callback(result)
+
+
+_decoder: Optional[ImageDecoder] = None
+
+
+def image_decoder() -> ImageDecoder:
+    """The shared `ImageDecoder`, created on first use."""
+    global _decoder
+    if _decoder is None:
+        _decoder = ImageDecoder()
+    return _decoder
+
+
+_saver: Optional[ImageDecoder] = None
+
+
+def image_saver() -> ImageDecoder:
+    """
+    The shared single-worker pool that writes generated images, created on first use.
+
+    Saves pick their file index from what is already in the output directory, two running
+    at once would pick the same one and overwrite each other.
+    """
+    global _saver
+    if _saver is None:
+        _saver = ImageDecoder(max_workers=1)
+    return _saver
+
+
+if __name__ == "__main__":
+    import sys
+    from PySide6.QtGui import QPixmap
+    from PySide6.QtWidgets import QApplication, QLabel
+
+    app = QApplication(sys.argv)
+    with open(sys.argv[1], "rb") as f:
+        decoded = DecodedImage(f.read())
+    label = QLabel()
+
+    def show(item: DecodedImage):
+        print(item.format, item.size(), item.to_pil().size)
+        label.setPixmap(QPixmap.fromImage(item.thumbnail(256)))
+        label.show()
+
+    image_decoder().decode(decoded, show, thumbnail_sizes=(256,))
+    app.exec()
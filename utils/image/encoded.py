@@ -0,0 +1,240 @@
+import base64
+import io
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+from PySide6.QtCore import QObject
+from PySide6.QtGui import QImage, QPixmap
+from loguru import logger
+from shiboken6 import isValid
+
+from config import sd_config
+from utils.cache_manager import cache_manager
+from utils.image.decoded import image_decoder
+
+# What the WebUI API generates when a payload leaves width and height out
+SERVER_DEFAULT_SIZE = (512, 512)
+
+
+@dataclass(frozen=True)
+class EncodeSettings:
+    """
+    How an image is encoded for a request payload.
+
+    format: "png", "webp" (lossless) or "jpeg".
+    quality: JPEG quality. Ignored by the lossless formats.
+    size: Output size (width, height) the server resizes the image to, None to send it
+        as is. Larger images are resized to it before encoding, see `fit_for_payload`.
+    resize_mode: The payload's `resize_mode`, how the server fits the image to `size`.
+    """
+    format: str = "png"
+    quality: int = 95
+    size: Optional[Tuple[int, int]] = None
+    resize_mode: int = 0
+
+    @classmethod
+    def from_config(cls, size: Optional[Tuple[int, int]] = None, resize_mode: int = 0) -> "EncodeSettings":
+        """Settings of the Payload config section, `size` is dropped if pre-resizing is off."""
+        return cls(sd_config.initImageFormat.value, sd_config.initImageQuality.value,
+                   size if sd_config.preResizeInputs.value else None, resize_mode)
+
+
+@dataclass
+class EncodedImage:
+    """A base64 encoded image ready to go into a payload."""
+    data: str
+    format: str
+    size: int  # Encoded bytes before base64
+    encode_ms: float
+    source_size: Tuple[int, int]
+    sent_size: Tuple[int, int]
+    resize_ms: float = 0.0
+
+    @property
+    def payload_bytes(self) -> int:
+        return len(self.data)
+
+
+def to_pil(image: QImage, alpha: bool = True) -> Image.Image:
+    """RGB or, with `alpha` and an alpha channel, RGBA PIL copy of `image`."""
+    if image.isNull():
+        raise ValueError("Image is null")
+    has_alpha = alpha and image.hasAlphaChannel()
+    mode = "RGBA" if has_alpha else "RGB"
+    converted = image.convertToFormat(QImage.Format.Format_RGBA8888 if has_alpha else QImage.Format.Format_RGB888)
+    return Image.frombuffer(mode, (converted.width(), converted.height()), bytes(converted.constBits()),
+                            "raw", mode, converted.bytesPerLine(), 1)
+
+
+def fit_for_payload(image: Image.Image, size: Tuple[int, int], resize_mode: int = 0) -> Image.Image:
+    """
+    Downscale `image` to what the server would make of it at `size`, so the payload
+    carries no pixels the server throws away. Never enlarges, that is left to the server.
+
+    resize_mode follows the WebUI: 0 and 3 stretch to `size`, 1 scales to cover `size`
+    and crops the center, 2 scales to fit inside `size` (the server fills the rest).
+    """
+    width, height = size
+    source_width, source_height = image.size
+    if resize_mode == 1:
+        scale = max(width / source_width, height / source_height)
+    elif resize_mode == 2:
+        scale = min(width / source_width, height / source_height)
+    else:
+        if source_width * source_height <= width * height:
+            return image
+        return image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    if scale >= 1:
+        return image
+    scaled = image.resize((max(1, round(source_width * scale)), max(1, round(source_height * scale))),
+                          Image.Resampling.LANCZOS, reducing_gap=3.0)
+    if resize_mode == 1:
+        left, top = (scaled.width - width) // 2, (scaled.height - height) // 2
+        scaled = scaled.crop((left, top, left + width, top + height))
+    return scaled
+
+
+def encode_image(image: Union[QImage, Image.Image], settings: EncodeSettings) -> bytes:
+    """
+    Encode `image` with PIL. Safe to call from a worker thread.
+
+    Lossless WebP runs at a low effort level: at Qt's fixed effort it is several times
+    slower than PNG, at this one it is about as fast and still smaller.
+    """
+    pil_image = to_pil(image, alpha=settings.format != "jpeg") if isinstance(image, QImage) else image
+    if settings.format == "jpeg" and pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+
+    buffer = io.BytesIO()
+    if settings.format == "webp":
+        pil_image.save(buffer, format="WEBP", lossless=True, method=1, quality=25)
+    elif settings.format == "jpeg":
+        pil_image.save(buffer, format="JPEG", quality=settings.quality, subsampling=0 if settings.quality >= 90 else 2)
+    elif settings.format == "png":
+        pil_image.save(buffer, format="PNG")
+    else:
+        raise ValueError(f"Unsupported payload image format: {settings.format}")
+    return buffer.getvalue()
+
+
+class ImageEncoder(QObject):
+    """
+    Encodes input images (img2img init images, masks...) for request payloads.
+
+    Encoding runs on the `image_decoder()` pool, only the pixmap to image conversion is
+    done on the GUI thread. Results are kept per `QPixmap.cacheKey()` and settings, so
+    generating again from the same input sends the payload encoded the first time. A
+    pixmap that is edited gets a new cache key, stale entries just age out.
+    """
+
+    def __init__(self, max_entries: int = 8, max_bytes: int = 128 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple[int, EncodeSettings], EncodedImage]" = OrderedDict()
+        self._waiting: Dict[Tuple[int, EncodeSettings], List[Tuple[Callable, Optional[QObject]]]] = {}
+
+    def encode(self, pixmap: QPixmap, callback: Callable[[Optional[EncodedImage]], None],
+               settings: Optional[EncodeSettings] = None, owner: Optional[QObject] = None):
+        """
+        Encode `pixmap`, then `callback(encoded)` on the GUI thread, None if encoding failed.
+
+        A cached result is handed to `callback` at once.
+        """
+        settings = settings or EncodeSettings.from_config()
+        key = (pixmap.cacheKey(), settings)
+        encoded = self._cache.get(key)
+        if encoded is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            callback(encoded)
+            return
+
+        waiting = self._waiting.get(key)
+        if waiting is not None:  # Already being encoded, e.g. a double click
+            waiting.append((callback, owner))
+            return
+        self.misses += 1
+        self._waiting[key] = [(callback, owner)]
+        image = pixmap.toImage()
+        image_decoder().run(lambda: self._encode(image, settings),
+                            lambda result: self._on_encoded(key, result), owner=self)
+
+    def size(self) -> int:
+        return sum(encoded.payload_bytes for encoded in self._cache.values())
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "bytes": self.size()}
+
+    @staticmethod
+    def _encode(image: QImage, settings: EncodeSettings) -> EncodedImage:
+        start = time.perf_counter()
+        pil_image = to_pil(image, alpha=settings.format != "jpeg")
+        source_size = pil_image.size
+        if settings.size is not None:
+            pil_image = fit_for_payload(pil_image, settings.size, settings.resize_mode)
+        resized = time.perf_counter()
+        data = encode_image(pil_image, settings)
+        done = time.perf_counter()
+        return EncodedImage(base64.b64encode(data).decode("ascii"), settings.format, len(data),
+                            (done - resized) * 1000, source_size, pil_image.size, (resized - start) * 1000)
+
+    def _on_encoded(self, key: Tuple[int, EncodeSettings], encoded: Optional[EncodedImage]):
+        if encoded is not None:
+            resized = ""
+            if encoded.sent_size != encoded.source_size:
+                resized = (f", resized from {encoded.source_size[0]}x{encoded.source_size[1]} "
+                           f"in {encoded.resize_ms:.0f} ms")
+            logger.info(f"Encoded {encoded.sent_size[0]}x{encoded.sent_size[1]} payload image as {encoded.format} "
+                        f"in {encoded.encode_ms:.0f} ms{resized}: {encoded.size / 1024:.0f} KB, "
+                        f"{encoded.payload_bytes / 1024:.0f} KB as base64")
+            self._cache[key] = encoded
+            while len(self._cache) > self.max_entries or (len(self._cache) > 1 and self.size() > self.max_bytes):
+                self._cache.popitem(last=False)
+        for callback, owner in self._waiting.pop(key, []):
+            if owner is None or isValid(owner):
+                callback(encoded)
+
+
+_encoder: Optional[ImageEncoder] = None
+
+
+def image_encoder() -> ImageEncoder:
+    """The shared `ImageEncoder`, created on first use."""
+    global _encoder
+    if _encoder is None:
+        _encoder = ImageEncoder()
+        cache_manager().register("payload_images", _encoder.clear, _encoder.stats)
+    return _encoder
+
+
+if __name__ == "__main__":
+    # Encode an image with every setting, as is and pre-resized to 1024 pixels on the
+    # long side, twice, to show resize and encode time, size and the cache
+    import sys
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication(sys.argv)
+    pixmap = QPixmap(sys.argv[1])
+    scale = 1024 / max(pixmap.width(), pixmap.height())
+    target = (round(pixmap.width() * scale / 8) * 8, round(pixmap.height() * scale / 8) * 8)
+    all_settings = [EncodeSettings(format, 95, size) for size in (None, target) for format in ("png", "webp", "jpeg")]
+    remaining = [len(all_settings) * 2]
+
+    def done(encoded: Optional[EncodedImage]):
+        remaining[0] -= 1
+        if not remaining[0]:
+            print(image_encoder().stats())
+            app.quit()
+
+    for settings in all_settings * 2:
+        image_encoder().encode(pixmap, done, settings)
+    app.exec()
@@ -0,0 +1,103 @@
+import threading
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+
+class GridCanvas:
+    """
+    A labelled grid image filled in tile by tile.
+
+    Tiles are pasted as their images arrive, in any order, so a partially finished grid
+    can be shown or saved at any time. Column labels go above the tiles, row labels to
+    their left and the title, e.g. the Z value of the page, on top. Empty label lists
+    (or lists of empty strings) leave their margin out. Pasting is thread-safe.
+    """
+
+    def __init__(self, columns: List[str], rows: List[str], tile_size: Tuple[int, int], title: str = "",
+                 background: str = "white", padding: int = 4):
+        self.columns = columns or [""]
+        self.rows = rows or [""]
+        self.tile_size = tile_size
+        self.padding = padding
+        tile_width, tile_height = tile_size
+        self.font = ImageFont.load_default(size=max(14, min(36, tile_height // 14)))
+        self._lock = threading.Lock()
+        self.filled = 0
+
+        line_height = self._text_size("Ag")[1] + padding
+        wrap = tile_width - 2 * padding
+        self._column_lines = [self._wrap(label, wrap) for label in self.columns]
+        self._row_lines = [self._wrap(label, max(tile_width // 2, 120)) for label in self.rows]
+        self._title_lines = self._wrap(title, len(self.columns) * tile_width) if title else []
+        header = max(len(lines) for lines in self._column_lines) * line_height + padding if any(self.columns) else 0
+        title_height = len(self._title_lines) * line_height + 2 * padding if title else 0
+        margin = max(self._text_size(line)[0] for lines in self._row_lines for line in lines or [""]) \
+            + 3 * padding if any(self.rows) else 0
+        self.origin = (margin, title_height + header)
+        self.image = Image.new("RGB", (margin + len(self.columns) * (tile_width + padding),
+                                       self.origin[1] + len(self.rows) * (tile_height + padding)), background)
+
+        draw = ImageDraw.Draw(self.image)
+        for i, line in enumerate(self._title_lines):
+            draw.text((margin + padding, padding + i * line_height), line, fill="black", font=self.font)
+        for column, lines in enumerate(self._column_lines):
+            left = margin + column * (tile_width + padding)
+            for i, line in enumerate(lines):
+                width = self._text_size(line)[0]
+                draw.text((left + (tile_width - width) // 2, title_height + i * line_height), line,
+                          fill="black", font=self.font)
+        for row, lines in enumerate(self._row_lines):
+            top = self.origin[1] + row * (tile_height + padding) + (tile_height - len(lines) * line_height) // 2
+            for i, line in enumerate(lines):
+                draw.text((padding, top + i * line_height), line, fill="black", font=self.font)
+
+    @property
+    def tile_count(self) -> int:
+        return len(self.columns) * len(self.rows)
+
+    def paste(self, column: int, row: int, image: Image.Image):
+        """Fit `image` into the tile at `column`, `row`, centered."""
+        tile_width, tile_height = self.tile_size
+        tile = image.convert("RGB") if image.mode != "RGB" else image.copy()
+        if tile.size != self.tile_size:
+            tile.thumbnail(self.tile_size, Image.Resampling.LANCZOS)
+        left = self.origin[0] + column * (tile_width + self.padding) + (tile_width - tile.width) // 2
+        top = self.origin[1] + row * (tile_height + self.padding) + (tile_height - tile.height) // 2
+        with self._lock:
+            self.image.paste(tile, (left, top))
+            self.filled += 1
+
+    def snapshot(self) -> Image.Image:
+        """A copy of the grid as far as it is filled."""
+        with self._lock:
+            return self.image.copy()
+
+    def save(self, path: str, format: Optional[str] = None, **params):
+        with self._lock:
+            self.image.save(path, format=format, **params)
+
+    def _text_size(self, text: str) -> Tuple[int, int]:
+        left, top, right, bottom = self.font.getbbox(text)
+        return right - left, bottom - top
+
+    def _wrap(self, text: str, width: int) -> List[str]:
+        lines: List[str] = []
+        for word in text.split():
+            if lines and self._text_size(f"{lines[-1]} {word}")[0] <= width:
+                lines[-1] = f"{lines[-1]} {word}"
+            else:
+                lines.append(word)
+        return lines
+
+
+if __name__ == "__main__":
+    # A 3x2 grid of noise tiles, written to the path given
+    import sys
+
+    canvas = GridCanvas(["CFG: 5", "CFG: 7", "CFG: 9"], ["Sampler: Euler a", "Sampler: DPM++ 2M Karras"],
+                        (256, 256), title="Checkpoint: sd_xl_base_1.0")
+    for column in range(3):
+        for row in range(2):
+            canvas.paste(column, row, Image.effect_noise((512, 512), 20 + 20 * column + 40 * row))
+    canvas.save(sys.argv[1] if len(sys.argv) > 1 else "grid.png")
@@ -52,26 +52,42 @@ def extract_metadata(image_path: str, hash_value: str) -> Optional[Dict]:
             if not raw:
                 logger.warning(f"No metadata found in {image_path}")
                 return None
-
-            nested_data = parse_generation_parameters(raw)  # Assumed function
-            return {
-                "hash": hash_value,
-                "filename": Path(image_path).name,
-                "path": image_path,
-                "directory":  str(Path(image_path).parent),
-                "size": get_file_size(image_path),
-                "date": get_created_date(image_path),
-                **nested_data.get("meta", {}),
-                "lora": [l["name"] for l in nested_data.get("lora", [])],
-                "lora_strength": [l["value"] for l in nested_data.get("lora", [])],
-                "lyco": nested_data.get("lyco", []),
-                "pos_prompt": nested_data.get("pos_prompt", []),
-                "neg_prompt": nested_data.get("negative_prompt", [])
-            }
+            return metadata_from_infotext(image_path, hash_value, raw)
     except Exception as e:
         logger.error(f"Error reading {image_path}: {e}")
         return None
 
+def metadata_from_infotext(image_path: str, hash_value: str, raw: str) -> Dict:
+    """
+    Build the index record of an image from its infotext.
+
+    Used directly for freshly generated images, whose infotext is known without
+    opening the saved file.
+
+    Args:
+        image_path: Path to image file.
+        hash_value: Hash of the image file.
+        raw: SD WebUI infotext of the image.
+
+    Returns:
+        Dictionary with metadata.
+    """
+    nested_data = parse_generation_parameters(raw)  # Assumed function
+    return {
+        "hash": hash_value,
+        "filename": Path(image_path).name,
+        "path": image_path,
+        "directory":  str(Path(image_path).parent),
+        "size": get_file_size(image_path),
+        "date": get_created_date(image_path),
+        **nested_data.get("meta", {}),
+        "lora": [l["name"] for l in nested_data.get("lora", [])],
+        "lora_strength": [l["value"] for l in nested_data.get("lora", [])],
+        "lyco": nested_data.get("lyco", []),
+        "pos_prompt": nested_data.get("pos_prompt", []),
+        "neg_prompt": nested_data.get("negative_prompt", [])
+    }
+
 def process_images(image_paths: List[str], existing_hashes: Dict[str, str]) -> List[Dict]:
     """
     Process images and extract metadata for new or changed files.
@@ -104,7 +120,7 @@ def process_images(image_paths: List[str], existing_hashes: Dict[str, str]) -> L
 def update_dataframe(
     new_data: List[Dict],
     existing_df: Optional[pd.DataFrame] = None,
-    feather_path: str = "data.feather"
+    feather_path: Optional[str] = "data.feather"
 ) -> pd.DataFrame:
     """
     Merge new data with existing DataFrame and save to Feather file.
@@ -112,7 +128,7 @@ def update_dataframe(
     Args:
         new_data: List of new metadata dictionaries.
         existing_df: Existing DataFrame or None.
-        feather_path: Path to save Feather file.
+        feather_path: Path to save Feather file, None to only merge in memory.
 
     Returns:
         Final DataFrame.
@@ -126,7 +142,7 @@ def update_dataframe(
     else:
         df_final = df_new if not df_new.empty else existing_df if existing_df is not None else pd.DataFrame()
 
-    if not df_final.empty:
+    if not df_final.empty and feather_path is not None:
         try:
             df_final.to_feather(feather_path)
             logger.info(f"Saved DataFrame with {len(df_final)} records to {feather_path}")
@@ -0,0 +1,165 @@
+import io
+import struct
+from pathlib import Path
+from typing import Optional, Union
+
+import piexif
+from PIL import Image
+from PySide6.QtCore import QSize, Qt
+from PySide6.QtGui import QImage, QImageReader, QPainter, QColor
+from loguru import logger
+
+# JPEG markers that carry no length field
+_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+_SOI = b"\xff\xd8"
+_APP1 = 0xE1
+_SOS = 0xDA
+
+
+def _read_exif_segment(path: Union[str, Path]) -> Optional[bytes]:
+    """
+    Walk the JPEG marker headers until the APP1/Exif segment is found.
+
+    Only the segment headers and the Exif payload itself are read, so the cost
+    is a few KB of I/O no matter how large the image is.
+
+    Args:
+        path: Path to a JPEG file.
+
+    Returns:
+        The raw Exif payload (starting with b"Exif\\x00\\x00") or None.
+    """
+    with open(path, "rb") as f:
+        if f.read(2) != _SOI:
+            return None
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            code = marker[1]
+            if code == 0xFF:  # fill byte, step back one and re-read
+                f.seek(-1, io.SEEK_CUR)
+                continue
+            if code in _STANDALONE_MARKERS:
+                continue
+            if code == _SOS:  # image data starts, no Exif before it
+                return None
+            length_bytes = f.read(2)
+            if len(length_bytes) < 2:
+                return None
+            length = struct.unpack(">H", length_bytes)[0] - 2
+            if code == _APP1:
+                payload = f.read(length)
+                if payload.startswith(b"Exif\x00\x00"):
+                    return payload
+            else:
+                f.seek(length, io.SEEK_CUR)
+
+
+def read_exif_thumbnail(path: Union[str, Path]) -> Optional[bytes]:
+    """
+    Extract the embedded IFD1 thumbnail of a JPEG with a header-only read.
+
+    Args:
+        path: Path to the image file.
+
+    Returns:
+        The encoded thumbnail bytes, or None if the file has no thumbnail.
+    """
+    if Path(path).suffix.lower() not in (".jpg", ".jpeg", ".jpe"):
+        return None
+    try:
+        segment = _read_exif_segment(path)
+        if not segment:
+            return None
+        return piexif.load(segment).get("thumbnail") or None
+    except Exception as e:
+        logger.debug(f"No EXIF thumbnail for {path}: {e}")
+        return None
+
+
+def pad_image(image: QImage, target_size: QSize, bg_color: QColor = QColor(0, 0, 0, 0)) -> QImage:
+    """
+    QImage counterpart of `add_padding_to_pixmap`, safe to call from worker threads.
+
+    Args:
+        image: Source image.
+        target_size: Size of the returned image.
+        bg_color: Fill color around the scaled image.
+
+    Returns:
+        The image scaled with aspect ratio kept and centered on a `target_size` canvas.
+    """
+    if image.isNull():
+        return QImage()
+    if image.size() == target_size:
+        return image
+
+    scaled = image.scaled(target_size, Qt.AspectRatioMode.KeepAspectRatio,
+                          Qt.TransformationMode.SmoothTransformation)
+    padded = QImage(target_size, QImage.Format.Format_ARGB32_Premultiplied)
+    padded.fill(bg_color)
+
+    painter = QPainter(padded)
+    x = (target_size.width() - scaled.width()) // 2
+    y = (target_size.height() - scaled.height()) // 2
+    painter.drawImage(x, y, scaled)
+    painter.end()
+    return padded
+
+
+def load_exif_thumbnail_image(path: Union[str, Path], size: QSize = QSize(512, 512)) -> Optional[QImage]:
+    """
+    Decode the embedded EXIF thumbnail of `path` into a padded QImage.
+
+    Returns:
+        The padded thumbnail or None if the file has no usable thumbnail.
+    """
+    data = read_exif_thumbnail(path)
+    if not data:
+        return None
+    image = QImage.fromData(data)
+    if image.isNull():
+        return None
+    return pad_image(image, size)
+
+
+def load_thumbnail_image(path: Union[str, Path], size: QSize = QSize(512, 512)) -> Optional[QImage]:
+    """
+    Decode `path` straight to thumbnail resolution and pad it to `size`.
+
+    `QImageReader.setScaledSize` lets the JPEG decoder skip work (DCT scaling),
+    which is much cheaper than decoding the full image and scaling it down.
+
+    Returns:
+        The padded thumbnail or None if the image could not be read.
+    """
+    reader = QImageReader(str(path))
+    reader.setAutoTransform(True)
+    original = reader.size()
+    if original.isValid() and (original.width() > size.width() or original.height() > size.height()):
+        reader.setScaledSize(original.scaled(size, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        logger.warning(f"Failed to decode thumbnail for {path}: {reader.errorString()}")
+        return None
+    return pad_image(image, size)
+
+
+def create_exif_thumbnail(image: Image.Image, max_size: int = 256, quality: int = 75) -> bytes:
+    """
+    Encode a small JPEG thumbnail suitable for the EXIF IFD1 block.
+
+    Args:
+        image: Source PIL image.
+        max_size: Longest edge of the thumbnail in pixels.
+        quality: JPEG quality of the thumbnail.
+
+    Returns:
+        The encoded JPEG bytes.
+    """
+    thumb = image.convert("RGB")
+    thumb.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    thumb.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
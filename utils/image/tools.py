@@ -9,7 +9,7 @@ import sys
 import zipfile
 from datetime import datetime
 from pprint import pprint
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Union
 import io
 
 import numpy as np
@@ -24,6 +24,11 @@ from PySide6.QtCore import QByteArray, QBuffer, QIODevice
 from PySide6.QtGui import QImage
 from loguru import logger
 from utils.tools import to_abs_path, normalize_paths, cwd
+from utils.image.thumbnail import create_exif_thumbnail
+from utils.image.decoded import DecodedImage
+
+# A JPEG APP1 segment length field is 16 bits (includes the 2 length bytes)
+_MAX_EXIF_SEGMENT = 65533
 
 
 
@@ -138,13 +143,14 @@ def hash_file(file_path: str) -> str:
 
 
 
-def base64_pixmap(image_data: str) -> Optional[QPixmap]:
+def base64_pixmap(image_data: Union[str, bytes]) -> Optional[QPixmap]:
     """
     Convert a base64-encoded image string to a QPixmap.
 
     Args:
-        image_data (str): Base64-encoded image string, with or without data URI prefix
-                         (e.g., "data:image/png;base64,...").
+        image_data (str | bytes): Base64-encoded image string, with or without data URI prefix
+                         (e.g., "data:image/png;base64,..."), or already decoded image bytes
+                         as delivered by the streaming response parser.
 
     Returns:
         Optional[QPixmap]: Loaded QPixmap if successful, None if conversion fails.
@@ -154,6 +160,13 @@ def base64_pixmap(image_data: str) -> Optional[QPixmap]:
         return None
 
     try:
+        if isinstance(image_data, (bytes, bytearray)):
+            pixmap = QPixmap()
+            if not pixmap.loadFromData(image_data):
+                print("Error: Failed to load image from data.")
+                return None
+            return pixmap
+
         # Remove data URI prefix if present (e.g., "data:image/png;base64,")
         base64_string = image_data
         if image_data.startswith("data:image/"):
@@ -341,18 +354,28 @@ def save_sdwebui_image_with_info(
     output_dir: str,
     save_txt: bool = True,
     image_format: str = "JPEG",
-    filename_template: str = "{index}-{date}-{model}"
+    filename_template: str = "{index}-{date}-{model}",
+    embed_thumbnail: bool = False,
+    thumbnail_size: int = 256,
+    saved: Optional[List[Dict[str, Any]]] = None
 ) -> bool:
     """
     Save images from an SD WebUI API response with metadata and auto-naming.
     Supports batch processing of multiple images in the response.
 
     Args:
-        response: SD WebUI API response containing 'images' and 'info'.
+        response: SD WebUI API response containing 'images' and 'info'. Images may be base64
+            strings, encoded image bytes or `DecodedImage`s, the latter are saved from their
+            already decoded pixels.
         output_dir: Directory to save images and optional metadata files.
         save_txt: Whether to save the infotext string to a .txt file.
         image_format: Image format to save ('JPEG' or 'PNG').
         filename_template: Template for filename (e.g., '{index}-{date}-{model}', supports '{counter}').
+        embed_thumbnail: Embed a small EXIF (IFD1) thumbnail so the gallery can show it without
+            decoding the full image. Only applies to JPEG output.
+        thumbnail_size: Longest edge of the embedded thumbnail in pixels.
+        saved: Optional list that receives one dict per written image with its 'path', the
+            xxhash of the written file ('hash'), its 'infotext' and the source 'image'.
 
     Returns:
         True if all images were saved successfully, False if any failed.
@@ -411,10 +434,10 @@ def save_sdwebui_image_with_info(
         # Process each image
         for i, image_base64 in enumerate(response["images"]):
             try:
-                # Decode image
+                # Decode image, or reuse the pixels the preview already decoded
                 try:
-                    image_data = base64.b64decode(image_base64)
-                    image = Image.open(io.BytesIO(image_data)).convert("RGB")
+                    decoded = DecodedImage.from_any(image_base64)
+                    image = decoded.to_pil()
                 except base64.binascii.Error as e:
                     logger.error(f"Invalid base64 for image {i}: {e}")
                     all_success = False
@@ -430,6 +453,10 @@ def save_sdwebui_image_with_info(
                     exif_dict["Exif"][piexif.ExifIFD.UserComment] = infotext_str.encode("utf-8", errors="ignore")
                     exif_bytes = piexif.dump(exif_dict)
 
+                image_exif = exif_bytes
+                if embed_thumbnail and image_format.upper() == "JPEG":
+                    image_exif = _dump_exif_with_thumbnail(exif_dict, decoded.to_pil(thumbnail_size), thumbnail_size)
+
                 # Compose filename
                 index_str = str(base_index + i).zfill(5)  # Increment index locally
                 filename = filename_template.format(
@@ -441,9 +468,16 @@ def save_sdwebui_image_with_info(
                 img_path = os.path.join(output_dir, filename + extension)
                 txt_path = os.path.join(output_dir, filename + ".txt")
 
-                # Save image
+                # Save image, encoded in memory so the index can hash it without reading it back
                 try:
-                    image.save(img_path, image_format.upper(), exif=exif_bytes, quality=95)
+                    buffer = io.BytesIO()
+                    image.save(buffer, image_format.upper(), exif=image_exif, quality=95)
+                    encoded = buffer.getbuffer()
+                    with open(img_path, "wb") as f:
+                        f.write(encoded)
+                    if saved is not None:
+                        saved.append({"path": img_path, "hash": xxhash.xxh64(encoded).hexdigest(),
+                                      "infotext": infotext_str, "image": decoded})
                     logger.info(f"Saved image {i} to: {img_path}")
                 except Exception as e:
                     logger.error(f"Failed to save image {i} to {img_path}: {e}")
@@ -476,6 +510,32 @@ def save_sdwebui_image_with_info(
         logger.error(f"Unexpected error in save_sdwebui_image_with_info: {e}")
         return False
 
+def _dump_exif_with_thumbnail(exif_dict: Dict[str, Any], image: Image.Image, thumbnail_size: int) -> bytes:
+    """
+    Dump `exif_dict` with an IFD1 thumbnail of `image` attached.
+
+    Falls back to the plain EXIF block if the result would not fit into a
+    single JPEG APP1 segment (64 KB).
+    """
+    try:
+        thumbnail = create_exif_thumbnail(image, thumbnail_size)
+        exif_bytes = piexif.dump({
+            **exif_dict,
+            "1st": {
+                piexif.ImageIFD.Compression: 6,  # JPEG compressed thumbnail
+                piexif.ImageIFD.XResolution: (72, 1),
+                piexif.ImageIFD.YResolution: (72, 1),
+                piexif.ImageIFD.ResolutionUnit: 2,
+            },
+            "thumbnail": thumbnail,
+        })
+        if len(exif_bytes) <= _MAX_EXIF_SEGMENT:
+            return exif_bytes
+        logger.warning("EXIF block with thumbnail exceeds 64 KB, saving without thumbnail")
+    except Exception as e:
+        logger.warning(f"Failed to embed EXIF thumbnail: {e}")
+    return piexif.dump(exif_dict)
+
 def fetch_model_name(infotext: str) -> str:
     """
     Extract the model name from the infotext string.